@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
-from .models import Comment
+from .models import Comment, RatingSummary
 
 
 class CommentAdmin(admin.ModelAdmin):
@@ -11,3 +11,11 @@ class CommentAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Comment, CommentAdmin)
+
+
+class RatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ['destination', 'count', 'average', 'rate_1', 'rate_2', 'rate_3', 'rate_4', 'rate_5']
+    readonly_fields = ['destination', 'count', 'total', 'rate_1', 'rate_2', 'rate_3', 'rate_4', 'rate_5']
+
+
+admin.site.register(RatingSummary, RatingSummaryAdmin)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.comments.services.services import RatingService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild rating summaries of studios and photographers from comments'
+
+    def handle(self, *args, **options):
+        count = RatingService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rating summaries'))
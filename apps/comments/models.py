@@ -22,6 +22,41 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-time_create']
+        indexes = [
+            models.Index(fields=['-time_create', 'id'], name='comment_time_create_id_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author} on {self.time_create}. Rate: {self.rate}'
+
+
+class RatingSummary(models.Model):
+    destination = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary',
+    )
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    rate_1 = models.PositiveIntegerField(default=0)
+    rate_2 = models.PositiveIntegerField(default=0)
+    rate_3 = models.PositiveIntegerField(default=0)
+    rate_4 = models.PositiveIntegerField(default=0)
+    rate_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Rating summary"
+        verbose_name_plural = "Rating summaries"
+
+    def __str__(self):
+        return f'Rating of {self.destination_id}: {self.average} ({self.count})'
+
+    @property
+    def average(self):
+        if not self.count:
+            return None
+        return round(self.total / self.count, 2)
+
+    def distribution(self):
+        return {rate: getattr(self, f'rate_{rate}') for rate in Comment.Rate.values}
@@ -0,0 +1,7 @@
+from common.pagination import BasePagination
+
+
+class CommentPagination(BasePagination):
+    ordering = ('-time_create', 'id')
+    page_size = 20
+    max_page_size = 100
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from ..models import Comment
+from ..models import Comment, RatingSummary
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -30,3 +30,13 @@ class CommentDetailSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'author', 'destination', 'rate', 'title', 'body', 'time_create', 'time_update']
         read_only_fields = ['id', 'author', 'destination', 'time_create', 'time_update']
+
+
+class RatingSummarySerializer(serializers.ModelSerializer):
+    average = serializers.FloatField(read_only=True)
+    distribution = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = RatingSummary
+        fields = ['destination', 'count', 'average', 'distribution']
+        read_only_fields = fields
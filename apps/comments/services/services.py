@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from apps.comments.models import Comment, RatingSummary
+
+
+class RatingService:
+    @staticmethod
+    def apply(destination_id, rate, sign):
+        """
+        Инкрементально добавляет (sign=1) или убирает (sign=-1) оценку из сводки.
+        """
+        changes = {
+            'count': F('count') + sign,
+            'total': F('total') + sign * rate,
+            f'rate_{rate}': F(f'rate_{rate}') + sign,
+        }
+        updated = RatingSummary.objects.filter(destination_id=destination_id).update(**changes)
+        if updated or sign < 0:
+            return
+
+        _, created = RatingSummary.objects.get_or_create(
+            destination_id=destination_id,
+            defaults={'count': 1, 'total': rate, f'rate_{rate}': 1},
+        )
+        if not created:
+            RatingSummary.objects.filter(destination_id=destination_id).update(**changes)
+
+    @staticmethod
+    def rebuild():
+        """
+        Пересчитывает все сводки с нуля по таблице комментариев.
+        """
+        histogram = {
+            f'rate_{rate}': Count('id', filter=Q(rate=rate)) for rate in Comment.Rate.values
+        }
+        rows = Comment.objects.order_by().values('destination_id').annotate(
+            count=Count('id'), total=Sum('rate'), **histogram
+        )
+
+        with transaction.atomic():
+            RatingSummary.objects.all().delete()
+            summaries = RatingSummary.objects.bulk_create(
+                (RatingSummary(**row) for row in rows), batch_size=1000
+            )
+        return len(summaries)
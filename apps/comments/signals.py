@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.comments.models import Comment
+from apps.comments.services.services import RatingService
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_rate(sender, instance, **kwargs):
+    instance._previous_rate = None
+    if instance.pk:
+        instance._previous_rate = Comment.objects.filter(pk=instance.pk).values_list('destination_id', 'rate').first()
+
+
+@receiver(post_save, sender=Comment)
+def update_rating_on_save(sender, instance, **kwargs):
+    previous_rate = getattr(instance, '_previous_rate', None)
+    current_rate = (instance.destination_id, instance.rate)
+    if previous_rate == current_rate:
+        return
+
+    if previous_rate:
+        RatingService.apply(*previous_rate, sign=-1)
+    RatingService.apply(*current_rate, sign=1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_rating_on_delete(sender, instance, **kwargs):
+    RatingService.apply(instance.destination_id, instance.rate, sign=-1)
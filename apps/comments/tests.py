@@ -1,3 +1,127 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.comments.models import Comment, RatingSummary
+from apps.comments.services.services import RatingService
+from common.testing.pagination import follow_pages
+from common.testing.plans import QueryPlanTestCase
+
+
+class CommentPlanTests(QueryPlanTestCase):
+    # сводка рейтинга есть у каждого исполнителя с отзывами: при 100 исполнителях
+    # это одна страница, и поиск по первичному ключу честно дешевле Seq Scan'ом
+    seed_options = {'executors': 500, 'orders_per_executor': 5, 'photos_per_portfolio': 1, 'slots_per_day': 1}
+    large_models = (Comment, RatingSummary)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = get_user_model().objects.filter(studio_profile__isnull=True).order_by('id').first()
+        cls.destination_id = Comment.objects.order_by('id').values_list('destination_id', flat=True).first()
+
+    def test_plans(self):
+        self.assert_plans('comment_list', '/api/comments/', self.user)
+        comment = Comment.objects.order_by('id').first()
+        self.assert_plans('comment_retrieve', f'/api/comments/{comment.pk}/', self.user)
+        self.assert_plans('comment_rating', f'/api/comments/rating/{self.destination_id}/', self.user)
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.author, self.executor, self.other = [
+            get_user_model().objects.create_user(
+                email=f'rating{index}@example.com', password='password', phone_number=f'+37529200000{index}',
+            )
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_summary(self, user):
+        return RatingSummary.objects.filter(destination=user).values(
+            'count', 'total', 'rate_1', 'rate_2', 'rate_3', 'rate_4', 'rate_5',
+        ).first()
+
+    def assert_summary(self, user, count, total, **rates):
+        expected = {'count': count, 'total': total, **{f'rate_{rate}': 0 for rate in Comment.Rate.values}}
+        expected.update(rates)
+        self.assertEqual(self.get_summary(user), expected)
+
+    def assert_rebuild_matches(self):
+        summaries = {user.pk: self.get_summary(user) for user in (self.executor, self.other)}
+        RatingService.rebuild()
+        self.assertEqual({user.pk: self.get_summary(user) for user in (self.executor, self.other)}, summaries)
+
+    def create_comment(self, destination, rate):
+        response = self.client.post('/api/comments/', {'destination': destination.pk, 'rate': rate}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Comment.objects.latest('id')
+
+    def test_summary_follows_comments(self):
+        first = self.create_comment(self.executor, 5)
+        self.create_comment(self.executor, 3)
+        self.assert_summary(self.executor, count=2, total=8, rate_3=1, rate_5=1)
+        self.assert_rebuild_matches()
+
+        self.client.patch(f'/api/comments/{first.pk}/', {'rate': 4}, format='json')
+        self.assert_summary(self.executor, count=2, total=7, rate_3=1, rate_4=1)
+        self.assert_rebuild_matches()
+
+        # отзыв перенесён на другого исполнителя
+        first.refresh_from_db()
+        first.destination = self.other
+        first.save()
+        self.assert_summary(self.executor, count=1, total=3, rate_3=1)
+        self.assert_summary(self.other, count=1, total=4, rate_4=1)
+        self.assert_rebuild_matches()
+
+        self.client.delete(f'/api/comments/{first.pk}/')
+        self.assert_summary(self.other, count=0, total=0)
+        self.assertEqual(RatingService.rebuild(), 1)
+        self.assertIsNone(self.get_summary(self.other))
+
+    def test_rating_endpoint(self):
+        self.create_comment(self.executor, 5)
+        self.create_comment(self.executor, 2)
+
+        response = self.client.get(f'/api/comments/rating/{self.executor.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['average'], 3.5)
+
+        response = self.client.get(f'/api/comments/rating/{self.other.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertIsNone(response.data['average'])
+
+        missing_id = get_user_model().objects.order_by('-pk').values_list('pk', flat=True).first() + 1
+        self.assertEqual(self.client.get(f'/api/comments/rating/{missing_id}/').status_code, 404)
+
+
+
+class CommentPaginationTests(TestCase):
+    def test_pages_are_stable_with_duplicate_time(self):
+        author, executor = [
+            get_user_model().objects.create_user(
+                email=f'page{index}@example.com', password='password', phone_number=f'+37529300000{index}',
+            )
+            for index in range(2)
+        ]
+        comments = [Comment.objects.create(author=author, destination=executor, rate=3) for _ in range(15)]
+        # у половины отзывов одинаковое время: порядок держится на id
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments[:8]]).update(
+            time_create=comments[0].time_create,
+        )
+        expected = list(Comment.objects.order_by('-time_create', 'id').values_list('id', flat=True))
+        client = APIClient()
+        client.force_authenticate(author)
+
+        pages = follow_pages(client, '/api/comments/?page_size=4')
+        self.assertEqual([comment['id'] for page in pages for comment in page.data['results']], expected)
 
-# Create your tests here.
+        back = follow_pages(client, pages[-1].data['previous'], link='previous')
+        self.assertEqual([comment['id'] for page in reversed(back) for comment in page.data['results']], expected[:12])
@@ -1,23 +1,30 @@
+from django.contrib.auth import get_user_model
 from django.shortcuts import render
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from apps.comments.models import Comment
+from apps.comments.models import Comment, RatingSummary
+from apps.comments.pagination.pagination import CommentPagination
 from apps.comments.serializers.serializers import (
     CommentCreateSerializer, CommentUpdateSerializer,
-    CommentDetailSerializer,
+    CommentDetailSerializer, RatingSummarySerializer,
 )
 
 
 class CommentAPIView(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author', 'destination')
     permission_classes = (IsAuthenticated, )
+    pagination_class = CommentPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CommentCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return CommentUpdateSerializer
+        elif self.action == 'rating':
+            return RatingSummarySerializer
         else:  # 'list' and 'retrieve'
             return CommentDetailSerializer
 
@@ -43,9 +50,10 @@ class CommentAPIView(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -53,3 +61,15 @@ class CommentAPIView(viewsets.ModelViewSet):
         data = serializer.data
 
         return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path=r'rating/(?P<destination_id>\d+)')
+    def rating(self, request, destination_id=None):
+        rating_summary = RatingSummary.objects.filter(destination_id=destination_id).first()
+        if rating_summary is None:
+            # сводки нет у пользователя без отзывов, но не у несуществующего
+            if not get_user_model().objects.filter(pk=destination_id).exists():
+                raise NotFound("Пользователь не найден.")
+            rating_summary = RatingSummary(destination_id=int(destination_id))
+        serializer = self.get_serializer(rating_summary)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
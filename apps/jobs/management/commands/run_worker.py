@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from apps.jobs.services.services import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--task', action='append', dest='tasks',
+                            help='Only run these tasks, may be repeated')
+
+    def handle(self, *args, **options):
+        worker = JobWorker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            tasks=options['tasks'],
+        )
+        signal.signal(signal.SIGINT, worker.stop)
+        signal.signal(signal.SIGTERM, worker.stop)
+
+        self.stdout.write(f'Worker started with {options["concurrency"]} threads')
+        worker.run()
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
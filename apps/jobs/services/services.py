@@ -0,0 +1,179 @@
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def register(name):
+    """
+    Регистрирует функцию как задачу. payload задачи передаётся ей как kwargs.
+    """
+    def decorator(func):
+        if name in _tasks:
+            raise ValueError(f'Task {name} is already registered')
+        _tasks[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f'Unknown task {name}') from None
+
+
+def enqueue(task, payload=None, delay=0, max_attempts=None):
+    """
+    Ставит задачу в очередь в текущей транзакции: если транзакция
+    откатится, задачи тоже не будет. При JOBS_RUN_INLINE задача выполняется
+    в этом же процессе после коммита (для разработки без воркера).
+    """
+    get_task(task)
+    payload = payload or {}
+
+    if settings.JOBS_RUN_INLINE:
+        transaction.on_commit(lambda: get_task(task)(**payload))
+        return None
+
+    return Job.objects.create(
+        task=task,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def get_retry_delay(attempts):
+    # экспоненциальная задержка с разбросом, чтобы повторы не шли пачкой
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobWorker:
+    """
+    Выполняет задачи из таблицы Job в нескольких потоках.
+    Задача забирается через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    воркеры в разных процессах не получают одну и ту же задачу.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, lock_timeout=None, tasks=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lock_timeout = timedelta(seconds=lock_timeout or settings.JOBS_LOCK_TIMEOUT)
+        self.tasks = tasks
+        self.stopping = threading.Event()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.loop, name=f'job-worker-{index}', daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=self.poll_interval)
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                if not self.run_once():
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            close_old_connections()
+
+    def get_jobs(self):
+        jobs = Job.objects.all()
+        if self.tasks:
+            jobs = jobs.filter(task__in=self.tasks)
+        return jobs
+
+    def fail_exhausted(self, now):
+        # воркер падал на задаче во всех попытках - больше её не берём
+        self.get_jobs().filter(
+            status=Job.STATUS_RUNNING,
+            locked_at__lt=now - self.lock_timeout,
+            attempts__gte=F('max_attempts'),
+        ).update(status=Job.STATUS_FAILED, locked_at=None, last_error='Worker lock expired')
+
+    def claim(self):
+        now = timezone.now()
+        self.fail_exhausted(now)
+        jobs = self.get_jobs().filter(
+            Q(status=Job.STATUS_QUEUED, run_at__lte=now)
+            # воркер упал, не дойдя до конца задачи
+            | Q(status=Job.STATUS_RUNNING, locked_at__lt=now - self.lock_timeout, attempts__lt=F('max_attempts'))
+        )
+
+        with transaction.atomic():
+            job = jobs.select_for_update(skip_locked=True).order_by('run_at').first()
+            if job is None:
+                return None
+            job.status = Job.STATUS_RUNNING
+            job.attempts += 1
+            job.locked_at = now
+            job.save(update_fields=['status', 'attempts', 'locked_at'])
+        return job
+
+    def heartbeat(self, job, done):
+        """
+        Продлевает блокировку, пока задача выполняется, чтобы долгую задачу
+        не забрал другой воркер по lock_timeout.
+        """
+        try:
+            while not done.wait(self.lock_timeout.total_seconds() / 3):
+                # attempts: блокировка продлевается только для своей попытки
+                Job.objects.filter(
+                    pk=job.pk, status=Job.STATUS_RUNNING, attempts=job.attempts,
+                ).update(locked_at=timezone.now())
+        finally:
+            connection.close()
+
+    def run_once(self):
+        """
+        Выполняет одну задачу. Возвращает False, если очередь пуста.
+        """
+        job = self.claim()
+        if job is None:
+            return False
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            # задачи сами управляют транзакциями и должны быть идемпотентны: после сбоя их повторят
+            get_task(job.task)(**job.payload)
+        except Exception:
+            logger.exception('Job %s (%s) failed, attempt %s of %s', job.pk, job.task, job.attempts, job.max_attempts)
+            job.last_error = traceback.format_exc()
+            job.locked_at = None
+            if job.attempts < job.max_attempts:
+                job.status = Job.STATUS_QUEUED
+                job.run_at = timezone.now() + timedelta(seconds=get_retry_delay(job.attempts))
+            else:
+                job.status = Job.STATUS_FAILED
+            job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+        else:
+            # выполненные задачи не хранятся, в таблице остаются только ожидающие и упавшие
+            job.delete()
+        finally:
+            done.set()
+            heartbeat.join()
+            close_old_connections()
+        return True
@@ -0,0 +1,221 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs.models import Job
+from apps.jobs.services.services import JobWorker, enqueue, get_retry_delay, register
+
+calls = []
+
+
+@register('jobs.test_ok')
+def ok_task(value=None):
+    calls.append(value)
+
+
+@register('jobs.test_fail')
+def fail_task(**payload):
+    raise RuntimeError('task failed')
+
+
+@register('jobs.test_slow')
+def slow_task(seconds, lock_timeout):
+    time.sleep(seconds)
+    # пока задача выполняется, другой воркер её не забирает
+    calls.append(JobWorker(lock_timeout=lock_timeout, tasks=['jobs.test_slow']).claim())
+
+
+TEST_TASKS = ['jobs.test_ok', 'jobs.test_fail']
+
+
+class EnqueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(JOBS_RUN_INLINE=False, JOBS_MAX_ATTEMPTS=3)
+    def test_enqueue_creates_job(self):
+        before = timezone.now()
+        job = enqueue('jobs.test_ok', {'value': 1}, delay=60)
+
+        job.refresh_from_db()
+        self.assertEqual(job.task, 'jobs.test_ok')
+        self.assertEqual(job.payload, {'value': 1})
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(job.attempts, 0)
+        self.assertEqual(job.max_attempts, 3)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=60))
+        self.assertEqual(calls, [])
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_unknown_task(self):
+        with self.assertRaises(LookupError):
+            enqueue('jobs.missing')
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('jobs.test_ok', {'value': 1})
+            self.assertEqual(calls, [])
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_BACKOFF=10, JOBS_RETRY_BACKOFF_MAX=60)
+class JobWorkerTests(TransactionTestCase):
+    # run_once закрывает соединение, как в потоке воркера, поэтому без транзакции TestCase
+    def setUp(self):
+        calls.clear()
+        self.worker = JobWorker(lock_timeout=600, tasks=TEST_TASKS)
+
+    def test_retry_delay_grows_with_jitter(self):
+        for attempts, delay in [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)]:
+            delays = [get_retry_delay(attempts) for _ in range(50)]
+            for value in delays:
+                self.assertGreaterEqual(value, delay * 0.8)
+                self.assertLessEqual(value, delay * 1.2)
+            # разброс: повторы разных задач не совпадают по времени
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_success_deletes_job(self):
+        job = enqueue('jobs.test_ok', {'value': 1})
+
+        self.assertTrue(self.worker.run_once())
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+        self.assertFalse(self.worker.run_once())
+
+    def test_failure_is_retried_with_backoff(self):
+        job = enqueue('jobs.test_fail', max_attempts=3)
+
+        before = timezone.now()
+        self.assertTrue(self.worker.run_once())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(job.locked_at)
+        self.assertIn('RuntimeError: task failed', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=8))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=12))
+
+        # до наступления run_at задача не берётся
+        self.assertFalse(self.worker.run_once())
+
+    def test_failure_after_max_attempts(self):
+        job = enqueue('jobs.test_fail', max_attempts=2)
+        Job.objects.filter(pk=job.pk).update(attempts=1)
+
+        self.assertTrue(self.worker.run_once())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertFalse(self.worker.run_once())
+
+    def test_stale_running_job_is_reclaimed(self):
+        now = timezone.now()
+        stale = Job.objects.create(
+            task='jobs.test_ok', status=Job.STATUS_RUNNING, attempts=1,
+            locked_at=now - timedelta(seconds=601),
+        )
+        Job.objects.create(
+            task='jobs.test_ok', status=Job.STATUS_RUNNING, attempts=1,
+            locked_at=now - timedelta(seconds=10),
+        )
+
+        job = self.worker.claim()
+        self.assertEqual(job.pk, stale.pk)
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+        self.assertEqual(job.attempts, 2)
+        self.assertGreater(job.locked_at, now)
+        # задача, которую воркер выполняет сейчас, не забирается
+        self.assertIsNone(self.worker.claim())
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job = Job.objects.create(
+            task='jobs.test_ok', status=Job.STATUS_RUNNING, attempts=3, max_attempts=3,
+            locked_at=timezone.now() - timedelta(seconds=601),
+        )
+
+        self.assertIsNone(self.worker.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNone(job.locked_at)
+        self.assertEqual(calls, [])
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        job = enqueue('jobs.test_slow', {'seconds': 1, 'lock_timeout': 0.3})
+
+        self.assertTrue(JobWorker(lock_timeout=0.3, tasks=['jobs.test_slow']).run_once())
+        self.assertEqual(calls, [None])
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class JobClaimContentionTests(TransactionTestCase):
+    JOBS_COUNT = 20
+    WORKERS_COUNT = 8
+
+    def create_jobs(self, count):
+        now = timezone.now()
+        return [
+            Job.objects.create(task='jobs.test_ok', run_at=now - timedelta(minutes=count - index))
+            for index in range(count)
+        ]
+
+    def test_locked_job_is_skipped(self):
+        first, second = self.create_jobs(2)
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=first.pk)
+                    locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(timeout=10))
+            # SKIP LOCKED: воркер не ждёт блокировку, а берёт следующую задачу
+            job = JobWorker(tasks=TEST_TASKS).claim()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(job.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.status, Job.STATUS_QUEUED)
+
+    def test_parallel_workers_claim_each_job_once(self):
+        jobs = self.create_jobs(self.JOBS_COUNT)
+        barrier = threading.Barrier(self.WORKERS_COUNT)
+        claimed = []
+
+        def run():
+            worker = JobWorker(tasks=TEST_TASKS)
+            try:
+                barrier.wait()
+                while (job := worker.claim()) is not None:
+                    claimed.append(job.pk)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(self.WORKERS_COUNT)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(claimed), sorted(job.pk for job in jobs))
+        self.assertFalse(Job.objects.exclude(status=Job.STATUS_RUNNING).exists())
+        self.assertEqual(set(Job.objects.values_list('attempts', flat=True)), {1})
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from apps.news.models import New
+from apps.photo.services.services import get_photo_url
 from .forms import NewAdminForm
 
 
@@ -22,7 +23,7 @@ class NewAdmin(admin.ModelAdmin):
 
     def display_photo(self, obj):
         if obj.photo and obj.photo.image:
-            return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', obj.photo.image.url)
+            return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', get_photo_url(obj.photo.image))
         return "No Photo"
 
     display_photo.short_description = 'Current Photo'
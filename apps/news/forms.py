@@ -1,6 +1,7 @@
 # apps/news/forms.py
 
 from django import forms
+from apps.photo.services.services import PhotoService
 from .models import New, Photo
 
 
@@ -38,25 +39,14 @@ class NewAdminForm(forms.ModelForm):
         if not commit:
             new_instance.save()
             if photo_upload:
-                if new_instance.photo:
-                    new_instance.photo.delete()
-                    photo = Photo(image=photo_upload)
-                    photo.new_info = {'author': new_instance.author, 'title': new_instance.title}
-                    photo.save()
-                    new_instance.photo = photo
-                    new_instance.save()
-                else:
-                    # photo = Photo(image=photo_upload)
-                    # photo.new_title = self.cleaned_data.get('title')
-                    # photo.save()
-                    # new_instance.photo = photo
-                    # new_instance.save()
-
-                    photo = Photo(image=photo_upload)
-                    photo.new_info = {'author': new_instance.author, 'title': new_instance.title}
-                    photo.save()
-                    new_instance.photo = photo
-                    new_instance.save()
+                old_photo = new_instance.photo
+                new_instance.photo, _ = PhotoService.get_or_create(
+                    photo_upload, owner=new_instance,
+                    new_info={'author': new_instance.author, 'title': new_instance.title},
+                )
+                new_instance.save()
+                if old_photo != new_instance.photo:
+                    PhotoService.release(old_photo)
             elif existing_photo:
                 new_instance.photo = existing_photo
                 new_instance.save()
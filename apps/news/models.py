@@ -11,3 +11,8 @@ class New(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     photo = models.OneToOneField(Photo, on_delete=models.CASCADE, null=True, blank=True)
     author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='new_created_at_id_idx'),
+        ]
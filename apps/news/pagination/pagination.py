@@ -1,7 +1,7 @@
-from rest_framework import pagination
+from common.pagination import BasePagination
 
 
-class NewsPagination(pagination.PageNumberPagination):
+class NewsPagination(BasePagination):
+    ordering = ('-created_at', '-id')
     page_size = 3
-    page_size_query_param = 'page_size'
     max_page_size = 10
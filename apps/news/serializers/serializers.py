@@ -3,6 +3,7 @@ from rest_framework import serializers
 from apps.news.models import New
 from apps.photo.models import Photo
 from apps.photo.serializers.serializers import PhotoSerializer
+from apps.photo.services.services import PhotoService
 from apps.users.models import User
 
 
@@ -53,10 +54,9 @@ class NewCreateSerializer(serializers.ModelSerializer):
         new = New.objects.create(**validated_data)
 
         if photo_upload:
-            photo = Photo(image=photo_upload)
-            photo.new_info = {'author': new.author, 'title': new.title}
-            photo.save()
-            new.photo = photo
+            new.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=new, new_info={'author': new.author, 'title': new.title}
+            )
             new.save()
         elif existing_photo:
             new.photo = existing_photo
@@ -68,20 +68,11 @@ class NewCreateSerializer(serializers.ModelSerializer):
         photo_upload = validated_data.pop('photo_upload', None)
         existing_photo = validated_data.pop('existing_photo', None)
 
+        old_photo = instance.photo
         if photo_upload:
-            if instance.photo:
-                instance.photo.delete()
-                photo = Photo(image=photo_upload)
-                photo.new_info = {'author': instance.author, 'title': instance.title}
-                photo.save()
-                instance.photo = photo
-                instance.save()
-            else:
-                photo = Photo(image=photo_upload)
-                photo.new_info = {'author': instance.author, 'title': instance.title}
-                photo.save()
-                instance.photo = photo
-                instance.save()
+            instance.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=instance, new_info={'author': instance.author, 'title': instance.title}
+            )
         elif existing_photo:
             instance.photo = existing_photo
 
@@ -89,6 +80,9 @@ class NewCreateSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         instance.save()
+        if photo_upload and old_photo != instance.photo:
+            # фотография может быть общей с аватаром или портфолио
+            PhotoService.release(old_photo)
         return instance
 
 
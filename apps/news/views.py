@@ -7,7 +7,7 @@ from apps.news.serializers.serializers import NewSerializer, NewCreateSerializer
 
 
 class NewViewSet(viewsets.ModelViewSet):
-    queryset = New.objects.all()
+    queryset = New.objects.select_related('photo').prefetch_related('photo__derivatives')
     pagination_class = NewsPagination
 
     def get_serializer_class(self):
@@ -51,19 +51,10 @@ class NewViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-
-        page = request.query_params.get('page', None)
-        page_size = request.query_params.get('page_size', None)
-
-        if page or page_size:
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -0,0 +1,14 @@
+from django_filters import rest_framework as filters
+
+from apps.order.models import Order
+
+
+class OrderFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
+    executor = filters.NumberFilter(field_name='executor_id')
+    schedule = filters.NumberFilter(field_name='schedule_id')
+
+    class Meta:
+        model = Order
+        fields = ['date_from', 'date_to', 'executor', 'schedule']
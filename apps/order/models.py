@@ -1,21 +1,25 @@
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.core.exceptions import ValidationError
 from apps.schedule.models import Schedule
 
 
 class Order(models.Model):
+    SLOT_CONSTRAINT_NAME = 'unique_order_per_schedule_date'
+
+    # одиночные индексы не нужны: их покрывают составные (executor, date) и (client, date)
     executor = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
-        related_name='executor'
+        related_name='executor',
+        db_index=False
     )
     client = models.ForeignKey(
         get_user_model(),
         on_delete=models.CASCADE,
         related_name='client',
         null=True,
-        blank=True
+        blank=True,
+        db_index=False
     )
     schedule = models.ForeignKey(
         Schedule,
@@ -28,22 +32,15 @@ class Order(models.Model):
 
     class Meta:
         constraints = [
+            # один слот расписания на дату можно забронировать только один раз
             models.UniqueConstraint(
-                fields=['executor', 'client', 'schedule', 'date'],
-                name='unique_booking_per_schedule'
+                fields=['schedule', 'date'],
+                name='unique_order_per_schedule_date',
+                violation_error_message="This schedule slot is already booked for the selected date.",
             )
         ]
-
-    def clean(self):
-        super().clean()
-        overlapping_orders = Order.objects.filter(
-            schedule=self.schedule,
-            date=self.date
-        ).exclude(id=self.id)
-
-        if overlapping_orders.exists():
-            raise ValidationError("This schedule slot is already booked for the selected date.")
-
-    def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
+        indexes = [
+            models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+            models.Index(fields=['executor', 'date'], name='order_executor_date_idx'),
+            models.Index(fields=['client', 'date'], name='order_client_date_idx'),
+        ]
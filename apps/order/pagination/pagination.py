@@ -0,0 +1,7 @@
+from common.pagination import BasePagination
+
+
+class OrderPagination(BasePagination):
+    ordering = ('date', 'id')
+    page_size = 50
+    max_page_size = 200
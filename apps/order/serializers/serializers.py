@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from apps.order.models import Order
+from apps.order.services.services import BookingService
 from apps.schedule.models import Schedule
 from django.utils.timezone import datetime
 
@@ -12,9 +13,37 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+def validate_participants(data, current_user):
+    """
+    Общие проверки клиента и исполнителя для одиночного и пакетного бронирования.
+    Если клиент не указан, им становится текущий пользователь.
+    """
+    client = data.get('client', None)
+    executor = data.get('executor', None)
+
+    if hasattr(client, 'studio_profile'):
+        raise ValidationError({'client': 'Studio cannot create orders'})
+
+    if client is None:
+        client = current_user
+        data['client'] = client
+
+    if client != current_user and not current_user.is_superuser:
+        raise ValidationError({'client': 'You cannot create orders for another client'})
+
+    if not (hasattr(executor, 'studio_profile') or hasattr(executor, 'photographer_profile')):
+        raise ValidationError({'executor': 'Executor must be studio or photographer'})
+
+    return data
+
+
 class CreateOrderSerializer(serializers.ModelSerializer):
+    # профили нужны для проверок ниже, подгружаем их вместе с пользователем
+    executor = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.select_related('studio_profile', 'photographer_profile'),
+    )
     client = serializers.PrimaryKeyRelatedField(
-        queryset=get_user_model().objects.all(),
+        queryset=get_user_model().objects.select_related('studio_profile'),
         required=False,
         allow_null=True
     )
@@ -22,6 +51,8 @@ class CreateOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['executor', 'client', 'schedule', 'date']
+        # без UniqueTogetherValidator: лишний запрос, который к тому же не защищает от гонки
+        validators = []
 
     def __init__(self, *args, **kwargs):
         super(CreateOrderSerializer, self).__init__(*args, **kwargs)
@@ -39,35 +70,18 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         current_user = request.user
 
-        client = data.get('client', None)
-        executor = data.get('executor', None)
         schedule = data.get('schedule', None)
         date = data.get('date', None)
 
-        if hasattr(client, 'studio_profile'):
-            raise ValidationError({'client': 'Studio cannot create orders'})
-
-        if client is None:
-            client = current_user
-            data['client'] = client
-
-        if client != current_user and not current_user.is_superuser:
-            raise ValidationError({'client': 'You cannot create orders for another client'})
-
-        if not (hasattr(executor, 'studio_profile') or hasattr(executor, 'photographer_profile')):
-            raise ValidationError({'executor': 'Executor must be studio or photographer'})
+        validate_participants(data, current_user)
 
         if not self.is_date_matching_schedule(date, schedule):
             raise ValidationError({'date': 'The selected date does not match the weekday of the schedule'})
 
-        if not self.is_exec_matching_schedule(executor, schedule):
+        if not self.is_exec_matching_schedule(data['executor'], schedule):
             raise ValidationError({'Executor': 'The selected executor does not match the executor of the schedule'})
 
-        overlapping_orders = Order.objects.filter(schedule=schedule, date=date)
-
-        if overlapping_orders.exists():
-            raise ValidationError("This schedule slot is already booked for the selected date.")
-
+        # занятость слота проверяет уникальный индекс при вставке, см. BookingService
         return data
 
     def validate_update(self, data):
@@ -97,14 +111,6 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         if not self.is_date_matching_schedule(date, schedule):
             raise ValidationError({'date': 'Выбранная дата не соответствует дню недели расписания.'})
 
-        overlapping_orders = Order.objects.filter(
-            schedule=schedule,
-            date=date
-        ).exclude(pk=instance.pk)
-
-        if overlapping_orders.exists():
-            raise ValidationError("Этот временной слот уже занят на выбранную дату.")
-
         return data
 
     def is_date_matching_schedule(self, date, schedule):
@@ -115,11 +121,51 @@ class CreateOrderSerializer(serializers.ModelSerializer):
 
     def is_exec_matching_schedule(self, executor, schedule):
         if executor and schedule:
-            return executor == schedule.executor
+            return executor.pk == schedule.executor_id
         return False
 
     def create(self, validated_data):
-        return super().create(validated_data)
+        return BookingService.book(**validated_data)
 
     def update(self, instance, validated_data):
-        return super().update(instance, validated_data)
+        return BookingService.rebook(instance, **validated_data)
+
+
+class BulkOrderItemSerializer(serializers.Serializer):
+    # id, а не PrimaryKeyRelatedField: расписания загружаются одним запросом в BookingService
+    schedule = serializers.IntegerField(min_value=1)
+    date = serializers.DateField()
+
+
+class OrderRecurrenceSerializer(serializers.Serializer):
+    schedules = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    interval = serializers.IntegerField(min_value=1, default=1, help_text="Шаг в неделях")
+
+    def validate(self, data):
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': 'End date cannot be earlier than start date'})
+        return data
+
+
+class BulkCreateOrderSerializer(serializers.Serializer):
+    MODE_ALL_OR_NOTHING = 'all_or_nothing'
+    MODE_BEST_EFFORT = 'best_effort'
+
+    executor = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.select_related('studio_profile', 'photographer_profile'),
+    )
+    client = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.select_related('studio_profile'),
+        required=False,
+        allow_null=True
+    )
+    items = BulkOrderItemSerializer(many=True, required=False)
+    recurrence = OrderRecurrenceSerializer(required=False)
+    mode = serializers.ChoiceField(choices=[MODE_ALL_OR_NOTHING, MODE_BEST_EFFORT], default=MODE_ALL_OR_NOTHING)
+
+    def validate(self, data):
+        if ('items' in data) == ('recurrence' in data):
+            raise ValidationError({'non_field_errors': 'Pass either items or recurrence'})
+        return validate_participants(data, self.context['request'].user)
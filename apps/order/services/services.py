@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from apps.order.models import Order
+from apps.schedule.models import Schedule
+from apps.schedule.services.overlap import OverlapService
+from apps.schedule.services.calendar import CalendarService
+
+
+class BookingService:
+    """
+    Занятость слота проверяет уникальный индекс (schedule, date), а не запрос
+    перед вставкой: из двух параллельных бронирований пройдёт ровно одно.
+    """
+    SLOT_TAKEN_MESSAGE = "This schedule slot is already booked for the selected date."
+    SLOT_TAKEN_UPDATE_MESSAGE = "Этот временной слот уже занят на выбранную дату."
+    MAX_BULK_ORDERS = 200
+
+    @staticmethod
+    def is_slot_conflict(error):
+        diag = getattr(error.__cause__, 'diag', None)
+        return getattr(diag, 'constraint_name', None) == Order.SLOT_CONSTRAINT_NAME
+
+    @staticmethod
+    def book(**fields):
+        try:
+            with transaction.atomic():
+                return Order.objects.create(**fields)
+        except IntegrityError as error:
+            if BookingService.is_slot_conflict(error):
+                raise ValidationError({'non_field_errors': [BookingService.SLOT_TAKEN_MESSAGE]})
+            raise
+
+    @staticmethod
+    def rebook(order, **fields):
+        for attr, value in fields.items():
+            setattr(order, attr, value)
+        try:
+            with transaction.atomic():
+                order.save()
+        except IntegrityError as error:
+            if BookingService.is_slot_conflict(error):
+                raise ValidationError({'non_field_errors': [BookingService.SLOT_TAKEN_UPDATE_MESSAGE]})
+            raise
+        return order
+
+    @staticmethod
+    def expand_recurrence(schedules, start_date, end_date, interval=1):
+        """
+        Даты слотов по правилу "каждые interval недель с start_date по end_date".
+        """
+        items = []
+        for schedule in schedules:
+            current_date = start_date + timedelta(days=(schedule.weekday - 1 - start_date.weekday()) % 7)
+            while current_date <= end_date:
+                items.append((schedule.pk, current_date))
+                current_date += timedelta(weeks=interval)
+        return sorted(items, key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def check_items(executor, items, schedules, booked_intervals):
+        """
+        Проверяет пары (schedule_id, date) по заранее загруженным расписаниям
+        и занятым интервалам исполнителя {date: IntervalIndex}.
+        Возвращает (пары без ошибок, ошибки по индексам).
+        """
+        valid_items = []
+        errors = []
+        for index, (schedule_id, date) in enumerate(items):
+            schedule = schedules.get(schedule_id)
+            if schedule is None:
+                error = 'Schedule does not exist'
+            elif schedule.executor_id != executor.pk:
+                error = 'The selected executor does not match the executor of the schedule'
+            elif date.weekday() + 1 != schedule.weekday:
+                error = 'The selected date does not match the weekday of the schedule'
+            # add заодно отсекает повторы и пересечения внутри самого запроса
+            elif not booked_intervals[date].add(schedule.start_time, schedule.end_time):
+                error = BookingService.SLOT_TAKEN_MESSAGE
+            else:
+                valid_items.append((schedule_id, date))
+                continue
+            errors.append({'index': index, 'schedule': schedule_id, 'date': date.isoformat(), 'error': error})
+        return valid_items, errors
+
+    @staticmethod
+    def book_many(executor, client, items=None, recurrence=None, best_effort=False):
+        """
+        Бронирует несколько слотов одного исполнителя: либо список пар
+        (schedule_id, date), либо recurrence = {'schedules', 'start_date',
+        'end_date', 'interval'}. Один запрос за расписаниями, один за занятыми
+        интервалами исполнителя и один bulk_create.
+        В режиме best_effort создаются только свободные слоты, иначе при любой
+        ошибке не создаётся ничего. Возвращает (заказы, ошибки по индексам слотов).
+        """
+        schedule_ids = recurrence['schedules'] if recurrence else {schedule_id for schedule_id, _ in items}
+        schedules = Schedule.objects.in_bulk(schedule_ids)
+
+        if recurrence:
+            missing = set(schedule_ids) - schedules.keys()
+            if missing:
+                raise ValidationError({'recurrence': {'schedules': [f'Schedules {sorted(missing)} do not exist']}})
+            items = BookingService.expand_recurrence(
+                schedules.values(), recurrence['start_date'], recurrence['end_date'], recurrence.get('interval', 1)
+            )
+        if not items:
+            raise ValidationError({'non_field_errors': ['No slots to book']})
+        if len(items) > BookingService.MAX_BULK_ORDERS:
+            raise ValidationError(
+                {'non_field_errors': [f'Cannot book more than {BookingService.MAX_BULK_ORDERS} slots at once']}
+            )
+
+        dates = [date for _, date in items]
+        booked_intervals = OverlapService.get_booked_intervals(executor, min(dates), max(dates))
+
+        valid_items, errors = BookingService.check_items(executor, items, schedules, booked_intervals)
+        if errors and not best_effort:
+            return [], errors
+
+        orders = [
+            Order(executor=executor, client=client, schedule_id=schedule_id, date=date)
+            for schedule_id, date in valid_items
+        ]
+        if not orders:
+            return [], errors
+
+        # bulk_create не шлёт сигналы, поэтому календарь синхронизируется здесь - той же задачей
+        weekdays = {date.weekday() + 1 for _, date in valid_items}
+        if not best_effort:
+            try:
+                with transaction.atomic():
+                    orders = Order.objects.bulk_create(orders)
+                    CalendarService.schedule_sync_orders(executor.pk, min(dates), max(dates), weekdays=weekdays)
+                    return orders, errors
+            except IntegrityError as error:
+                if BookingService.is_slot_conflict(error):
+                    raise ValidationError({'non_field_errors': [BookingService.SLOT_TAKEN_MESSAGE]})
+                raise
+
+        # слот мог занять параллельный запрос: такие строки пропускаются, а созданные
+        # читаются обратно, потому что при ignore_conflicts Postgres не возвращает id
+        requested = set(valid_items)
+        with transaction.atomic():
+            Order.objects.bulk_create(orders, ignore_conflicts=True)
+            CalendarService.schedule_sync_orders(executor.pk, min(dates), max(dates), weekdays=weekdays)
+            created = [
+                order for order in Order.objects.filter(
+                    client=client,
+                    schedule_id__in={schedule_id for schedule_id, _ in requested},
+                    date__gte=min(dates),
+                    date__lte=max(dates),
+                ).order_by('date', 'id')
+                if (order.schedule_id, order.date) in requested
+            ]
+        lost = requested - {(order.schedule_id, order.date) for order in created}
+        for index, (schedule_id, date) in enumerate(items):
+            if (schedule_id, date) in lost:
+                lost.discard((schedule_id, date))
+                errors.append({
+                    'index': index, 'schedule': schedule_id, 'date': date.isoformat(),
+                    'error': BookingService.SLOT_TAKEN_MESSAGE,
+                })
+        return created, errors
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import re
+import threading
+from datetime import date, time, timedelta
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from apps.jobs.models import Job
+from apps.order.models import Order
+from apps.order.services.services import BookingService
+from apps.schedule.models import Schedule
+from apps.users.models import Photographer
+from common.testing.pagination import follow_pages
+from common.testing.plans import QueryPlanTestCase, explain, iter_plan_nodes
+
+
+class BookingContentionTests(APITransactionTestCase):
+    CLIENTS_COUNT = 8
+
+    def setUp(self):
+        self.executor = self.create_user(0)
+        Photographer.objects.create(description='Photographer', base_user=self.executor)
+        self.date = date.today() + timedelta(days=7)
+        self.schedule = Schedule.objects.create(
+            executor=self.executor,
+            weekday=self.date.weekday() + 1,
+            start_time=time(10),
+            end_time=time(12),
+        )
+        self.clients = [self.create_user(index) for index in range(1, self.CLIENTS_COUNT + 1)]
+
+    @staticmethod
+    def create_user(index):
+        return get_user_model().objects.create_user(
+            email=f'user{index}@example.com',
+            password='password',
+            phone_number=f'+37529{index:07d}',
+        )
+
+    def book(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/order/', {
+            'executor': self.executor.pk,
+            'schedule': self.schedule.pk,
+            'date': self.date.isoformat(),
+        }, format='json')
+
+    def test_parallel_bookings_of_one_slot(self):
+        barrier = threading.Barrier(self.CLIENTS_COUNT)
+        responses = []
+
+        def run(user):
+            try:
+                barrier.wait()
+                responses.append(self.book(user))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in self.clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(statuses, [201] + [400] * (self.CLIENTS_COUNT - 1))
+        for response in responses:
+            if response.status_code == 400:
+                self.assertEqual(response.data['non_field_errors'], [BookingService.SLOT_TAKEN_MESSAGE])
+        self.assertEqual(Order.objects.filter(schedule=self.schedule, date=self.date).count(), 1)
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class BulkBookingTests(APITestCase):
+    def setUp(self):
+        self.executor = BookingContentionTests.create_user(0)
+        Photographer.objects.create(description='Photographer', base_user=self.executor)
+        self.client_user = BookingContentionTests.create_user(1)
+        self.date = date.today() + timedelta(days=7)
+        self.schedules = [
+            Schedule.objects.create(
+                executor=self.executor, weekday=self.date.weekday() + 1, start_time=time(hour), end_time=time(hour + 1),
+            )
+            for hour in (10, 11, 12)
+        ]
+        # средний слот уже занят другим клиентом
+        Order.objects.create(
+            executor=self.executor, client=BookingContentionTests.create_user(2),
+            schedule=self.schedules[1], date=self.date,
+        )
+        Job.objects.all().delete()
+
+    def book(self, mode):
+        self.client.force_authenticate(self.client_user)
+        return self.client.post('/api/order/bulk/', {
+            'executor': self.executor.pk,
+            'mode': mode,
+            'items': [{'schedule': schedule.pk, 'date': self.date.isoformat()} for schedule in self.schedules],
+        }, format='json')
+
+    def assert_conflict_error(self, errors):
+        self.assertEqual(errors, [{
+            'index': 1, 'schedule': self.schedules[1].pk, 'date': self.date.isoformat(),
+            'error': BookingService.SLOT_TAKEN_MESSAGE,
+        }])
+
+    def test_all_or_nothing_books_nothing_on_conflict(self):
+        response = self.book('all_or_nothing')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], [])
+        self.assert_conflict_error(response.data['errors'])
+        self.assertFalse(Order.objects.filter(client=self.client_user).exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_best_effort_skips_only_conflicting_slot(self):
+        response = self.book('best_effort')
+
+        self.assertEqual(response.status_code, 201)
+        self.assert_conflict_error(response.data['errors'])
+        self.assertEqual(
+            set(Order.objects.filter(client=self.client_user).values_list('schedule_id', flat=True)),
+            {self.schedules[0].pk, self.schedules[2].pk},
+        )
+        # календарь синхронизируется той же задачей, что и при одиночном бронировании
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'schedule.sync_orders')
+        self.assertEqual(job.payload['date_from'], self.date.isoformat())
+
+    def test_all_or_nothing_books_free_slots(self):
+        Order.objects.all().delete()
+        Job.objects.all().delete()
+
+        response = self.book('all_or_nothing')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(Order.objects.filter(client=self.client_user).count(), 3)
+        self.assertEqual(Job.objects.filter(task='schedule.sync_orders').count(), 1)
+
+
+class OrderPaginationTests(APITestCase):
+    def setUp(self):
+        executor = BookingContentionTests.create_user(0)
+        self.client_user = BookingContentionTests.create_user(1)
+        first_date = date.today() + timedelta(days=7)
+        schedules = [
+            Schedule.objects.create(
+                executor=executor, weekday=first_date.weekday() + 1, start_time=time(hour), end_time=time(hour + 1),
+            )
+            for hour in (13, 10, 12, 11)
+        ]
+        # по 4 заказа на дату: ключ сортировки date повторяется
+        for week in range(3):
+            for schedule in schedules:
+                Order.objects.create(
+                    executor=executor, client=self.client_user, schedule=schedule,
+                    date=first_date + timedelta(weeks=week),
+                )
+        self.client.force_authenticate(self.client_user)
+
+    @staticmethod
+    def get_ids(responses):
+        return [order['id'] for response in responses for order in response.data['results']]
+
+    def test_pages_are_stable_with_duplicate_dates(self):
+        expected = list(Order.objects.order_by('date', 'id').values_list('id', flat=True))
+
+        with CaptureQueriesContext(connection) as context:
+            pages = follow_pages(self.client, '/api/order/?page_size=5')
+        self.assertEqual(self.get_ids(pages), expected)
+        self.assertEqual([len(page.data['results']) for page in pages], [5, 5, 2])
+        # keyset: ни OFFSET, ни COUNT(*)
+        self.assertFalse([query for query in context.captured_queries if re.search(r'OFFSET|COUNT\(', query['sql'])])
+
+        back = follow_pages(self.client, pages[-1].data['previous'], link='previous')
+        self.assertEqual(self.get_ids(reversed(back)), expected[:10])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/order/', {'cursor': 'invalid'}).status_code, 404)
+
+
+class OrderListTests(QueryPlanTestCase):
+    large_models = (Order,)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        order = Order.objects.filter(
+            executor__studio_profile__isnull=False,
+            client__photographer_profile__isnull=True,
+        ).order_by('id').first()
+        cls.client_user = order.client
+        cls.executor_user = order.executor
+        cls.photographer = get_user_model().objects.filter(photographer_profile__isnull=False).order_by('id').first()
+
+    def get_list(self, user, **params):
+        response, selects = self.capture('GET', '/api/order/', user, params)
+        self.assertEqual(response.status_code, 200)
+        order_queries = [sql for sql in selects if f'FROM "{Order._meta.db_table}"' in sql]
+        self.assertEqual(len(order_queries), 1)
+        return response, order_queries[0]
+
+    def assert_uses_indexes(self, sql, index_names):
+        self.assertTrue(set(index_names) <= {node.get('Index Name') for node in iter_plan_nodes(explain(sql))})
+
+    def test_list_is_scoped_to_user(self):
+        for user in (self.client_user, self.executor_user):
+            self.client.force_authenticate(user)
+            pages = follow_pages(self.client, '/api/order/?page_size=20')
+            self.assertGreater(len(pages), 1)
+            orders = [order for page in pages for order in page.data['results']]
+            for order in orders:
+                self.assertIn(user.pk, (order['client'], order['executor']))
+            # пройдены все страницы, а не только первая
+            self.assertEqual(
+                sorted(order['id'] for order in orders),
+                sorted(Order.objects.filter(Q(client=user) | Q(executor=user)).values_list('id', flat=True)),
+            )
+
+    def test_list_filters(self):
+        order = Order.objects.filter(executor=self.executor_user).order_by('date', 'id').first()
+        response, _ = self.get_list(
+            self.executor_user,
+            date_from=order.date.isoformat(),
+            date_to=order.date.isoformat(),
+            schedule=order.schedule_id,
+        )
+        self.assertEqual([item['id'] for item in response.data['results']], [order.pk])
+
+    def test_list_uses_user_date_indexes(self):
+        date_from = (date.today() - timedelta(weeks=1)).isoformat()
+        for params in ({}, {'date_from': date_from}):
+            _, sql = self.get_list(self.client_user, **params)
+            self.assert_uses_indexes(sql, ['order_client_date_idx'])
+            _, sql = self.get_list(self.executor_user, **params)
+            self.assert_uses_indexes(sql, ['order_executor_date_idx'])
+
+    def test_plans(self):
+        date_from = (date.today() - timedelta(weeks=1)).isoformat()
+        self.assert_plans('order_list_client', '/api/order/', self.client_user)
+        self.assert_plans('order_list_executor', f'/api/order/?date_from={date_from}', self.executor_user)
+        self.assert_plans('order_list_photographer', '/api/order/', self.photographer)
+        order = Order.objects.filter(client=self.client_user).first()
+        self.assert_plans('order_retrieve', f'/api/order/{order.pk}/', self.client_user)
@@ -1,23 +1,52 @@
+from django.db.models import Q
 from django.shortcuts import render
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from apps.users.permissions.permissions import IsClient
+from apps.order.filters.filters import OrderFilter
 from apps.order.models import Order
+from apps.order.pagination.pagination import OrderPagination
+from apps.order.services.services import BookingService
 from rest_framework.response import Response
 from apps.order.serializers.serializers import (
-    OrderSerializer, CreateOrderSerializer,
+    OrderSerializer, CreateOrderSerializer, BulkCreateOrderSerializer,
 )
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
+    pagination_class = OrderPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
+
+    def get_queryset(self):
+        """
+        Пользователь видит только заказы, где он клиент или исполнитель.
+        Студия не бывает клиентом, а пользователь без профиля - исполнителем,
+        поэтому OR нужен только фотографу: остальным хватает одного из
+        индексов (client, date) или (executor, date).
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_superuser:
+            return queryset
+        if hasattr(user, 'studio_profile'):
+            return queryset.filter(executor=user)
+        if hasattr(user, 'photographer_profile'):
+            return queryset.filter(Q(client=user) | Q(executor=user))
+        return queryset.filter(client=user)
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return CreateOrderSerializer
+        if self.action == 'bulk':
+            return BulkCreateOrderSerializer
         return OrderSerializer
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in ['create', 'update', 'partial_update', 'bulk']:
             permissions_classes = [IsClient]
         else:
             permissions_classes = [permissions.IsAuthenticated]
@@ -54,14 +83,40 @@ class OrderViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         data = serializer.data
 
-        return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=BulkCreateOrderSerializer, responses={201: None, 400: None})
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Бронирует несколько слотов одного исполнителя: список items [{schedule, date}]
+        или recurrence {schedules, start_date, end_date, interval}.
+        mode=all_or_nothing (по умолчанию) не создаёт ничего при любой ошибке,
+        mode=best_effort создаёт свободные слоты и возвращает ошибки по остальным.
+        """
+        serializer = self.get_serializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        items = data.get('items')
+        orders, errors = BookingService.book_many(
+            data['executor'],
+            data['client'],
+            items=[(item['schedule'], item['date']) for item in items] if items is not None else None,
+            recurrence=data.get('recurrence'),
+            best_effort=data['mode'] == BulkCreateOrderSerializer.MODE_BEST_EFFORT,
+        )
+        response_data = {
+            'created': OrderSerializer(orders, many=True, context={'request': request}).data,
+            'errors': errors,
+        }
+        return Response(response_data, status=status.HTTP_201_CREATED if orders else status.HTTP_400_BAD_REQUEST)
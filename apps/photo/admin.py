@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.safestring import mark_safe
 
 from apps.photo.models import Photo
+from apps.photo.services.services import get_photo_url
 
 
 @admin.register(Photo)
@@ -14,5 +15,5 @@ class PhotoAdmin(admin.ModelAdmin):
     @admin.display(description="Photo")
     def image_image(self, photo: Photo):
         if photo.image:
-            return mark_safe(f"<img src='{photo.image.url}' width=50 />")
+            return mark_safe(f"<img src='{get_photo_url(photo.image)}' width=50 />")
         return "Without photo"
\ No newline at end of file
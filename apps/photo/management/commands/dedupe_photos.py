@@ -0,0 +1,76 @@
+import hashlib
+
+from django.core.management.base import BaseCommand
+
+from apps.photo.models import Photo
+from apps.photo.services.services import PhotoService
+
+
+class Command(BaseCommand):
+    help = 'Hash photos stored before content deduplication and merge photos with identical content'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--dry-run', action='store_true', help='Only report duplicates, change nothing')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        photos = Photo.objects.filter(content_hash__isnull=True).exclude(image='').order_by('pk')
+        # в dry-run хэши не сохраняются, поэтому дубликаты внутри прогона ищутся по этому словарю
+        seen = {}
+
+        last_pk = 0
+        hashed = merged = kept = missing = 0
+        while True:
+            batch = list(photos.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            hashes = {}
+            for photo in batch:
+                try:
+                    hashes[photo.pk] = self.hash_file(photo)
+                except Exception:
+                    missing += 1
+                    self.stderr.write(f'Cannot read photo {photo.pk} ({photo.image.name})')
+            originals = Photo.objects.in_bulk(set(hashes.values()), field_name='content_hash')
+
+            for photo in batch:
+                content_hash = hashes.get(photo.pk)
+                if content_hash is None:
+                    continue
+                original = originals.get(content_hash) or seen.get(content_hash)
+                if original is None:
+                    hashed += 1
+                    seen[content_hash] = photo
+                    if not dry_run:
+                        photo.content_hash = content_hash
+                        photo.save(update_fields=['content_hash'])
+                    continue
+
+                if not PhotoService.can_merge(photo, original):
+                    # обе - аватары или фото новостей, одна Photo не может принадлежать двоим
+                    kept += 1
+                    self.stdout.write(f'Photo {photo.pk} duplicates photo {original.pk}, both are in use, kept')
+                    continue
+
+                merged += 1
+                self.stdout.write(f'Photo {photo.pk} duplicates photo {original.pk}')
+                if not dry_run:
+                    PhotoService.merge(photo, original)
+
+            self.stdout.write(f'Processed photos up to {last_pk}')
+
+        prefix = '[dry run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Hashed {hashed} photos, merged {merged} duplicates, kept {kept}, {missing} unreadable'
+        ))
+
+    @staticmethod
+    def hash_file(photo):
+        hasher = hashlib.sha256()
+        with photo.image.open('rb') as image_file:
+            for chunk in image_file.chunks():
+                hasher.update(chunk)
+        return hasher.hexdigest()
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.photo.services.garbage import MAX_DELETE_BATCH, PhotoGarbageCollector
+
+
+class Command(BaseCommand):
+    help = 'Delete photos nothing references and bucket objects without a photo row'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument('--batch-size', type=int, default=MAX_DELETE_BATCH,
+                            help=f'Rows and objects per batch, at most {MAX_DELETE_BATCH}')
+        parser.add_argument('--rate', type=float, default=500,
+                            help='Maximum deletions per second, 0 for no limit')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Skip photos and objects younger than this, they may belong to an unfinished upload')
+        parser.add_argument('--prefix', default='photos/', help='Only scan bucket objects under this prefix')
+        parser.add_argument('--skip-objects', action='store_true', help='Do not scan the bucket')
+
+    def handle(self, *args, **options):
+        collector = PhotoGarbageCollector(
+            default_storage,
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            min_age=timedelta(hours=options['min_age_hours']),
+            rate=options['rate'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write,
+        )
+        prefix = '[dry run] ' if options['dry_run'] else ''
+
+        photos_count, objects_count = collector.collect_photos()
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Deleted {photos_count} unreferenced photos and {objects_count} of their objects'
+        ))
+
+        if not options['skip_objects']:
+            orphans_count = collector.collect_objects()
+            self.stdout.write(self.style.SUCCESS(f'{prefix}Deleted {orphans_count} objects without a photo'))
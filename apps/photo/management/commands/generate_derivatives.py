@@ -0,0 +1,31 @@
+from django.db.models import Count, Q
+from django.core.management.base import BaseCommand
+
+from apps.photo.models import Photo, PhotoDerivative
+from apps.photo.services.services import DerivativeService
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails and other derivatives and fill missing metadata for existing photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='').annotate(
+            derivatives_count=Count('derivatives')
+        ).filter(
+            Q(derivatives_count__lt=len(PhotoDerivative.SIZES)) | Q(width__isnull=True)
+        ).order_by('pk')
+
+        last_pk = 0
+        created = 0
+        while True:
+            photo_ids = list(photos.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['batch_size']])
+            if not photo_ids:
+                break
+            created += DerivativeService.generate(photo_ids)
+            last_pk = photo_ids[-1]
+            self.stdout.write(f'Processed photos up to {last_pk}, {created} derivatives created')
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} derivatives'))
@@ -1,3 +1,5 @@
+import os
+
 from django.db import models
 from django.utils import timezone
 from social_core.utils import slugify
@@ -28,6 +30,45 @@ def get_upload_path(instance, filename):
 class Photo(models.Model):
     image = models.ImageField(upload_to=get_upload_path, help_text="photo")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # sha256 содержимого; одинаковые файлы хранятся одной Photo
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # метаданные извлекаются один раз при загрузке, размеры - с учётом EXIF-ориентации
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    mime_type = models.CharField(max_length=50, blank=True, editable=False)
+    orientation = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    placeholder = models.CharField(max_length=64, blank=True, editable=False, help_text="BlurHash")
+
+    METADATA_FIELDS = ('width', 'height', 'file_size', 'mime_type', 'orientation', 'placeholder')
 
     def __str__(self):
         return f"Photo {self.id}"
+
+
+def get_derivative_upload_path(instance, filename):
+    original_dir = os.path.dirname(instance.photo.image.name)
+    return f'{original_dir}/derivatives/{instance.size}/{filename}'
+
+
+class PhotoDerivative(models.Model):
+    SIZES = {
+        'thumb': 160,
+        'small': 480,
+        'medium': 1024,
+    }
+
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='derivatives')
+    size = models.CharField(max_length=16, choices=[(size, size) for size in SIZES])
+    image = models.ImageField(upload_to=get_derivative_upload_path, max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['photo', 'size'], name='unique_derivative_per_photo')
+        ]
+
+    def __str__(self):
+        return f"Photo {self.photo_id} ({self.size})"
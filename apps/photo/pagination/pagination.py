@@ -0,0 +1,7 @@
+from common.pagination import BasePagination
+
+
+class PhotoPagination(BasePagination):
+    ordering = ('-id',)
+    page_size = 30
+    max_page_size = 100
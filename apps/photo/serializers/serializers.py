@@ -1,16 +1,42 @@
 from rest_framework import serializers
 
 from apps.photo.models import Photo
+from apps.photo.services.services import get_photo_url, UploadService
 
 
 class PhotoSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = Photo
-        fields = ['id', 'url']
+        fields = ['id', 'url', 'derivatives', *Photo.METADATA_FIELDS]
 
     def get_url(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
+        return get_photo_url(obj.image)
+
+    def get_derivatives(self, obj):
+        return get_derivative_urls(obj)
+
+
+def get_derivative_urls(photo):
+    return {derivative.size: get_photo_url(derivative.image) for derivative in photo.derivatives.all()}
+
+
+class PresignedUploadSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=UploadService.TARGETS)
+    target_id = serializers.IntegerField(required=False, help_text="ID новости или портфолио")
+    filename = serializers.CharField(max_length=100)
+    content_type = serializers.ChoiceField(choices=UploadService.CONTENT_TYPES)
+
+    def validate(self, attrs):
+        if attrs['target'] != UploadService.TARGET_AVATAR and attrs.get('target_id') is None:
+            raise serializers.ValidationError({'target_id': 'Это поле обязательно для новостей и портфолио.'})
+
+        user = self.context['request'].user
+        attrs['target_object'] = UploadService.get_target(user, attrs['target'], attrs.get('target_id'))
+        return attrs
+
+
+class FinalizeUploadSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
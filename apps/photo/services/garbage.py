@@ -0,0 +1,171 @@
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.news.models import New
+from apps.photo.models import Photo, PhotoDerivative
+from apps.portfolio.models import PortfolioPhotos
+
+# S3 DeleteObjects принимает не больше 1000 ключей за запрос
+MAX_DELETE_BATCH = 1000
+
+
+class RateLimiter:
+    """
+    Ограничивает число удалений в секунду, чтобы сборка мусора не мешала
+    основной нагрузке на bucket и БД. rate=0 - без ограничения.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next_at = time.monotonic()
+
+    def wait(self, amount):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        if self._next_at > now:
+            time.sleep(self._next_at - now)
+        self._next_at = max(now, self._next_at) + amount / self.rate
+
+
+class PhotoGarbageCollector:
+    """
+    Удаляет Photo, на которые не ссылаются аватары, новости и портфолио,
+    и объекты в bucket, для которых нет ни Photo, ни PhotoDerivative.
+    Объекты и строки моложе min_age не трогаются: они могут принадлежать
+    загрузке, которая ещё не завершена.
+    """
+
+    def __init__(self, storage, prefix='photos/', batch_size=MAX_DELETE_BATCH, min_age=timedelta(days=1),
+                 rate=0, dry_run=False, log=None):
+        self.storage = storage
+        self.prefix = prefix
+        self.batch_size = min(batch_size, MAX_DELETE_BATCH)
+        self.cutoff = timezone.now() - min_age
+        self.rate_limiter = RateLimiter(rate)
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+
+    def get_orphan_photos(self):
+        return Photo.objects.filter(uploaded_at__lt=self.cutoff).exclude(
+            Exists(get_user_model().objects.filter(photo=OuterRef('pk')))
+        ).exclude(
+            Exists(New.objects.filter(photo=OuterRef('pk')))
+        ).exclude(
+            Exists(PortfolioPhotos.objects.filter(photo=OuterRef('pk')))
+        )
+
+    def collect_photos(self, photo_ids=None):
+        """
+        Удаляет неиспользуемые Photo (все или из photo_ids) вместе с уменьшенными
+        копиями и их объектами. Возвращает (число Photo, число объектов).
+        """
+        orphans = self.get_orphan_photos().order_by('pk')
+        if photo_ids is not None:
+            orphans = orphans.filter(pk__in=photo_ids)
+        last_pk = 0
+        photos_count = objects_count = 0
+        while True:
+            photo_ids = list(orphans.filter(pk__gt=last_pk).values_list('pk', flat=True)[:self.batch_size])
+            if not photo_ids:
+                break
+            last_pk = photo_ids[-1]
+
+            if self.dry_run:
+                names = self.get_object_names(photo_ids)
+            else:
+                self.rate_limiter.wait(len(photo_ids))
+                with transaction.atomic():
+                    # ссылка могла появиться после выборки: блокируем и проверяем ещё раз
+                    photo_ids = list(
+                        orphans.filter(pk__in=photo_ids).select_for_update().values_list('pk', flat=True)
+                    )
+                    names = self.get_object_names(photo_ids)
+                    Photo.objects.filter(pk__in=photo_ids).delete()
+                self.delete_objects(names)
+
+            photos_count += len(photo_ids)
+            objects_count += len(names)
+            self.log(f'Photos up to {last_pk}: {len(photo_ids)} unreferenced, {len(names)} objects')
+        return photos_count, objects_count
+
+    def collect_objects(self):
+        """
+        Удаляет объекты bucket под prefix, на которые не ссылается ни одна строка.
+        Возвращает число объектов.
+        """
+        count = 0
+        page = []
+        for name, modified in self.iter_objects():
+            page.append((name, modified))
+            if len(page) >= self.batch_size:
+                count += self.collect_page(page)
+                page = []
+        if page:
+            count += self.collect_page(page)
+        return count
+
+    def collect_page(self, page):
+        names = [name for name, _ in page]
+        referenced = set(Photo.objects.filter(image__in=names).values_list('image', flat=True))
+        referenced.update(PhotoDerivative.objects.filter(image__in=names).values_list('image', flat=True))
+        orphans = [name for name, modified in page if name not in referenced and modified < self.cutoff]
+        if orphans:
+            self.log(f'{len(orphans)} of {len(page)} objects have no photo, e.g. {orphans[0]}')
+            if not self.dry_run:
+                self.delete_objects(orphans)
+        return len(orphans)
+
+    @staticmethod
+    def get_object_names(photo_ids):
+        names = list(Photo.objects.filter(pk__in=photo_ids).values_list('image', flat=True))
+        names.extend(PhotoDerivative.objects.filter(photo_id__in=photo_ids).values_list('image', flat=True))
+        return [name for name in names if name]
+
+    def iter_objects(self):
+        bucket = getattr(self.storage, 'bucket', None)
+        if bucket is None:
+            yield from self._walk(self.prefix.rstrip('/'))
+            return
+
+        location = getattr(self.storage, 'location', '')
+        key_prefix = f'{location}/{self.prefix}' if location else self.prefix
+        for summary in bucket.objects.filter(Prefix=key_prefix):
+            yield summary.key[len(location) + 1:] if location else summary.key, summary.last_modified
+
+    def _walk(self, path):
+        try:
+            directories, files = self.storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for filename in files:
+            name = os.path.join(path, filename)
+            yield name, self.storage.get_modified_time(name)
+        for directory in directories:
+            yield from self._walk(os.path.join(path, directory))
+
+    def delete_objects(self, names):
+        """
+        Удаляет объекты пачками через S3 DeleteObjects, для других storage - по одному.
+        """
+        bucket = getattr(self.storage, 'bucket', None)
+        for start in range(0, len(names), self.batch_size):
+            batch = names[start:start + self.batch_size]
+            self.rate_limiter.wait(len(batch))
+            if bucket is None:
+                for name in batch:
+                    self.storage.delete(name)
+                continue
+
+            response = bucket.delete_objects(Delete={
+                'Objects': [{'Key': self.storage._normalize_name(name)} for name in batch],
+                'Quiet': True,
+            })
+            for error in response.get('Errors', []):
+                self.log(f"Cannot delete {error['Key']}: {error['Code']} {error.get('Message', '')}")
@@ -0,0 +1,134 @@
+import math
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+def render_derivatives(data, sizes, quality=85):
+    """
+    Выполняется в пуле процессов, поэтому здесь только Pillow и никакого Django.
+    sizes: {'thumb': 160, ...} - максимальная сторона в пикселях.
+    Возвращает {'thumb': (jpeg_bytes, width, height), ...}.
+    """
+    rendered = {}
+    with Image.open(BytesIO(data)) as image:
+        largest = max(sizes.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        # от большего к меньшему: каждый размер уменьшается из предыдущего
+        for size, max_side in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+            rendered[size] = (buffer.getvalue(), image.width, image.height)
+
+    return rendered
+
+
+ORIENTATION_TAG = 0x0112
+PLACEHOLDER_SIZE = 32
+PLACEHOLDER_COMPONENTS = (4, 3)
+BASE83_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def extract_metadata(source):
+    """
+    Размеры, MIME-тип, EXIF-ориентация и placeholder изображения.
+    width и height - после поворота по EXIF, то есть как изображение показывается.
+    source - bytes или открытый файл; позиция в файле не восстанавливается.
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    with Image.open(source) as image:
+        mime_type = Image.MIME.get(image.format, '')
+        orientation = image.getexif().get(ORIENTATION_TAG, 1)
+        width, height = image.size
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+
+        image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        placeholder = encode_blurhash(image, *PLACEHOLDER_COMPONENTS)
+
+    return {
+        'width': width,
+        'height': height,
+        'mime_type': mime_type,
+        'orientation': orientation,
+        'placeholder': placeholder,
+    }
+
+
+def encode_blurhash(image, components_x, components_y):
+    """
+    Кодирует маленькое RGB-изображение в строку формата BlurHash
+    (https://blurha.sh), которую клиенты раскрывают в размытое превью.
+    """
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(channel) for channel in pixel) for pixel in image.getdata()]
+
+    factors = []
+    for j in range(components_y):
+        basis_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(components_x):
+            basis_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for index, (pr, pg, pb) in enumerate(pixels):
+                basis = basis_x[index % width] * basis_y[index // width]
+                r += basis * pr
+                g += basis * pg
+                b += basis * pb
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((components_x - 1) + (components_y - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    result += _base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    for factor in ac:
+        r, g, b = (
+            max(0, min(18, math.floor(_sign_pow(value / max_value, 0.5) * 9 + 9.5))) for value in factor
+        )
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def _base83(value, length):
+    return ''.join(BASE83_CHARS[value // 83 ** (length - digit) % 83] for digit in range(1, length + 1))
@@ -0,0 +1,602 @@
+import contextvars
+import hashlib
+import logging
+import mimetypes
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils.text import get_valid_filename
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+
+from apps.jobs.services.services import enqueue
+from apps.news.models import New
+from apps.photo.models import Photo, PhotoDerivative, get_upload_path
+from apps.photo.services.imaging import extract_metadata, render_derivatives
+from apps.portfolio.models import Portfolio, PortfolioPhotos
+
+logger = logging.getLogger(__name__)
+
+
+class SignedUrlCache:
+    """
+    LRU-кэш подписанных URL в памяти процесса, ключ - имя объекта в storage.
+    TTL должен быть меньше срока жизни подписи, иначе клиенты получат
+    просроченные ссылки.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_url(self, file):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(file.name)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(file.name)
+                self.hits += 1
+                return entry[0]
+
+        url = file.storage.url(file.name)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[file.name] = (url, now + self.ttl)
+            self._entries.move_to_end(file.name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return url
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / requests, 4) if requests else None,
+            }
+
+
+_url_cache = None
+
+
+def get_url_cache():
+    global _url_cache
+    if _url_cache is None:
+        if settings.PHOTO_URL_CACHE_TTL >= settings.AWS_QUERYSTRING_EXPIRE:
+            raise ImproperlyConfigured('PHOTO_URL_CACHE_TTL must be shorter than AWS_QUERYSTRING_EXPIRE')
+        _url_cache = SignedUrlCache(settings.PHOTO_URL_CACHE_SIZE, settings.PHOTO_URL_CACHE_TTL)
+    return _url_cache
+
+
+def get_photo_url(image):
+    if not image:
+        return None
+    return get_url_cache().get_url(image)
+
+
+class DerivativeService:
+    _process_pool = None
+
+    @classmethod
+    def get_process_pool(cls):
+        if cls._process_pool is None:
+            cls._process_pool = ProcessPoolExecutor(
+                max_workers=settings.PHOTO_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return cls._process_pool
+
+    @staticmethod
+    def schedule(photo_ids):
+        """
+        Генерация уменьшенных копий фоновой задачей, вне обработки запроса.
+        """
+        photo_ids = list(photo_ids)
+        if photo_ids:
+            enqueue('photo.generate_derivatives', {'photo_ids': photo_ids})
+
+    @classmethod
+    def generate(cls, photo_ids):
+        """
+        Рендерит недостающие размеры в пуле процессов и сохраняет их в storage.
+        Возвращает количество созданных копий.
+        """
+        existing = set(
+            PhotoDerivative.objects.filter(photo_id__in=photo_ids).values_list('photo_id', 'size')
+        )
+        pool = cls.get_process_pool()
+
+        futures = {}
+        metadata_futures = {}
+        for photo in Photo.objects.filter(pk__in=photo_ids).exclude(image=''):
+            missing_sizes = {
+                size: max_side for size, max_side in PhotoDerivative.SIZES.items()
+                if (photo.pk, size) not in existing
+            }
+            # у загруженных напрямую в bucket и старых фотографий метаданных ещё нет
+            missing_metadata = photo.width is None
+            if not missing_sizes and not missing_metadata:
+                continue
+            try:
+                with photo.image.open('rb') as image_file:
+                    data = image_file.read()
+            except Exception:
+                logger.warning('Cannot read original of photo %s (%s)', photo.pk, photo.image.name)
+                continue
+            if missing_sizes:
+                futures[pool.submit(render_derivatives, data, missing_sizes)] = photo
+            if missing_metadata:
+                photo.file_size = len(data)
+                metadata_futures[pool.submit(extract_metadata, data)] = photo
+
+        derivatives = []
+        for future in as_completed(futures):
+            photo = futures[future]
+            try:
+                rendered = future.result()
+            except Exception:
+                logger.exception('Cannot render derivatives of photo %s', photo.pk)
+                continue
+
+            stem = os.path.splitext(os.path.basename(photo.image.name))[0]
+            for size, (content, width, height) in rendered.items():
+                derivative = PhotoDerivative(photo=photo, size=size, width=width, height=height)
+                derivative.image.save(f'{stem}.jpg', ContentFile(content), save=False)
+                derivatives.append(derivative)
+
+        PhotoDerivative.objects.bulk_create(derivatives, ignore_conflicts=True)
+
+        described = []
+        for future in as_completed(metadata_futures):
+            photo = metadata_futures[future]
+            try:
+                metadata = future.result()
+            except Exception:
+                logger.exception('Cannot read metadata of photo %s', photo.pk)
+                continue
+            for field, value in metadata.items():
+                setattr(photo, field, value)
+            described.append(photo)
+        Photo.objects.bulk_update(described, Photo.METADATA_FIELDS)
+
+        return len(derivatives)
+
+
+class UploadService:
+    """
+    Двухфазная загрузка: клиент получает presigned POST, грузит файл
+    напрямую в bucket, затем вызывает finalize, который создаёт Photo.
+    """
+    TARGET_NEW = 'new'
+    TARGET_AVATAR = 'avatar'
+    TARGET_PORTFOLIO = 'portfolio'
+    TARGETS = (TARGET_NEW, TARGET_AVATAR, TARGET_PORTFOLIO)
+    CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+    SIGNING_SALT = 'apps.photo.upload'
+
+    @staticmethod
+    def get_target(user, target, target_id=None):
+        if target == UploadService.TARGET_AVATAR:
+            return user
+
+        if target == UploadService.TARGET_NEW:
+            if not user.is_staff:
+                raise PermissionDenied("Только администраторы могут загружать фотографии новостей.")
+            new = New.objects.filter(pk=target_id).first()
+            if new is None:
+                raise NotFound("Новость не найдена.")
+            return new
+
+        portfolio = Portfolio.objects.select_related('studio', 'photographer').filter(pk=target_id).first()
+        if portfolio is None:
+            raise NotFound("Портфолио не найдено.")
+        owner = portfolio.studio or portfolio.photographer
+        if owner is None or owner.base_user_id != user.pk:
+            raise PermissionDenied("Вы можете загружать фотографии только в свои портфолио.")
+        return portfolio
+
+    @staticmethod
+    def build_key(user, target, target_object, filename):
+        photo = Photo()
+        if target == UploadService.TARGET_NEW:
+            photo.new_info = {'author': target_object.author, 'title': target_object.title}
+        elif target == UploadService.TARGET_AVATAR:
+            photo.user_info = {'username': user.email}
+        else:
+            photo.portfolio_info = {'username': user.email, 'portfolio_id': target_object.pk}
+        # ключ должен быть уникальным заранее: get_available_name для прямой загрузки не вызывается
+        return get_upload_path(photo, f'{uuid.uuid4().hex[:12]}-{get_valid_filename(filename)}')
+
+    @staticmethod
+    def presign(user, target, target_object, filename, content_type, storage=None):
+        storage = storage or default_storage
+        key = UploadService.build_key(user, target, target_object, filename)
+        conditions = [
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.PHOTO_UPLOAD_MAX_SIZE],
+        ]
+
+        generate_presigned_post = getattr(storage, 'generate_presigned_post', None)
+        if generate_presigned_post is not None:
+            presigned = generate_presigned_post(
+                key, fields={'Content-Type': content_type}, conditions=conditions,
+                expires_in=settings.PHOTO_UPLOAD_EXPIRE,
+            )
+        else:
+            presigned = storage.connection.meta.client.generate_presigned_post(
+                Bucket=storage.bucket_name,
+                Key=key,
+                Fields={'Content-Type': content_type},
+                Conditions=conditions,
+                ExpiresIn=settings.PHOTO_UPLOAD_EXPIRE,
+            )
+
+        upload_token = signing.dumps(
+            {
+                'key': key, 'target': target, 'target_id': target_object.pk, 'user': user.pk,
+                'content_type': content_type,
+            },
+            salt=UploadService.SIGNING_SALT,
+        )
+        return {'url': presigned['url'], 'fields': presigned['fields'], 'key': key, 'upload_token': upload_token}
+
+    @staticmethod
+    def finalize(user, upload_token, storage=None):
+        storage = storage or default_storage
+        try:
+            upload = signing.loads(
+                upload_token, salt=UploadService.SIGNING_SALT, max_age=settings.PHOTO_UPLOAD_EXPIRE * 2
+            )
+        except signing.BadSignature:
+            raise ValidationError({'upload_token': 'Недействительный или просроченный токен загрузки.'})
+        if upload['user'] != user.pk:
+            raise PermissionDenied("Токен загрузки выдан другому пользователю.")
+
+        target_object = UploadService.get_target(user, upload['target'], upload['target_id'])
+
+        photo = Photo.objects.filter(image=upload['key']).first()
+        if photo is None:
+            UploadService.check_object(storage, upload)
+
+        with transaction.atomic():
+            if photo is None:
+                # содержимое не скачивается в запросе: хэш и поиск дубликата - в фоновой задаче
+                photo = Photo.objects.create(image=upload['key'])
+                enqueue('photo.deduplicate', {'photo_id': photo.pk})
+
+            if upload['target'] == UploadService.TARGET_PORTFOLIO:
+                PortfolioPhotos.objects.get_or_create(portfolio=target_object, photo=photo)
+            else:
+                old_photo = target_object.photo
+                target_object.photo = photo
+                target_object.save(update_fields=['photo', 'updated_at'])
+                if old_photo is not None and old_photo.pk != photo.pk:
+                    PhotoService.release(old_photo)
+        return photo
+
+    @staticmethod
+    def get_object_head(storage, key):
+        """
+        (размер, Content-Type) объекта: для S3 - один HEAD, для остальных storage
+        тип определяется по имени.
+        """
+        bucket = getattr(storage, 'bucket', None)
+        if bucket is None:
+            return storage.size(key), mimetypes.guess_type(key)[0]
+        stored_object = bucket.Object(storage._normalize_name(key))
+        stored_object.load()
+        return stored_object.content_length, stored_object.content_type
+
+    @staticmethod
+    def check_object(storage, upload):
+        """
+        Проверяет, что загруженный объект соответствует условиям presign. Не
+        прошедший проверку объект удаляется фоновой задачей.
+        """
+        if not storage.exists(upload['key']):
+            raise ValidationError({'upload_token': 'Файл ещё не загружен в хранилище.'})
+        size, content_type = UploadService.get_object_head(storage, upload['key'])
+
+        error = None
+        if not 1 <= size <= settings.PHOTO_UPLOAD_MAX_SIZE:
+            error = f'Размер файла должен быть от 1 байта до {settings.PHOTO_UPLOAD_MAX_SIZE} байт.'
+        elif content_type not in UploadService.CONTENT_TYPES or (
+            # у токенов, выданных до проверки типа, его нет
+            upload.get('content_type') not in (None, content_type)
+        ):
+            error = 'Тип файла не совпадает с указанным при получении ссылки на загрузку.'
+        if error is not None:
+            enqueue('photo.delete_objects', {'names': [upload['key']]})
+            raise ValidationError({'upload_token': error})
+
+
+class BatchUploadService:
+    """
+    Параллельная загрузка нескольких файлов в storage ограниченным пулом потоков.
+    Пул живёт всё время процесса, а у каждого его потока свой клиент storage,
+    поэтому соединения с bucket переиспользуются между запросами.
+    """
+    _executor = None
+
+    @classmethod
+    def get_executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=settings.PHOTO_UPLOAD_WORKERS, thread_name_prefix='photo-upload'
+            )
+        return cls._executor
+
+    @classmethod
+    def upload(cls, photos_with_files, storage=None):
+        """
+        Загружает файлы параллельно и проставляет имена в photo.image, не сохраняя Photo.
+        Если хотя бы одна загрузка упала, уже загруженные объекты удаляются.
+        """
+        storage = storage or default_storage
+        max_length = Photo._meta.get_field('image').max_length
+        futures = {}
+        for photo, file in photos_with_files:
+            # имя уникально заранее: параллельные get_available_name не видят друг друга
+            name = get_upload_path(photo, f'{uuid.uuid4().hex[:12]}-{get_valid_filename(file.name)}')
+            # контекст копируется, чтобы операции попадали в статистику текущего запроса
+            futures[cls.get_executor().submit(
+                contextvars.copy_context().run, cls._store, storage, photo, name, file, max_length
+            )] = photo
+        wait(futures)
+
+        error = None
+        for future, photo in futures.items():
+            if future.exception() is not None:
+                error = error or future.exception()
+            else:
+                photo.image.name = future.result()
+        if error is not None:
+            cls.delete([photo for photo in futures.values() if photo.image], storage)
+            raise error
+        return [photo for photo, _ in photos_with_files]
+
+    @staticmethod
+    def _store(storage, photo, name, file, max_length):
+        fill_metadata(photo, file)
+        return storage.save(name, file, max_length=max_length)
+
+    @classmethod
+    def delete(cls, photos, storage=None):
+        storage = storage or default_storage
+        futures = [
+            cls.get_executor().submit(contextvars.copy_context().run, storage.delete, photo.image.name)
+            for photo in photos
+        ]
+        for future in futures:
+            if future.exception() is not None:
+                logger.warning('Cannot delete uploaded object: %s', future.exception())
+
+    @classmethod
+    def add_to_portfolio(cls, portfolio, user, files, existing_photos=(), storage=None):
+        """
+        Загружает файлы в портфолио и связывает их вместе с existing_photos
+        одним bulk_create. Файлы, содержимое которых уже есть в storage,
+        не загружаются повторно. При ошибке в БД загруженные объекты удаляются.
+        Возвращает Photo для переданных файлов.
+        """
+        hashes = [get_content_hash(file) for file in files]
+        stored = Photo.objects.in_bulk(set(hashes), field_name='content_hash') if hashes else {}
+
+        photos_with_files = {}
+        for file, content_hash in zip(files, hashes):
+            if content_hash in stored or content_hash in photos_with_files:
+                continue
+            photo = Photo(content_hash=content_hash)
+            photo.portfolio_info = {'username': user.email, 'portfolio_id': portfolio.pk}
+            photos_with_files[content_hash] = (photo, file)
+        uploaded = cls.upload(list(photos_with_files.values()), storage)
+
+        try:
+            with transaction.atomic():
+                # конфликт по content_hash - тот же файл параллельно загрузил другой запрос
+                Photo.objects.bulk_create(uploaded, ignore_conflicts=True)
+                if uploaded:
+                    stored.update(Photo.objects.in_bulk(
+                        [photo.content_hash for photo in uploaded], field_name='content_hash'
+                    ))
+                PortfolioPhotos.objects.bulk_create(
+                    [
+                        PortfolioPhotos(portfolio=portfolio, photo=photo)
+                        for photo in [*existing_photos, *{stored[content_hash] for content_hash in hashes}]
+                    ],
+                    ignore_conflicts=True,
+                )
+        except Exception:
+            cls.delete(uploaded, storage)
+            raise
+
+        created = [photo for photo in uploaded if stored[photo.content_hash].image.name == photo.image.name]
+        cls.delete([photo for photo in uploaded if photo not in created], storage)
+        # bulk_create не отправляет post_save
+        DerivativeService.schedule(stored[photo.content_hash].pk for photo in created)
+        return [stored[content_hash] for content_hash in hashes]
+
+
+def get_content_hash(file):
+    """
+    sha256 содержимого файла. Для загрузок через HTTP он уже посчитан
+    upload handler'ом, иначе файл читается целиком.
+    """
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        file.seek(0)
+        content_hash = hasher.hexdigest()
+    return content_hash
+
+
+def fill_metadata(photo, file):
+    """
+    Заполняет размеры, тип, ориентацию и placeholder Photo по загружаемому файлу.
+    """
+    try:
+        metadata = extract_metadata(file)
+    except Exception:
+        logger.warning('Cannot read metadata of %s', file.name)
+        metadata = {}
+    finally:
+        file.seek(0)
+    for field, value in metadata.items():
+        setattr(photo, field, value)
+    photo.file_size = file.size
+
+
+class PhotoService:
+
+    @staticmethod
+    def is_taken(photo, owner):
+        """
+        Занята ли photo другим владельцем того же типа (аватар другого
+        пользователя, фото другой новости): такие связи один-к-одному.
+        """
+        return type(owner)._default_manager.filter(photo=photo).exclude(pk=owner.pk).exists()
+
+    @staticmethod
+    def find_reusable(content_hash, owner=None):
+        """
+        Photo с тем же содержимым и признак, есть ли она вообще. Photo, занятую
+        другим владельцем, переиспользовать нельзя: тогда возвращается (None, True),
+        и файл хранится отдельной Photo без content_hash.
+        """
+        photo = Photo.objects.filter(content_hash=content_hash).first()
+        if photo is None:
+            return None, False
+        if owner is not None and PhotoService.is_taken(photo, owner):
+            return None, True
+        return photo, True
+
+    @staticmethod
+    def get_or_create(file, owner=None, **upload_info):
+        """
+        Возвращает Photo с тем же содержимым, что и file, или загружает новую.
+        owner - пользователь или новость, к которым привязывается фотография.
+        upload_info - атрибуты для get_upload_path (user_info, new_info, portfolio_info).
+        """
+        content_hash = get_content_hash(file)
+        photo, exists = PhotoService.find_reusable(content_hash, owner)
+        if photo is not None:
+            return photo, False
+
+        photo = Photo(image=file, content_hash=None if exists else content_hash)
+        fill_metadata(photo, file)
+        for attr, value in upload_info.items():
+            setattr(photo, attr, value)
+        try:
+            with transaction.atomic():
+                photo.save()
+        except IntegrityError:
+            # тот же файл параллельно загрузил другой запрос
+            photo.image.delete(save=False)
+            return Photo.objects.get(content_hash=content_hash), False
+        return photo, True
+
+    @staticmethod
+    def deduplicate(photo_id, storage=None):
+        """
+        Хэширует Photo, созданную без content_hash (прямая загрузка), и
+        объединяет её с Photo того же содержимого. Если объединить нельзя
+        (обе заняты владельцами одного типа), Photo остаётся без хэша.
+        Возвращает Photo, которая осталась, или None, если photo_id уже нет.
+        """
+        storage = storage or default_storage
+        photo = Photo.objects.filter(pk=photo_id).first()
+        if photo is None or photo.content_hash is not None:
+            return photo
+        with storage.open(photo.image.name, 'rb') as stored_file:
+            content_hash = get_content_hash(stored_file)
+
+        with transaction.atomic():
+            original = Photo.objects.filter(content_hash=content_hash).exclude(pk=photo.pk).first()
+            if original is None:
+                photo.content_hash = content_hash
+                try:
+                    with transaction.atomic():
+                        photo.save(update_fields=['content_hash'])
+                    return photo
+                except IntegrityError:
+                    # тот же файл параллельно хэширует другая задача
+                    original = Photo.objects.get(content_hash=content_hash)
+            if not PhotoService.can_merge(photo, original):
+                return photo
+            PhotoService.merge(photo, original)
+        return original
+
+    @staticmethod
+    def release(photo):
+        """
+        Откладывает удаление Photo, которая больше не нужна владельцу.
+        Фоновая задача удалит её, только если на неё не ссылаются другие
+        аватары, новости или портфолио.
+        """
+        if photo is not None:
+            enqueue('photo.release', {'photo_ids': [photo.pk]})
+
+    @staticmethod
+    def can_merge(duplicate, original):
+        """
+        Аватар и фото новости - связи один-к-одному: если обе Photo заняты
+        владельцами одного типа, их не объединить.
+        """
+        return not any(
+            model.objects.filter(photo=duplicate).exists() and model.objects.filter(photo=original).exists()
+            for model in (get_user_model(), New)
+        )
+
+    @staticmethod
+    def merge(duplicate, original):
+        """
+        Переносит все ссылки с duplicate на original и удаляет duplicate,
+        его объекты в storage удаляются фоновой задачей. Вызывающий проверяет can_merge.
+        """
+        with transaction.atomic():
+            get_user_model().objects.filter(photo=duplicate).update(photo=original)
+            New.objects.filter(photo=duplicate).update(photo=original)
+            PortfolioPhotos.objects.filter(
+                photo=duplicate,
+                portfolio__in=PortfolioPhotos.objects.filter(photo=original).values('portfolio'),
+            ).delete()
+            PortfolioPhotos.objects.filter(photo=duplicate).update(photo=original)
+            names = [duplicate.image.name, *duplicate.derivatives.values_list('image', flat=True)]
+            duplicate.delete()
+            names = [name for name in names if name and name != original.image.name]
+            enqueue('photo.delete_objects', {'names': names})
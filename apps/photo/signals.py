@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.photo.models import Photo, PhotoDerivative
+from apps.photo.services.services import DerivativeService, get_url_cache
+
+
+@receiver(post_save, sender=Photo)
+def schedule_derivatives(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.image:
+        DerivativeService.schedule([instance.pk])
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=PhotoDerivative)
+def invalidate_signed_url(sender, instance, **kwargs):
+    if instance.image:
+        get_url_cache().invalidate(instance.image.name)
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+
+from apps.jobs.services.services import register
+from apps.photo.services.garbage import PhotoGarbageCollector
+from apps.photo.services.services import DerivativeService, PhotoService
+
+
+@register('photo.generate_derivatives')
+def generate_derivatives(photo_ids):
+    DerivativeService.generate(photo_ids)
+
+
+@register('photo.release')
+def release_photos(photo_ids):
+    # фотография освобождена явно, ждать незавершённой загрузки не нужно
+    PhotoGarbageCollector(default_storage, min_age=timedelta(0)).collect_photos(photo_ids)
+
+
+@register('photo.delete_objects')
+def delete_objects(names):
+    PhotoGarbageCollector(default_storage).delete_objects(names)
+
+
+@register('photo.deduplicate')
+def deduplicate_photo(photo_id):
+    PhotoService.deduplicate(photo_id)
@@ -1,3 +1,408 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from apps.jobs.models import Job
+from apps.photo.models import Photo, PhotoDerivative
+from apps.photo.services.garbage import MAX_DELETE_BATCH, PhotoGarbageCollector
+from apps.photo.services.imaging import BASE83_CHARS, ORIENTATION_TAG, extract_metadata
+from apps.photo.services.services import (
+    BatchUploadService, DerivativeService, PhotoService, SignedUrlCache, UploadService, get_photo_url, get_url_cache,
+)
+from apps.portfolio.models import Portfolio, PortfolioPhotos
+from apps.users.models import Photographer
+from common.storage import LocalS3Storage
+
+
+def make_image(color, size=(40, 20), orientation=None, image_format='JPEG'):
+    buffer = BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION_TAG] = orientation
+    Image.new('RGB', size, color).save(buffer, image_format, exif=exif)
+    return buffer.getvalue()
+
+
+def make_storage(test):
+    location = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, location)
+    return LocalS3Storage(location=location)
+
+
+def list_objects(storage):
+    return sorted(
+        os.path.relpath(os.path.join(path, name), storage.backend.location)
+        for path, _, names in os.walk(storage.backend.location) for name in names
+    )
+
+
+@override_settings(JOBS_RUN_INLINE=False, PHOTO_UPLOAD_MAX_SIZE=1024)
+class FinalizeUploadTests(TestCase):
+
+    def setUp(self):
+        self.storage = make_storage(self)
+        self.user = self.create_user(1)
+
+    @staticmethod
+    def create_user(index):
+        return get_user_model().objects.create_user(
+            email=f'user{index}@example.com', password='password', phone_number=f'+37529{index:07d}',
+        )
+
+    def upload(self, content, filename='avatar.jpg', content_type='image/jpeg', user=None):
+        user = user or self.user
+        presigned = UploadService.presign(
+            user, UploadService.TARGET_AVATAR, user, filename, content_type, storage=self.storage,
+        )
+        self.storage.save(presigned['key'], ContentFile(content))
+        return presigned
+
+    def finalize(self, presigned, user=None):
+        return UploadService.finalize(user or self.user, presigned['upload_token'], storage=self.storage)
+
+    def assert_rejected(self, presigned):
+        with self.assertRaises(ValidationError):
+            self.finalize(presigned)
+        self.assertFalse(Photo.objects.filter(image=presigned['key']).exists())
+        self.assertTrue(Job.objects.filter(task='photo.delete_objects', payload={'names': [presigned['key']]}).exists())
+
+    def test_presign_limits_upload(self):
+        presigned = self.upload(b'x')
+
+        self.assertEqual(presigned['url'], f'{self.storage.endpoint_url}/{self.storage.bucket_name}')
+        self.assertEqual(presigned['fields']['key'], presigned['key'])
+        self.assertEqual(presigned['fields']['Content-Type'], 'image/jpeg')
+        self.assertTrue(presigned['key'].startswith(f'photos/Avatars/user_photos/{self.user.email}/'))
+        self.assertEqual(self.finalize(presigned).image.name, presigned['key'])
+
+    def test_rejects_oversized_object(self):
+        self.assert_rejected(self.upload(b'x' * 1025))
+
+    def test_rejects_other_content_type(self):
+        self.assert_rejected(self.upload(b'x' * 10, content_type='image/png'))
+
+    def test_replacing_avatar_releases_old_photo(self):
+        old_photo = self.finalize(self.upload(b'old'))
+        photo = self.finalize(self.upload(b'new'))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.photo, photo)
+        self.assertTrue(Job.objects.filter(task='photo.release', payload={'photo_ids': [old_photo.pk]}).exists())
+
+    def test_finalize_does_not_download_object(self):
+        with mock.patch.object(self.storage, 'open', side_effect=AssertionError('object was read')):
+            photo = self.finalize(self.upload(b'avatar'))
+
+        self.assertIsNone(photo.content_hash)
+        self.assertTrue(Job.objects.filter(task='photo.deduplicate', payload={'photo_id': photo.pk}).exists())
+
+    def test_same_content_is_merged_in_background(self):
+        photo = self.finalize(self.upload(b'avatar'))
+        PhotoService.deduplicate(photo.pk, storage=self.storage)
+        photo.refresh_from_db()
+        self.assertEqual(photo.content_hash, hashlib.sha256(b'avatar').hexdigest())
+
+        presigned = self.upload(b'avatar')
+        duplicate = self.finalize(presigned)
+        self.assertNotEqual(duplicate, photo)
+
+        self.assertEqual(PhotoService.deduplicate(duplicate.pk, storage=self.storage), photo)
+        self.assertFalse(Photo.objects.filter(pk=duplicate.pk).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.photo, photo)
+        self.assertTrue(Job.objects.filter(task='photo.delete_objects', payload={'names': [presigned['key']]}).exists())
+
+    def test_avatar_of_another_user_is_not_shared(self):
+        photo = self.finalize(self.upload(b'avatar'))
+        PhotoService.deduplicate(photo.pk, storage=self.storage)
+        other_user = self.create_user(2)
+
+        other_photo = self.finalize(self.upload(b'avatar', user=other_user), user=other_user)
+
+        self.assertEqual(PhotoService.deduplicate(other_photo.pk, storage=self.storage), other_photo)
+        other_photo.refresh_from_db()
+        self.assertIsNone(other_photo.content_hash)
+        other_user.refresh_from_db()
+        self.assertEqual(other_user.photo, other_photo)
+
+
+class PhotoGarbageCollectorTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = LocalS3Storage(location=self.location)
+        old = timezone.now() - timedelta(days=2)
+
+        self.avatar = self.create_photo('avatar.jpg', old)
+        user = FinalizeUploadTests.create_user(1)
+        user.photo = self.avatar
+        user.save()
+        self.portfolio_photo = self.create_photo('portfolio.jpg', old)
+        portfolio = Portfolio.objects.create(
+            photographer=Photographer.objects.create(base_user=user), description='Portfolio',
+        )
+        PortfolioPhotos.objects.create(portfolio=portfolio, photo=self.portfolio_photo)
+        self.orphan = self.create_photo('orphan.jpg', old)
+        self.derivative = PhotoDerivative.objects.create(
+            photo=self.orphan, size='thumb', width=1, height=1,
+            image=self.save_object('photos/derivatives/thumb/orphan.jpg', old),
+        )
+        # загрузка, которая ещё не завершена
+        self.young = self.create_photo('young.jpg', timezone.now())
+
+        self.lost_object = self.save_object('photos/lost.jpg', old)
+        self.young_object = self.save_object('photos/uploading.jpg', timezone.now())
+
+    def save_object(self, name, modified):
+        name = self.storage.save(name, ContentFile(b'x'))
+        os.utime(os.path.join(self.location, name), (modified.timestamp(), modified.timestamp()))
+        return name
+
+    def create_photo(self, filename, uploaded_at):
+        photo = Photo.objects.create(image=self.save_object(f'photos/{filename}', uploaded_at))
+        Photo.objects.filter(pk=photo.pk).update(uploaded_at=uploaded_at)
+        return photo
+
+    def get_objects(self):
+        return {name for name, _ in PhotoGarbageCollector(self.storage).iter_objects()}
+
+    def test_dry_run_deletes_nothing(self):
+        objects = self.get_objects()
+        collector = PhotoGarbageCollector(self.storage, dry_run=True)
+
+        self.assertEqual(collector.collect_photos(), (1, 2))
+        # строки Photo не удалены, поэтому без ссылок только потерянный объект
+        self.assertEqual(collector.collect_objects(), 1)
+        self.assertEqual(Photo.objects.count(), 4)
+        self.assertTrue(PhotoDerivative.objects.exists())
+        self.assertEqual(self.get_objects(), objects)
+
+    def test_collects_only_old_unreferenced(self):
+        collector = PhotoGarbageCollector(self.storage)
+
+        self.assertEqual(collector.collect_photos(), (1, 2))
+        self.assertEqual(
+            set(Photo.objects.values_list('pk', flat=True)),
+            {self.avatar.pk, self.portfolio_photo.pk, self.young.pk},
+        )
+        self.assertFalse(PhotoDerivative.objects.exists())
+
+        self.assertEqual(collector.collect_objects(), 1)
+        self.assertEqual(self.get_objects(), {
+            self.avatar.image.name, self.portfolio_photo.image.name, self.young.image.name, self.young_object,
+        })
+
+    @staticmethod
+    def get_bucket_storage():
+        bucket = mock.Mock()
+        bucket.delete_objects.return_value = {}
+        return mock.Mock(bucket=bucket, _normalize_name=lambda name: f'media/{name}')
+
+    @staticmethod
+    def get_deleted_batches(storage):
+        return [
+            [item['Key'] for item in call.kwargs['Delete']['Objects']]
+            for call in storage.bucket.delete_objects.call_args_list
+        ]
+
+    def test_delete_objects_in_batches(self):
+        storage = self.get_bucket_storage()
+        names = [f'photos/{index}.jpg' for index in range(5)]
+
+        PhotoGarbageCollector(storage, batch_size=2).delete_objects(names)
+
+        batches = self.get_deleted_batches(storage)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(sum(batches, []), [f'media/{name}' for name in names])
+        # больше 1000 ключей S3 DeleteObjects не принимает
+        self.assertEqual(PhotoGarbageCollector(storage, batch_size=5000).batch_size, MAX_DELETE_BATCH)
+
+    def test_collect_photos_in_batches(self):
+        for index in range(4):
+            self.create_photo(f'orphan{index}.jpg', timezone.now() - timedelta(days=2))
+        storage = self.get_bucket_storage()
+
+        # объекты Photo и их уменьшенных копий удаляются запросами не больше batch_size ключей
+        self.assertEqual(PhotoGarbageCollector(storage, batch_size=2).collect_photos(), (5, 6))
+
+        batches = self.get_deleted_batches(storage)
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+        self.assertEqual(len(sum(batches, [])), 6)
+        self.assertEqual(Photo.objects.count(), 3)
+
+
+class SignedUrlCacheTests(TestCase):
+    def setUp(self):
+        clock = mock.patch('apps.photo.services.services.time')
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        self.clock.monotonic.return_value = 1000.0
+        self.storage = mock.Mock()
+        # каждая подпись уникальна, как у настоящего storage
+        self.storage.url.side_effect = lambda name: f'https://bucket/{name}?signature={self.storage.url.call_count}'
+
+    def get_file(self, name):
+        return SimpleNamespace(name=name, storage=self.storage)
+
+    def test_entry_expires_after_ttl(self):
+        cache = SignedUrlCache(max_size=10, ttl=60)
+        url = cache.get_url(self.get_file('a.jpg'))
+
+        self.clock.monotonic.return_value = 1059.0
+        self.assertEqual(cache.get_url(self.get_file('a.jpg')), url)
+        self.clock.monotonic.return_value = 1060.0
+        self.assertNotEqual(cache.get_url(self.get_file('a.jpg')), url)
+
+        self.assertEqual(self.storage.url.call_count, 2)
+        self.assertEqual(cache.stats(), {
+            'size': 1, 'max_size': 10, 'ttl': 60, 'hits': 1, 'misses': 2, 'evictions': 0, 'hit_ratio': 0.3333,
+        })
+
+    def test_least_recently_used_is_evicted(self):
+        cache = SignedUrlCache(max_size=2, ttl=60)
+        first = cache.get_url(self.get_file('a.jpg'))
+        cache.get_url(self.get_file('b.jpg'))
+        # a.jpg прочитан последним, вытесняется b.jpg
+        cache.get_url(self.get_file('a.jpg'))
+        cache.get_url(self.get_file('c.jpg'))
+
+        self.assertEqual(cache.get_url(self.get_file('a.jpg')), first)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        calls = self.storage.url.call_count
+        cache.get_url(self.get_file('b.jpg'))
+        self.assertEqual(self.storage.url.call_count, calls + 1)
+
+    def test_invalidate(self):
+        cache = SignedUrlCache(max_size=10, ttl=60)
+        url = cache.get_url(self.get_file('a.jpg'))
+        cache.get_url(self.get_file('b.jpg'))
+
+        cache.invalidate('a.jpg', 'missing.jpg')
+        self.assertEqual(cache.stats()['size'], 1)
+        self.assertNotEqual(cache.get_url(self.get_file('a.jpg')), url)
+
+    def test_deleted_photo_is_invalidated(self):
+        with override_settings(STORAGES={'default': {'BACKEND': 'common.storage.LocalS3Storage'}}):
+            cache = get_url_cache()
+            cache.clear()
+            self.addCleanup(cache.clear)
+            photo = Photo.objects.create(image='photos/a.jpg')
+            derivative = PhotoDerivative.objects.create(
+                photo=photo, size='thumb', image='photos/derivatives/thumb/a.jpg', width=1, height=1,
+            )
+            get_photo_url(photo.image)
+            get_photo_url(derivative.image)
+            self.assertEqual(cache.stats()['size'], 2)
+
+            derivative.delete()
+            self.assertEqual(cache.stats()['size'], 1)
+            photo.delete()
+            self.assertEqual(cache.stats()['size'], 0)
+
+
+class BatchUploadTests(TestCase):
+    def setUp(self):
+        self.storage = make_storage(self)
+        self.user = FinalizeUploadTests.create_user(1)
+        self.portfolio = Portfolio.objects.create(
+            photographer=Photographer.objects.create(base_user=self.user), description='Portfolio',
+        )
+
+    @staticmethod
+    def get_files(*colors):
+        return [SimpleUploadedFile(f'{color}.jpg', make_image(color), 'image/jpeg') for color in colors]
+
+    def add(self, files):
+        return BatchUploadService.add_to_portfolio(self.portfolio, self.user, files, storage=self.storage)
+
+    def test_upload(self):
+        photos = self.add(self.get_files('red', 'blue', 'red'))
+
+        # одинаковое содержимое хранится одной Photo
+        self.assertEqual(photos[0], photos[2])
+        self.assertEqual(set(self.portfolio.photos.all()), set(photos))
+        self.assertEqual(list_objects(self.storage), sorted(photo.image.name for photo in photos[:2]))
+        self.assertEqual((photos[0].width, photos[0].height, photos[0].mime_type), (40, 20, 'image/jpeg'))
+
+    def test_failed_upload_removes_uploaded_objects(self):
+        save = self.storage._save
+
+        def fail_blue(name, content):
+            if name.endswith('blue.jpg'):
+                raise OSError('Upload failed')
+            return save(name, content)
+
+        with mock.patch.object(self.storage, '_save', side_effect=fail_blue), self.assertRaises(OSError):
+            self.add(self.get_files('red', 'blue', 'green'))
+
+        self.assertEqual(list_objects(self.storage), [])
+        self.assertFalse(Photo.objects.exists())
+
+    def test_database_error_removes_uploaded_objects(self):
+        with mock.patch.object(PortfolioPhotos.objects, 'bulk_create', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            self.add(self.get_files('red', 'blue'))
+
+        self.assertEqual(list_objects(self.storage), [])
+        self.assertFalse(Photo.objects.exists())
+        self.assertFalse(PortfolioPhotos.objects.exists())
+
+
+class PhotoMetadataTests(TestCase):
+    @staticmethod
+    def decode_base83(value):
+        result = 0
+        for char in value:
+            result = result * 83 + BASE83_CHARS.index(char)
+        return result
+
+    def test_size_follows_exif_orientation(self):
+        metadata = extract_metadata(make_image('red', orientation=6))
+
+        self.assertEqual(
+            {field: metadata[field] for field in ('width', 'height', 'mime_type', 'orientation')},
+            {'width': 20, 'height': 40, 'mime_type': 'image/jpeg', 'orientation': 6},
+        )
+        metadata = extract_metadata(make_image('red', image_format='PNG'))
+        self.assertEqual((metadata['width'], metadata['height'], metadata['orientation']), (40, 20, 1))
+        self.assertEqual(metadata['mime_type'], 'image/png')
+
+    def test_placeholder_is_blurhash(self):
+        placeholder = extract_metadata(make_image((200, 100, 50), image_format='PNG'))['placeholder']
+
+        # 4x3 компонента: размер, максимум AC, 4 символа DC и по 2 на каждую из 11 AC
+        self.assertEqual(len(placeholder), 28)
+        self.assertEqual(self.decode_base83(placeholder[0]), 3 + 2 * 9)
+        # DC - средний цвет изображения
+        self.assertEqual(self.decode_base83(placeholder[2:6]), (200 << 16) + (100 << 8) + 50)
+        self.assertNotEqual(extract_metadata(make_image((50, 100, 200), image_format='PNG'))['placeholder'], placeholder)
+
+    def test_direct_upload_gets_metadata_with_derivatives(self):
+        storage = make_storage(self)
+        name = storage.save('photos/direct.jpg', ContentFile(make_image('green', size=(300, 200))))
+        photo = Photo.objects.create(image=name)
+
+        with override_settings(STORAGES={
+            'default': {'BACKEND': 'common.storage.LocalS3Storage', 'OPTIONS': {'location': storage.backend.location}},
+        }):
+            DerivativeService.generate([photo.pk])
+
+        photo.refresh_from_db()
+        self.assertEqual((photo.width, photo.height, photo.mime_type, photo.orientation), (300, 200, 'image/jpeg', 1))
+        self.assertEqual(photo.file_size, storage.size(name))
+        self.assertEqual(len(photo.placeholder), 28)
+        self.assertEqual(photo.derivatives.count(), len(PhotoDerivative.SIZES))
@@ -1,12 +1,51 @@
 from django.shortcuts import render
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from drf_spectacular.utils import extend_schema
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
 
 from apps.photo.models import Photo
-from apps.photo.serializers.serializers import PhotoSerializer
+from apps.photo.pagination.pagination import PhotoPagination
+from apps.photo.serializers.serializers import (
+    PhotoSerializer, PresignedUploadSerializer, FinalizeUploadSerializer,
+)
+from apps.photo.services.services import get_url_cache, UploadService
+from common.storage import get_endpoint_histograms
 
 
 class PhotoViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Photo.objects.all()
+    queryset = Photo.objects.prefetch_related('derivatives')
     serializer_class = PhotoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PhotoPagination
+
+    @action(detail=False, methods=['get'], url_path='url-cache', permission_classes=[IsAdminUser])
+    def url_cache(self, request):
+        return Response(get_url_cache().stats(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='storage-timing', permission_classes=[IsAdminUser])
+    def storage_timing(self, request):
+        return Response(get_endpoint_histograms().snapshot(), status=status.HTTP_200_OK)
+
+    @extend_schema(request=PresignedUploadSerializer, responses={201: None})
+    @action(detail=False, methods=['post'])
+    def uploads(self, request):
+        serializer = PresignedUploadSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        presigned = UploadService.presign(
+            request.user,
+            serializer.validated_data['target'],
+            serializer.validated_data['target_object'],
+            serializer.validated_data['filename'],
+            serializer.validated_data['content_type'],
+        )
+        return Response(presigned, status=status.HTTP_201_CREATED)
+
+    @extend_schema(request=FinalizeUploadSerializer, responses={201: PhotoSerializer})
+    @action(detail=False, methods=['post'], url_path='uploads/finalize')
+    def finalize_upload(self, request):
+        serializer = FinalizeUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        photo = UploadService.finalize(request.user, serializer.validated_data['upload_token'])
+        return Response(PhotoSerializer(photo).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,7 @@
+from common.pagination import BasePagination
+
+
+class PortfolioPagination(BasePagination):
+    ordering = ('-id',)
+    page_size = 10
+    max_page_size = 50
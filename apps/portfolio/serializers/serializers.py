@@ -1,5 +1,10 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from apps.jobs.services.services import enqueue
 from apps.photo.models import Photo
+from apps.photo.serializers.serializers import PhotoSerializer
+from apps.photo.services.services import BatchUploadService
 from apps.portfolio.models import Portfolio, PortfolioPhotos
 
 
@@ -12,7 +17,7 @@ class PortfolioSerializer(serializers.ModelSerializer):
         help_text="Upload new photos"
     )
     existing_photos = serializers.ListField(
-        child=serializers.PrimaryKeyRelatedField(queryset=Photo.objects.all()),
+        child=serializers.IntegerField(min_value=1),
         write_only=True,
         required=False,
         help_text="List of existing photo IDs"
@@ -25,10 +30,9 @@ class PortfolioSerializer(serializers.ModelSerializer):
         read_only_fields = ['owner', 'photos']
 
     def get_photos(self, obj):
-        return [{
-            'id': photo.id,
-            'url': photo.image.url
-        } for photo in obj.photos.all() if photo.image]
+        # после create/update кэш prefetch сброшен, в списке это no-op
+        prefetch_related_objects([obj], 'photos__derivatives')
+        return PhotoSerializer([photo for photo in obj.photos.all() if photo.image], many=True).data
 
     def get_owner(self, obj):
         if obj.studio:
@@ -37,6 +41,13 @@ class PortfolioSerializer(serializers.ModelSerializer):
             return {'type': 'photographer', 'id': obj.photographer.id, 'description': obj.photographer.description}
         return None
 
+    def validate_existing_photos(self, value):
+        photos = Photo.objects.in_bulk(value)
+        missing = set(value) - set(photos)
+        if missing:
+            raise serializers.ValidationError(f"Фотографии не найдены: {', '.join(map(str, sorted(missing)))}.")
+        return list(photos.values())
+
     def validate(self, data):
         user = self.context['request'].user
         if not hasattr(user, 'studio_profile') and not hasattr(user, 'photographer_profile'):
@@ -44,6 +55,7 @@ class PortfolioSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         photo_upload = validated_data.pop('photo_upload', [])
         existing_photos = validated_data.pop('existing_photos', [])
@@ -58,18 +70,11 @@ class PortfolioSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError({"owner": "Пользователь должен быть студией или фотографом для создания портфолио."})
 
-        for photo in existing_photos:
-            PortfolioPhotos.objects.create(portfolio=portfolio, photo=photo)
-
-        for photo_file in photo_upload:
-            photo = Photo(image=photo_file)
-            photo_file.portfolio_info = {'username': user.email}
-            photo_file.portfolio_info = {'portfolio_id': portfolio.pk}
-            photo.save()
-            PortfolioPhotos.objects.create(portfolio=portfolio, photo=photo)
+        BatchUploadService.add_to_portfolio(portfolio, user, photo_upload, existing_photos)
 
         return portfolio
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         photo_upload = validated_data.pop('photo_upload', [])
         existing_photos = validated_data.pop('existing_photos', [])
@@ -82,25 +87,21 @@ class PortfolioSerializer(serializers.ModelSerializer):
 
         instance.description = validated_data.get('description', instance.description)
 
-        new_uploaded_photos = []
-
-        for photo_file in photo_upload:
-            photo = Photo(image=photo_file)
-            photo.portfolio_info = {'username': user.email, 'portfolio_id': instance.pk}
-            photo.save()
-            PortfolioPhotos.objects.create(portfolio=instance, photo=photo)
-            new_uploaded_photos.append(photo)
-
-        for photo in existing_photos:
-            if not PortfolioPhotos.objects.filter(portfolio=instance, photo=photo).exists():
-                PortfolioPhotos.objects.create(portfolio=instance, photo=photo)
-
-        current_photos = set(instance.photos.all())
-        new_photos = set(existing_photos) | set(new_uploaded_photos)
-        photos_to_remove = current_photos - new_photos
-
-        for photo in photos_to_remove:
-            PortfolioPhotos.objects.filter(portfolio=instance, photo=photo).delete()
+        current_photo_ids = set(
+            PortfolioPhotos.objects.filter(portfolio=instance).values_list('photo_id', flat=True)
+        )
+        uploaded_photos = BatchUploadService.add_to_portfolio(
+            instance, user, photo_upload,
+            [photo for photo in existing_photos if photo.pk not in current_photo_ids],
+        )
+        # загруженный файл может совпасть по содержимому с фотографией, уже лежащей в портфолио
+        kept_photo_ids = {photo.pk for photo in [*existing_photos, *uploaded_photos]}
+
+        removed_photo_ids = current_photo_ids - kept_photo_ids
+        if removed_photo_ids:
+            PortfolioPhotos.objects.filter(portfolio=instance, photo_id__in=removed_photo_ids).delete()
+            # фотографии, которые больше нигде не используются, удалит фоновая задача
+            enqueue('photo.release', {'photo_ids': sorted(removed_photo_ids)})
 
         instance.save()
         return instance
@@ -1,3 +1,20 @@
-from django.test import TestCase
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+
+from apps.photo.models import Photo, PhotoDerivative
+from apps.portfolio.models import PortfolioPhotos
+from common.testing.plans import QueryPlanTestCase
+
+
+class PortfolioPlanTests(QueryPlanTestCase):
+    # при 100 исполнителях фотографий и превью меньше тысячи и Seq Scan по ним честно дешевле
+    seed_options = {'executors': 500, 'orders_per_executor': 5, 'slots_per_day': 1}
+    large_models = (PortfolioPhotos, Photo, PhotoDerivative)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    def test_plans(self):
+        studio = get_user_model().objects.filter(studio_profile__isnull=False).order_by('id').first()
+        photographer = get_user_model().objects.filter(photographer_profile__isnull=False).order_by('id').first()
+        self.assert_plans('portfolio_list_studio', '/api/portfolio/', studio)
+        self.assert_plans('portfolio_list_photographer', '/api/portfolio/', photographer)
@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions
 from rest_framework.exceptions import PermissionDenied
 from .models import Portfolio, Studio, Photographer
+from .pagination.pagination import PortfolioPagination
 from .serializers.serializers import PortfolioSerializer
 from ..users.permissions.permissions import IsExecutor
 
@@ -9,13 +10,15 @@ class PortfolioViewSet(viewsets.ModelViewSet):
     queryset = Portfolio.objects.all()
     serializer_class = PortfolioSerializer
     permission_classes = [IsExecutor]
+    pagination_class = PortfolioPagination
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Portfolio.objects.select_related('studio', 'photographer').prefetch_related('photos__derivatives')
         if hasattr(user, 'studio_profile'):
-            return Portfolio.objects.filter(studio=user.studio_profile)
+            return queryset.filter(studio=user.studio_profile)
         elif hasattr(user, 'photographer_profile'):
-            return Portfolio.objects.filter(photographer=user.photographer_profile)
+            return queryset.filter(photographer=user.photographer_profile)
         return Portfolio.objects.none()
 
     def perform_create(self, serializer):
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.schedule.services.calendar import CalendarService
+
+
+class Command(BaseCommand):
+    help = 'Compare the availability calendar and bitmaps with a full recomputation from schedules and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild the calendar if it is inconsistent')
+        parser.add_argument('--show', type=int, default=10, help='How many differences of each kind to print')
+
+    def handle(self, *args, **options):
+        differences = CalendarService.check()
+        total = sum(len(keys) for keys in differences.values())
+        for kind, keys in differences.items():
+            self.stdout.write(f'{kind}: {len(keys)}')
+            for key in keys[:options['show']]:
+                self.stdout.write(f'  {key[0]} {key[1].isoformat()}')
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Calendar is consistent'))
+            return
+        if options['fix']:
+            count = CalendarService.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} calendar slots'))
+            return
+        raise CommandError(f'Calendar has {total} differences, run with --fix to rebuild it')
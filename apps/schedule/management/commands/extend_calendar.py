@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.schedule.services.calendar import CalendarService
+
+
+class Command(BaseCommand):
+    help = 'Drop past days from the availability calendar and build the days entering the horizon (run nightly)'
+
+    def handle(self, *args, **options):
+        pruned, added = CalendarService.extend()
+        self.stdout.write(self.style.SUCCESS(f'Removed {pruned} past calendar slots, added {added}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.schedule.services.calendar import CalendarService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the availability calendar and bitmaps of all executors for AVAILABILITY_HORIZON_DAYS'
+
+    def handle(self, *args, **options):
+        count = CalendarService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} calendar slots'))
@@ -1,7 +1,67 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, RangeOperators
 from django.db import models
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def get_slot_bound(executor_id, weekday, value):
+    """
+    Точка на общей оси для всех исполнителей: слоты разных исполнителей
+    и дней недели не пересекаются, поэтому пересечение на этой оси -
+    это пересечение слотов одного исполнителя в один день.
+    Расписание без исполнителя на оси не лежит: None, как NULL в SQL.
+    """
+    if executor_id is None:
+        return None
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return (executor_id * 8 + weekday) * SECONDS_PER_DAY + seconds
+
+
+class SlotBound(models.Func):
+    """
+    SQL-версия get_slot_bound.
+    """
+    output_field = models.BigIntegerField()
+
+    def __init__(self, executor, weekday, value, **extra):
+        super().__init__(executor, weekday, value, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql_parts = []
+        params = []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sql_parts.append(sql)
+            params.extend(expression_params)
+        executor, weekday, value = sql_parts
+        sql = (
+            f'((({executor})::bigint * 8 + ({weekday})) * {SECONDS_PER_DAY}'
+            f' + EXTRACT(EPOCH FROM ({value}))::bigint)'
+        )
+        return sql, params
+
+
+class SlotRange(models.Func):
+    """
+    Полуинтервал [start_time, end_time) слота на оси get_slot_bound.
+    """
+    function = 'int8range'
+    output_field = BigIntegerRangeField()
+
+    def __init__(self, executor='executor', weekday='weekday', start_time='start_time', end_time='end_time', **extra):
+        super().__init__(
+            SlotBound(executor, weekday, start_time),
+            SlotBound(executor, weekday, end_time),
+            **extra
+        )
+
+
+OVERLAP_CONSTRAINT_NAME = 'exclude_overlapping_schedules'
+
 
 class Schedule(models.Model):
     DAYS_OF_WEEK = (
@@ -18,13 +78,23 @@ class Schedule(models.Model):
     weekday = models.PositiveSmallIntegerField(choices=DAYS_OF_WEEK)
     start_time = models.TimeField(blank=False, null=False)
     end_time = models.TimeField(blank=False, null=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(
                 fields=['executor', 'weekday', 'start_time', 'end_time'],
                 name='unique_schedule_per_executor'
-            )
+            ),
+            # исполнитель и день недели входят в границы диапазона, поэтому хватает
+            # обычного GiST по range без расширения btree_gist. Без исполнителя
+            # границы NULL дают неограниченный диапазон, такие строки не проверяются
+            ExclusionConstraint(
+                name=OVERLAP_CONSTRAINT_NAME,
+                expressions=[(SlotRange(), RangeOperators.OVERLAPS)],
+                condition=Q(executor__isnull=False),
+                violation_error_message='Это расписание пересекается с другим расписанием исполнителя.',
+            ),
         ]
         verbose_name = "Schedule"
         verbose_name_plural = "Schedules"
@@ -41,3 +111,85 @@ class Schedule(models.Model):
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+
+
+class AvailabilityBitmap(models.Model):
+    """
+    Свободное время исполнителя на дату: бит i установлен, если получас i
+    задевает хотя бы один свободный слот. Строки с пустой маской не хранятся.
+    Поддерживается AvailabilitySearchService, см. apps/schedule/signals.py.
+    """
+    SLOT_MINUTES = 30
+    SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+    # индекс по executor не нужен: его покрывает уникальный (executor, date)
+    executor = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name='availability_bitmaps', db_index=False
+    )
+    date = models.DateField()
+    free_mask = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['executor', 'date'], name='unique_availability_per_executor_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'executor'], name='availability_date_executor_idx'),
+        ]
+
+
+class CalendarSlot(models.Model):
+    """
+    Материализованный календарь: слот расписания на конкретную дату в пределах
+    горизонта AVAILABILITY_HORIZON_DAYS. Поддерживается CalendarService
+    из сигналов Order и Schedule, продлевается командой extend_calendar.
+    """
+    STATUS_FREE = 'free'
+    STATUS_BOOKED = 'booked'
+    STATUS_CHOICES = (
+        (STATUS_FREE, 'Free'),
+        (STATUS_BOOKED, 'Booked'),
+    )
+
+    # индекс по executor покрывает составной (executor, date)
+    executor = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name='calendar_slots', db_index=False
+    )
+    schedule = models.ForeignKey(
+        Schedule, on_delete=models.CASCADE, related_name='calendar_slots', db_index=False
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_FREE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'date'], name='unique_calendar_slot_per_schedule_date'),
+        ]
+        indexes = [
+            models.Index(fields=['executor', 'date'], name='calendar_executor_date_idx'),
+            models.Index(fields=['date'], name='calendar_date_idx'),
+        ]
+
+
+class CalendarState(models.Model):
+    """
+    Период, на который календарь CalendarSlot действительно построен: одна
+    строка, её пишут rebuild_calendar и extend_calendar. Пока строки нет или
+    период не покрывает запрос, календарю верить нельзя.
+    """
+    built_from = models.DateField()
+    built_to = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Calendar {self.built_from} - {self.built_to}"
+
+
+class CalendarFeedToken(models.Model):
+    """
+    Секрет в адресе iCalendar-ленты исполнителя: календарные приложения
+    не умеют авторизоваться, поэтому доступ к ленте даёт знание токена.
+    """
+    executor = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='calendar_feed_token')
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,7 @@
+from common.pagination import BasePagination
+
+
+class SchedulePagination(BasePagination):
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 200
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from apps.schedule.models import Schedule
+from apps.schedule.services.calendar import CalendarService
+from apps.schedule.services.overlap import OverlapService
+from apps.schedule.services.search import AvailabilitySearchService
+from apps.schedule.services.services import AvailabilityService, ScheduleTemplateService
 from apps.users.models import Studio, Photographer
 
 
@@ -24,9 +30,13 @@ class CreateScheduleSerializer(serializers.ModelSerializer):
         allow_null=True
     )
 
+    OVERLAP_MESSAGE = 'Это расписание пересекается с другим расписанием исполнителя.'
+
     class Meta:
         model = Schedule
         fields = ['executor', 'weekday', 'start_time', 'end_time']
+        # пересечения, в том числе точные дубликаты, проверяет validate_slot
+        validators = []
 
     def __init__(self, *args, **kwargs):
         super(CreateScheduleSerializer, self).__init__(*args, **kwargs)
@@ -58,13 +68,7 @@ class CreateScheduleSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError({'executor': 'У вас нет разрешения на создание расписаний.'})
 
-        if Schedule.objects.filter(
-            executor=data['executor'],
-            weekday=data['weekday'],
-            start_time=data['start_time'],
-            end_time=data['end_time']
-        ).exists():
-            raise serializers.ValidationError({'error': 'Это расписание уже существует для данного исполнителя.'})
+        self.validate_slot(data['executor'], data['weekday'], data['start_time'], data['end_time'])
 
         return data
 
@@ -88,18 +92,184 @@ class CreateScheduleSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError({'executor': 'У вас нет разрешения на изменение расписаний.'})
 
-        if Schedule.objects.filter(
-            executor=data['executor'],
-            weekday=data['weekday'],
-            start_time=data['start_time'],
-            end_time=data['end_time']
-        ).exclude(pk=instance.pk).exists():
-            raise serializers.ValidationError({'error': 'Это расписание уже существует для данного исполнителя.'})
+        self.validate_slot(
+            data['executor'],
+            data.get('weekday', instance.weekday),
+            data.get('start_time', instance.start_time),
+            data.get('end_time', instance.end_time),
+            exclude_pk=instance.pk,
+        )
 
         return data
 
+    def validate_slot(self, executor, weekday, start_time, end_time, exclude_pk=None):
+        if start_time >= end_time:
+            raise serializers.ValidationError({'end_time': 'Время начала должно быть раньше времени окончания.'})
+        # точный дубликат тоже пересекается, отдельная проверка не нужна
+        overlapping = OverlapService.get_overlapping_schedules(
+            executor, weekday, start_time, end_time, exclude_pk=exclude_pk
+        )
+        if overlapping.exists():
+            raise serializers.ValidationError({'error': self.OVERLAP_MESSAGE})
+
+    def save_slot(self, save):
+        # параллельный запрос мог занять время между проверкой и вставкой
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError as error:
+            if OverlapService.is_overlap_conflict(error):
+                raise serializers.ValidationError({'error': self.OVERLAP_MESSAGE})
+            raise
+
     def create(self, validated_data):
-        return super().create(validated_data)
+        return self.save_slot(lambda: super(CreateScheduleSerializer, self).create(validated_data))
 
     def update(self, instance, validated_data):
-        return super().update(instance, validated_data)
+        return self.save_slot(lambda: super(CreateScheduleSerializer, self).update(instance, validated_data))
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    executors = serializers.CharField(help_text="ID исполнителей через запятую")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=False, source='date_from')
+        fields['to'] = serializers.DateField(required=False, source='date_to')
+        return fields
+
+    def validate_executors(self, value):
+        try:
+            executor_ids = {int(executor_id) for executor_id in value.split(',') if executor_id.strip()}
+        except ValueError:
+            raise serializers.ValidationError('Ожидается список ID исполнителей через запятую.')
+        if not executor_ids:
+            raise serializers.ValidationError('Не указан ни один исполнитель.')
+        return executor_ids
+
+    def validate(self, data):
+        default_from, default_to = AvailabilityService.get_default_window()
+        date_from = data.get('date_from', default_from)
+        date_to = data.get('date_to', date_from + (default_to - default_from))
+
+        if date_from > date_to:
+            raise serializers.ValidationError({'to': 'Дата окончания не может быть раньше даты начала.'})
+        if (date_to - date_from).days > AvailabilityService.MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(
+                {'to': f'Период не может превышать {AvailabilityService.MAX_WINDOW_DAYS} дней.'}
+            )
+
+        return {'executor_ids': data['executors'], 'date_from': date_from, 'date_to': date_to}
+
+
+class ScheduleSlotSerializer(serializers.Serializer):
+    weekday = serializers.ChoiceField(choices=Schedule.DAYS_OF_WEEK)
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError('Время начала должно быть раньше времени окончания.')
+        return data
+
+
+class ScheduleTemplateSerializer(serializers.Serializer):
+    executor = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.select_related('studio_profile', 'photographer_profile'),
+        required=False,
+        allow_null=True
+    )
+    slots = ScheduleSlotSerializer(many=True, allow_empty=True)
+
+    def validate_slots(self, value):
+        if len(value) > ScheduleTemplateService.MAX_TEMPLATE_SLOTS:
+            raise serializers.ValidationError(
+                f'Шаблон не может содержать больше {ScheduleTemplateService.MAX_TEMPLATE_SLOTS} слотов.'
+            )
+        slots = [(slot['weekday'], slot['start_time'], slot['end_time']) for slot in value]
+        if len(set(slots)) != len(slots):
+            raise serializers.ValidationError('Слоты в шаблоне не должны повторяться.')
+        overlaps = OverlapService.find_template_overlaps(slots)
+        if overlaps:
+            weekday, start_time, end_time = overlaps[0]
+            raise serializers.ValidationError(
+                f'Слот {weekday} {start_time:%H:%M}-{end_time:%H:%M} пересекается с другим слотом шаблона.'
+            )
+        return slots
+
+    def validate(self, data):
+        user = self.context['request'].user
+        executor = data.get('executor', None)
+
+        if hasattr(user, 'studio_profile') or hasattr(user, 'photographer_profile'):
+            if executor is not None and executor != user:
+                raise serializers.ValidationError({'executor': 'Вы не можете изменять расписания другого исполнителя.'})
+            data['executor'] = user
+        elif user.is_superuser:
+            if executor is None:
+                raise serializers.ValidationError({'executor': 'Это поле обязательно для администраторов.'})
+            if not (hasattr(executor, 'studio_profile') or hasattr(executor, 'photographer_profile')):
+                raise serializers.ValidationError({'executor': 'Исполнитель должен быть студией или фотографом.'})
+        else:
+            raise serializers.ValidationError({'executor': 'У вас нет разрешения на изменение расписаний.'})
+
+        return data
+
+
+class AvailabilitySearchQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False, help_text="Одна дата вместо периода from-to")
+    start = serializers.TimeField(help_text="Начало окна времени")
+    end = serializers.TimeField(help_text="Конец окна времени")
+    type = serializers.ChoiceField(choices=AvailabilitySearchService.EXECUTOR_TYPES, required=False)
+    city = serializers.CharField(required=False, help_text="Город студии")
+    after = serializers.IntegerField(required=False, help_text="ID исполнителя, после которого начинается страница")
+    limit = serializers.IntegerField(
+        min_value=1, max_value=AvailabilitySearchService.MAX_LIMIT, default=AvailabilitySearchService.DEFAULT_LIMIT
+    )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=False, source='date_from')
+        fields['to'] = serializers.DateField(required=False, source='date_to')
+        return fields
+
+    def validate(self, data):
+        if 'date' in data:
+            if 'date_from' in data or 'date_to' in data:
+                raise serializers.ValidationError({'date': 'Укажите либо date, либо период from-to.'})
+            date_from = date_to = data.pop('date')
+            from_field = to_field = 'date'
+        elif 'date_from' in data:
+            date_from = data.pop('date_from')
+            date_to = data.pop('date_to', date_from)
+            from_field, to_field = 'from', 'to'
+        else:
+            raise serializers.ValidationError({'date': 'Укажите date или период from-to.'})
+
+        # календарь строится только от сегодняшнего дня на AVAILABILITY_HORIZON_DAYS вперёд
+        horizon_from, horizon_to = CalendarService.get_horizon()
+        if date_from < horizon_from:
+            raise serializers.ValidationError({from_field: 'Дата не может быть в прошлом.'})
+        if date_to >= horizon_to:
+            raise serializers.ValidationError(
+                {to_field: f'Поиск доступен только на {settings.AVAILABILITY_HORIZON_DAYS} дней вперёд.'}
+            )
+        if date_from > date_to:
+            raise serializers.ValidationError({'to': 'Дата окончания не может быть раньше даты начала.'})
+        if (date_to - date_from).days > AvailabilitySearchService.MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(
+                {'to': f'Период не может превышать {AvailabilitySearchService.MAX_WINDOW_DAYS} дней.'}
+            )
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError({'end': 'Время начала должно быть раньше времени окончания.'})
+
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'start_time': data['start'],
+            'end_time': data['end'],
+            'executor_type': data.get('type'),
+            'city': data.get('city'),
+            'after': data.get('after'),
+            'limit': data['limit'],
+        }
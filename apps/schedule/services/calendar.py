@@ -0,0 +1,267 @@
+import contextvars
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Exists, OuterRef, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from apps.jobs.services.services import enqueue
+from apps.order.models import Order
+from apps.schedule.models import AvailabilityBitmap, CalendarSlot, CalendarState, Schedule
+from apps.schedule.services.search import AvailabilitySearchService
+
+_sync_suspended = contextvars.ContextVar('calendar_sync_suspended', default=False)
+
+
+class CalendarNotBuilt(APIException):
+    status_code = 503
+    default_detail = 'Календарь на этот период ещё не построен, повторите запрос позже.'
+    default_code = 'calendar_not_built'
+
+
+class CalendarService:
+    """
+    Календарь CalendarSlot (и маски AvailabilityBitmap поверх него) на горизонт
+    AVAILABILITY_HORIZON_DAYS от сегодняшнего дня.
+    Изменения Order и Schedule переносятся в календарь сигналами, пакетные
+    операции синхронизируют его сами; extend_calendar раз в сутки удаляет
+    прошедшие дни и достраивает новые, check_calendar сверяет календарь
+    с полным пересчётом. Построенный период хранится в CalendarState.
+    """
+    STATE_PK = 1
+
+    @staticmethod
+    def get_horizon():
+        today = timezone.localdate()
+        return today, today + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS)
+
+    @staticmethod
+    def get_built_window():
+        """
+        (built_from, built_to) построенного календаря или None, если rebuild_calendar ещё не запускался.
+        """
+        return CalendarState.objects.filter(pk=CalendarService.STATE_PK).values_list('built_from', 'built_to').first()
+
+    @staticmethod
+    def set_built_window(date_from, date_to):
+        CalendarState.objects.update_or_create(
+            pk=CalendarService.STATE_PK, defaults={'built_from': date_from, 'built_to': date_to},
+        )
+
+    @staticmethod
+    def covers(date_from, date_to):
+        """
+        Лежит ли период в построенном календаре. Если extend_calendar не
+        запускался, дни после построенного периода календарём не покрыты.
+        """
+        built_window = CalendarService.get_built_window()
+        if built_window is None:
+            return False
+        horizon_from, horizon_to = CalendarService.get_horizon()
+        return max(horizon_from, built_window[0]) <= date_from and date_to <= min(horizon_to, built_window[1])
+
+    @staticmethod
+    @contextmanager
+    def suspend_sync():
+        """
+        Отключает синхронизацию из сигналов: пакетные операции синхронизируют
+        календарь один раз в конце вместо обработки каждой строки.
+        """
+        token = _sync_suspended.set(True)
+        try:
+            yield
+        finally:
+            _sync_suspended.reset(token)
+
+    @staticmethod
+    def is_sync_suspended():
+        return _sync_suspended.get()
+
+    @staticmethod
+    def compute(date_from, date_to, executor_ids=None, schedule_ids=None, weekdays=None):
+        """
+        Полный пересчёт календаря из Schedule и Order:
+        {(schedule_id, date): (executor_id, status)}.
+        """
+        schedules = Schedule.objects.exclude(executor=None)
+        orders = Order.objects.filter(date__gte=date_from, date__lte=date_to)
+        if executor_ids is not None:
+            schedules = schedules.filter(executor_id__in=executor_ids)
+            orders = orders.filter(schedule__executor_id__in=executor_ids)
+        if schedule_ids is not None:
+            schedules = schedules.filter(pk__in=schedule_ids)
+            orders = orders.filter(schedule_id__in=schedule_ids)
+        if weekdays is not None:
+            schedules = schedules.filter(weekday__in=weekdays)
+
+        weekly_schedules = {}
+        for schedule_id, executor_id, weekday in schedules.values_list('id', 'executor_id', 'weekday'):
+            weekly_schedules.setdefault(weekday, []).append((schedule_id, executor_id))
+        if not weekly_schedules:
+            return {}
+        booked_slots = set(orders.values_list('schedule_id', 'date'))
+
+        slots = {}
+        current_date = date_from
+        while current_date <= date_to:
+            for schedule_id, executor_id in weekly_schedules.get(current_date.weekday() + 1, ()):
+                booked = (schedule_id, current_date) in booked_slots
+                status = CalendarSlot.STATUS_BOOKED if booked else CalendarSlot.STATUS_FREE
+                slots[(schedule_id, current_date)] = (executor_id, status)
+            current_date += timedelta(days=1)
+        return slots
+
+    @staticmethod
+    def build(date_from=None, date_to=None, executor_ids=None, schedule_ids=None, weekdays=None, batch_size=5000):
+        """
+        Перестраивает строки календаря в заданных границах (по умолчанию - весь
+        горизонт). Маски пересчитывает вызывающий. Возвращает число строк.
+        """
+        horizon_from, horizon_to = CalendarService.get_horizon()
+        date_from = max(date_from or horizon_from, horizon_from)
+        date_to = min(date_to or horizon_to, horizon_to)
+        if date_from > date_to:
+            return 0
+
+        slots = CalendarService.compute(date_from, date_to, executor_ids, schedule_ids, weekdays)
+        rows = CalendarSlot.objects.filter(date__gte=date_from, date__lte=date_to)
+        if executor_ids is not None:
+            rows = rows.filter(executor_id__in=executor_ids)
+        if schedule_ids is not None:
+            rows = rows.filter(schedule_id__in=schedule_ids)
+        if weekdays is not None:
+            rows = rows.filter(date__week_day__in=[weekday % 7 + 1 for weekday in weekdays])
+
+        with transaction.atomic():
+            rows.delete()
+            CalendarSlot.objects.bulk_create([
+                CalendarSlot(executor_id=executor_id, schedule_id=schedule_id, date=date, status=status)
+                for (schedule_id, date), (executor_id, status) in slots.items()
+            ], batch_size=batch_size)
+        return len(slots)
+
+    @staticmethod
+    def rebuild():
+        """
+        Полная перестройка календаря и масок. Возвращает число строк календаря.
+        """
+        with transaction.atomic():
+            horizon_from, horizon_to = CalendarService.get_horizon()
+            CalendarSlot.objects.exclude(date__gte=horizon_from, date__lte=horizon_to).delete()
+            AvailabilityBitmap.objects.exclude(date__gte=horizon_from, date__lte=horizon_to).delete()
+            count = CalendarService.build()
+            # таблица переписана целиком, маски строятся по ней же - статистика нужна сразу
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(CalendarSlot._meta.db_table)}')
+            AvailabilitySearchService.refresh()
+            CalendarService.set_built_window(horizon_from, horizon_to)
+        return count
+
+    @staticmethod
+    def extend():
+        """
+        Сдвигает горизонт: удаляет прошедшие дни и достраивает дни после
+        построенного периода. Календарь, который ещё не строился, строится
+        целиком. Возвращает (удалено строк, добавлено строк).
+        """
+        built_window = CalendarService.get_built_window()
+        if built_window is None:
+            return 0, CalendarService.rebuild()
+
+        horizon_from, horizon_to = CalendarService.get_horizon()
+        with transaction.atomic():
+            pruned, _ = CalendarSlot.objects.filter(date__lt=horizon_from).delete()
+            AvailabilityBitmap.objects.filter(date__lt=horizon_from).delete()
+
+            date_from = max(built_window[1] + timedelta(days=1), horizon_from)
+            added = CalendarService.build(date_from, horizon_to)
+            if added:
+                AvailabilitySearchService.refresh(date_from=date_from, date_to=horizon_to)
+            CalendarService.set_built_window(horizon_from, horizon_to)
+        return pruned, added
+
+    @staticmethod
+    def check():
+        """
+        Сравнивает календарь и маски с полным пересчётом на весь горизонт.
+        Возвращает {'missing', 'extra', 'mismatched', 'wrong_bitmaps'}: списки
+        (schedule_id, date) для календаря и (executor_id, date) для масок.
+        """
+        horizon_from, horizon_to = CalendarService.get_horizon()
+        expected = CalendarService.compute(horizon_from, horizon_to)
+        actual = {
+            (schedule_id, date): (executor_id, status)
+            for schedule_id, date, executor_id, status in CalendarSlot.objects.filter(
+                date__gte=horizon_from,
+                date__lte=horizon_to,
+            ).values_list('schedule_id', 'date', 'executor_id', 'status').iterator()
+        }
+
+        slot_times = {
+            schedule_id: (start_time, end_time)
+            for schedule_id, start_time, end_time in Schedule.objects.values_list('id', 'start_time', 'end_time')
+        }
+        expected_masks = AvailabilitySearchService.compute_masks(
+            (executor_id, date, *slot_times[schedule_id])
+            for (schedule_id, date), (executor_id, status) in expected.items()
+            if status == CalendarSlot.STATUS_FREE
+        )
+        actual_masks = {
+            (executor_id, date): mask
+            for executor_id, date, mask in AvailabilityBitmap.objects.filter(
+                date__gte=horizon_from,
+                date__lte=horizon_to,
+            ).values_list('executor_id', 'date', 'free_mask').iterator()
+        }
+
+        return {
+            'missing': sorted(expected.keys() - actual.keys()),
+            'extra': sorted(actual.keys() - expected.keys()),
+            'mismatched': sorted(key for key in expected.keys() & actual.keys() if expected[key] != actual[key]),
+            'wrong_bitmaps': sorted(
+                key for key in expected_masks.keys() | actual_masks.keys()
+                if expected_masks.get(key) != actual_masks.get(key)
+            ),
+        }
+
+    @staticmethod
+    def sync_orders(executor_ids, date_from, date_to, weekdays=None):
+        """
+        Пересчитывает статусы существующих строк по Order одним UPDATE и маски за тот же период.
+        """
+        rows = CalendarSlot.objects.filter(executor_id__in=executor_ids, date__gte=date_from, date__lte=date_to)
+        rows.update(status=Case(
+            When(
+                Exists(Order.objects.filter(schedule_id=OuterRef('schedule_id'), date=OuterRef('date'))),
+                then=Value(CalendarSlot.STATUS_BOOKED),
+            ),
+            default=Value(CalendarSlot.STATUS_FREE),
+        ))
+        AvailabilitySearchService.refresh(executor_ids, date_from, date_to, weekdays)
+
+    @staticmethod
+    def schedule_sync_orders(executor_id, date_from, date_to, weekdays=None):
+        """
+        sync_orders фоновой задачей после коммита: задача ставится в текущей
+        транзакции и пропадает вместе с её откатом, блокировки заказов не
+        держатся на время пересчёта календаря.
+        """
+        enqueue('schedule.sync_orders', {
+            'executor_id': executor_id,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'weekdays': sorted(weekdays) if weekdays is not None else None,
+        })
+
+    @staticmethod
+    def sync_schedules(schedule_ids, executor_ids, weekdays=None):
+        """
+        Перестраивает строки расписаний schedule_ids на весь горизонт и маски
+        исполнителей executor_ids (прежних и новых владельцев расписаний).
+        """
+        if schedule_ids:
+            CalendarService.build(schedule_ids=schedule_ids)
+        AvailabilitySearchService.refresh(executor_ids, weekdays=weekdays)
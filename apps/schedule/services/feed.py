@@ -0,0 +1,142 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.order.models import Order
+from apps.schedule.models import CalendarFeedToken, Schedule
+
+WEEKDAY_CODES = {1: 'MO', 2: 'TU', 3: 'WE', 4: 'TH', 5: 'FR', 6: 'SA', 7: 'SU'}
+
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """
+    Строка iCalendar не длиннее 75 байт, продолжение начинается с пробела (RFC 5545, 3.1).
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # не режем UTF-8 посреди символа
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(date, time):
+    # плавающее время без TZID: слоты расписания заданы в местном времени исполнителя
+    return datetime.combine(date, time).strftime('%Y%m%dT%H%M%S')
+
+
+class CalendarFeedService:
+    """
+    iCalendar-лента исполнителя: будущие заказы и еженедельные слоты расписания.
+    Лента генерируется по частям из итераторов запросов, поэтому память не
+    зависит от числа заказов.
+    """
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def get_or_create_token(executor, rotate=False):
+        feed_token = CalendarFeedToken.objects.filter(executor=executor).first()
+        if feed_token is None:
+            return CalendarFeedToken.objects.create(executor=executor, token=secrets.token_urlsafe(32))
+        if rotate:
+            feed_token.token = secrets.token_urlsafe(32)
+            feed_token.save(update_fields=['token'])
+        return feed_token
+
+    @staticmethod
+    def get_executor_id(token):
+        return CalendarFeedToken.objects.filter(token=token).values_list('executor_id', flat=True).first()
+
+    @staticmethod
+    def get_orders(executor_id):
+        return Order.objects.filter(executor_id=executor_id, date__gte=timezone.localdate())
+
+    @staticmethod
+    def get_version(executor_id):
+        """
+        (ETag, Last-Modified) ленты. Кроме последнего updated_at в ETag входят
+        количества строк - они меняются при удалении - и текущая дата, потому что
+        прошедшие заказы выпадают из ленты.
+        """
+        orders = CalendarFeedService.get_orders(executor_id).aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        schedules = Schedule.objects.filter(executor_id=executor_id).aggregate(
+            count=Count('id'), updated_at=Max('updated_at')
+        )
+        last_modified = max(filter(None, (orders['updated_at'], schedules['updated_at'])), default=None)
+        version = (
+            f"{timezone.localdate()}:{orders['count']}:{orders['updated_at']}"
+            f":{schedules['count']}:{schedules['updated_at']}"
+        )
+        return f'"{hashlib.md5(version.encode()).hexdigest()}"', last_modified
+
+    @staticmethod
+    def iter_feed(executor_id, domain):
+        yield fold_line('BEGIN:VCALENDAR')
+        yield fold_line('VERSION:2.0')
+        yield fold_line('PRODID:-//PhotoArea//Executor calendar//RU')
+        yield fold_line('CALSCALE:GREGORIAN')
+        yield fold_line('X-WR-CALNAME:PhotoArea')
+
+        schedules = Schedule.objects.filter(executor_id=executor_id).order_by('weekday', 'start_time')
+        for schedule in schedules.iterator(chunk_size=CalendarFeedService.CHUNK_SIZE):
+            yield ''.join(CalendarFeedService.get_schedule_event(schedule, domain))
+
+        orders = CalendarFeedService.get_orders(executor_id).select_related('schedule', 'client').order_by('date', 'id')
+        for order in orders.iterator(chunk_size=CalendarFeedService.CHUNK_SIZE):
+            yield ''.join(CalendarFeedService.get_order_event(order, domain))
+
+        yield fold_line('END:VCALENDAR')
+
+    @staticmethod
+    def get_schedule_event(schedule, domain):
+        # первое повторение - ближайший нужный день недели после последнего изменения слота,
+        # так событие не меняется, пока не изменится сам слот
+        changed_on = schedule.updated_at.date()
+        first_date = changed_on + timedelta(days=(schedule.weekday - 1 - changed_on.weekday()) % 7)
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:schedule-{schedule.pk}@{domain}',
+            f"DTSTAMP:{schedule.updated_at.strftime('%Y%m%dT%H%M%SZ')}",
+            f'DTSTART:{format_datetime(first_date, schedule.start_time)}',
+            f'DTEND:{format_datetime(first_date, schedule.end_time)}',
+            f'RRULE:FREQ=WEEKLY;BYDAY={WEEKDAY_CODES[schedule.weekday]}',
+            'SUMMARY:Слот расписания',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+        return [fold_line(line) for line in lines]
+
+    @staticmethod
+    def get_order_event(order, domain):
+        summary = f'Заказ #{order.pk}'
+        if order.client:
+            client_name = ' '.join(filter(None, (order.client.first_name, order.client.last_name)))
+            summary += f': {client_name or order.client.email}'
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:order-{order.pk}@{domain}',
+            f"DTSTAMP:{order.updated_at.strftime('%Y%m%dT%H%M%SZ')}",
+            f'DTSTART:{format_datetime(order.date, order.schedule.start_time)}',
+            f'DTEND:{format_datetime(order.date, order.schedule.end_time)}',
+            f'SUMMARY:{escape_text(summary)}',
+            'STATUS:CONFIRMED',
+            'END:VEVENT',
+        ]
+        return [fold_line(line) for line in lines]
@@ -0,0 +1,106 @@
+import bisect
+from collections import defaultdict
+
+from psycopg2.extras import NumericRange
+
+from apps.order.models import Order
+from apps.schedule.models import OVERLAP_CONSTRAINT_NAME, Schedule, SlotRange, get_slot_bound
+
+
+class IntervalIndex:
+    """
+    Отсортированный набор непересекающихся полуинтервалов [start, end).
+    Пересекающиеся интервалы при построении сливаются, поэтому проверка
+    пересечения - один bisect: O(log n) на запрос.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start < self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end):
+        # последний интервал, начинающийся раньше end, - единственный кандидат
+        position = bisect.bisect_left(self.starts, end)
+        return position > 0 and self.ends[position - 1] > start
+
+    def add(self, start, end):
+        """
+        Добавляет интервал, если он ни с чем не пересекается. Возвращает, добавлен ли он.
+        """
+        if self.overlaps(start, end):
+            return False
+        position = bisect.bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        return True
+
+
+class OverlapService:
+    """
+    Пересечения слотов одного исполнителя. В БД их запрещает ограничение
+    exclude_overlapping_schedules на Schedule; запросы ниже используют его
+    GiST-индекс, а IntervalIndex делает ту же проверку в памяти для пакетных
+    операций, где данные уже загружены.
+    Раз слоты исполнителя не пересекаются, заказы на разные слоты в одну дату
+    тоже не пересекаются, и одиночному бронированию хватает уникальности
+    (schedule, date).
+    """
+
+    @staticmethod
+    def is_overlap_conflict(error):
+        diag = getattr(error.__cause__, 'diag', None)
+        return getattr(diag, 'constraint_name', None) == OVERLAP_CONSTRAINT_NAME
+
+    @staticmethod
+    def get_overlapping_schedules(executor, weekday, start_time, end_time, exclude_pk=None):
+        executor_id = getattr(executor, 'pk', executor)
+        if executor_id is None:
+            return Schedule.objects.none()
+        # условие частичного индекса ограничения, иначе планировщик его не возьмёт
+        schedules = Schedule.objects.filter(executor__isnull=False).alias(slot=SlotRange()).filter(
+            slot__overlap=NumericRange(
+                get_slot_bound(executor_id, weekday, start_time),
+                get_slot_bound(executor_id, weekday, end_time),
+            )
+        )
+        if exclude_pk is not None:
+            schedules = schedules.exclude(pk=exclude_pk)
+        return schedules
+
+    @staticmethod
+    def find_template_overlaps(slots):
+        """
+        Пересекающиеся слоты недельного шаблона (weekday, start_time, end_time).
+        """
+        indexes = defaultdict(IntervalIndex)
+        overlaps = []
+        for weekday, start_time, end_time in sorted(slots):
+            if not indexes[weekday].add(start_time, end_time):
+                overlaps.append((weekday, start_time, end_time))
+        return overlaps
+
+    @staticmethod
+    def get_booked_intervals(executor, date_from, date_to):
+        """
+        Занятые интервалы исполнителя по датам одним запросом: {date: IntervalIndex}.
+        """
+        intervals = defaultdict(list)
+        orders = Order.objects.filter(
+            executor=executor,
+            date__gte=date_from,
+            date__lte=date_to,
+        ).values_list('date', 'schedule__start_time', 'schedule__end_time')
+        for date, start_time, end_time in orders:
+            intervals[date].append((start_time, end_time))
+        booked = defaultdict(IntervalIndex)
+        booked.update({date: IntervalIndex(day_intervals) for date, day_intervals in intervals.items()})
+        return booked
@@ -0,0 +1,124 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.schedule.models import AvailabilityBitmap, CalendarSlot
+
+
+class AvailabilitySearchService:
+    """
+    Поиск свободных исполнителей по дате и окну времени.
+    Кандидаты отбираются по AvailabilityBitmap (индекс по дате и AND маски
+    в запросе), затем для одной страницы кандидатов свободные слоты читаются
+    из CalendarSlot: маска грубее слотов и может дать лишнего исполнителя,
+    но не пропустит нужного. Маски строятся из свободных строк CalendarSlot.
+    """
+    EXECUTOR_TYPES = ('studio', 'photographer')
+    MAX_WINDOW_DAYS = 31
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    @staticmethod
+    def get_mask(start_time, end_time):
+        """
+        Биты получасов, которые задевает полуинтервал [start_time, end_time).
+        """
+        slot_seconds = AvailabilityBitmap.SLOT_MINUTES * 60
+        start = (start_time.hour * 3600 + start_time.minute * 60 + start_time.second) // slot_seconds
+        end_seconds = end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+        end = -(-end_seconds // slot_seconds)
+        if end <= start:
+            return 0
+        return ((1 << (end - start)) - 1) << start
+
+    @staticmethod
+    def compute_masks(free_slots):
+        """
+        Маски {(executor_id, date): mask} по свободным слотам (executor_id, date, start_time, end_time).
+        """
+        masks = defaultdict(int)
+        for executor_id, date, start_time, end_time in free_slots:
+            masks[(executor_id, date)] |= AvailabilitySearchService.get_mask(start_time, end_time)
+        return {key: mask for key, mask in masks.items() if mask}
+
+    @staticmethod
+    def refresh(executor_ids=None, date_from=None, date_to=None, weekdays=None, batch_size=5000):
+        """
+        Пересчитывает маски по календарю: executor_ids=None - все исполнители,
+        без дат - весь календарь, weekdays ограничивает пересчёт днями недели.
+        Возвращает число сохранённых строк.
+        """
+        free_slots = CalendarSlot.objects.filter(status=CalendarSlot.STATUS_FREE)
+        bitmaps = AvailabilityBitmap.objects.all()
+        if executor_ids is not None:
+            free_slots = free_slots.filter(executor_id__in=executor_ids)
+            bitmaps = bitmaps.filter(executor_id__in=executor_ids)
+        if date_from is not None:
+            free_slots = free_slots.filter(date__gte=date_from)
+            bitmaps = bitmaps.filter(date__gte=date_from)
+        if date_to is not None:
+            free_slots = free_slots.filter(date__lte=date_to)
+            bitmaps = bitmaps.filter(date__lte=date_to)
+        if weekdays is not None:
+            free_slots = free_slots.filter(schedule__weekday__in=weekdays)
+            bitmaps = bitmaps.filter(date__week_day__in=[weekday % 7 + 1 for weekday in weekdays])
+
+        masks = AvailabilitySearchService.compute_masks(
+            free_slots.values_list('executor_id', 'date', 'schedule__start_time', 'schedule__end_time')
+        )
+        with transaction.atomic():
+            bitmaps.delete()
+            AvailabilityBitmap.objects.bulk_create([
+                AvailabilityBitmap(executor_id=executor_id, date=date, free_mask=mask)
+                for (executor_id, date), mask in masks.items()
+            ], batch_size=batch_size)
+        return len(masks)
+
+    @staticmethod
+    def search(date_from, date_to, start_time, end_time, executor_type=None, city=None,
+               after=None, limit=DEFAULT_LIMIT):
+        """
+        Исполнители со свободным слотом, целиком лежащим в [start_time, end_time),
+        в одну из дат периода. Город есть только у студий.
+        Возвращает (список исполнителей со слотами, id для следующей страницы или None).
+        """
+        mask = AvailabilitySearchService.get_mask(start_time, end_time)
+        bitmaps = AvailabilityBitmap.objects.filter(
+            date__gte=date_from,
+            date__lte=date_to,
+        ).alias(hit=F('free_mask').bitand(mask)).filter(hit__gt=0)
+        if executor_type == 'studio' or city:
+            bitmaps = bitmaps.filter(executor__studio_profile__isnull=False)
+        elif executor_type == 'photographer':
+            bitmaps = bitmaps.filter(executor__photographer_profile__isnull=False)
+        if city:
+            bitmaps = bitmaps.filter(executor__studio_profile__address__city__iexact=city)
+        if after is not None:
+            bitmaps = bitmaps.filter(executor_id__gt=after)
+
+        executor_ids = list(bitmaps.order_by('executor_id').values_list('executor_id', flat=True).distinct()[:limit])
+        if not executor_ids:
+            return [], None
+        next_after = executor_ids[-1] if len(executor_ids) == limit else None
+        free_slots = CalendarSlot.objects.filter(
+            executor_id__in=executor_ids,
+            schedule__executor_id__in=executor_ids,
+            date__gte=date_from,
+            date__lte=date_to,
+            status=CalendarSlot.STATUS_FREE,
+            schedule__start_time__gte=start_time,
+            schedule__end_time__lte=end_time,
+        ).order_by('executor_id', 'date', 'schedule__start_time').values_list(
+            'executor_id', 'date', 'schedule_id', 'schedule__start_time', 'schedule__end_time'
+        )
+
+        results = {}
+        for executor_id, date, schedule_id, slot_start, slot_end in free_slots:
+            results.setdefault(executor_id, []).append({
+                'date': date.isoformat(),
+                'schedule': schedule_id,
+                'start_time': slot_start.isoformat(),
+                'end_time': slot_end.isoformat(),
+            })
+        return [{'executor': executor_id, 'slots': slots} for executor_id, slots in results.items()], next_after
@@ -0,0 +1,130 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from apps.order.models import Order
+from apps.schedule.models import CalendarSlot, Schedule
+from apps.schedule.services.calendar import CalendarService
+
+
+class AvailabilityService:
+    DEFAULT_WINDOW_DAYS = 14
+    MAX_WINDOW_DAYS = 92
+
+    @staticmethod
+    def get_default_window():
+        today = timezone.localdate()
+        return today, today + timedelta(days=AvailabilityService.DEFAULT_WINDOW_DAYS)
+
+    @staticmethod
+    def get_available_slots(executor_ids, date_from=None, date_to=None):
+        """
+        Свободные слоты для набора исполнителей за период [date_from, date_to].
+        Внутри горизонта календаря - один range scan по CalendarSlot, иначе
+        один запрос к Schedule и один к Order с группировкой в памяти.
+        Возвращает {executor_id: {'YYYY-MM-DD': [schedule_id, ...]}}.
+        """
+        default_from, default_to = AvailabilityService.get_default_window()
+        date_from = date_from or default_from
+        date_to = date_to or default_to
+
+        executor_ids = set(executor_ids)
+        available_slots = {executor_id: {} for executor_id in executor_ids}
+        if not executor_ids or date_from > date_to:
+            return available_slots
+
+        if CalendarService.covers(date_from, date_to):
+            # условие на schedule__executor_id повторяет executor_id, но даёт планировщику
+            # взять слоты этих исполнителей по индексу, а не хешировать всё расписание
+            free_slots = CalendarSlot.objects.filter(
+                executor_id__in=executor_ids,
+                schedule__executor_id__in=executor_ids,
+                date__gte=date_from,
+                date__lte=date_to,
+                status=CalendarSlot.STATUS_FREE,
+            ).order_by('executor_id', 'date', 'schedule__start_time').values_list('executor_id', 'date', 'schedule_id')
+            for executor_id, date, schedule_id in free_slots:
+                available_slots[executor_id].setdefault(date.isoformat(), []).append(schedule_id)
+            return available_slots
+
+        weekly_schedules = defaultdict(lambda: defaultdict(list))
+        schedules = Schedule.objects.filter(executor_id__in=executor_ids).values_list('id', 'executor_id', 'weekday')
+        for schedule_id, executor_id, weekday in schedules:
+            weekly_schedules[executor_id][weekday].append(schedule_id)
+
+        if not weekly_schedules:
+            return available_slots
+
+        occupied_slots = set(Order.objects.filter(
+            executor_id__in=weekly_schedules.keys(),
+            date__gte=date_from,
+            date__lte=date_to
+        ).values_list('schedule_id', 'date'))
+
+        current_date = date_from
+        while current_date <= date_to:
+            weekday = current_date.weekday() + 1
+            for executor_id, day_schedules in weekly_schedules.items():
+                free_slots = [
+                    schedule_id for schedule_id in day_schedules.get(weekday, [])
+                    if (schedule_id, current_date) not in occupied_slots
+                ]
+                if free_slots:
+                    available_slots[executor_id][current_date.isoformat()] = free_slots
+            current_date += timedelta(days=1)
+
+        return available_slots
+
+
+class ScheduleTemplateService:
+    MAX_TEMPLATE_SLOTS = 7 * 48
+
+    @staticmethod
+    def apply(executor, slots):
+        """
+        Заменяет недельное расписание исполнителя шаблоном slots -
+        набором (weekday, start_time, end_time). Совпадающие слоты остаются
+        как есть (вместе с их заказами), недостающие создаются одним
+        bulk_create, лишние удаляются одним delete.
+        Слоты с будущими заказами не удаляются: в этом случае ничего не меняется.
+        Возвращает (расписания после замены, число созданных, число удалённых).
+        """
+        template = set(slots)
+        with transaction.atomic():
+            current = {
+                (schedule.weekday, schedule.start_time, schedule.end_time): schedule
+                for schedule in Schedule.objects.filter(executor=executor).select_for_update()
+            }
+            removed_ids = [schedule.pk for key, schedule in current.items() if key not in template]
+            added = [
+                Schedule(executor=executor, weekday=weekday, start_time=start_time, end_time=end_time)
+                for weekday, start_time, end_time in sorted(template - current.keys())
+            ]
+
+            if removed_ids:
+                booked_ids = set(Order.objects.filter(
+                    schedule_id__in=removed_ids,
+                    date__gte=timezone.localdate(),
+                ).values_list('schedule_id', flat=True).distinct())
+                if booked_ids:
+                    raise ValidationError({'slots': [
+                        f'Расписания {sorted(booked_ids)} уже забронированы на будущие даты и не могут быть удалены.'
+                    ]})
+                with CalendarService.suspend_sync():
+                    Schedule.objects.filter(pk__in=removed_ids).delete()
+            try:
+                created = Schedule.objects.bulk_create(added)
+            except IntegrityError:
+                # слоты исполнителя заблокированы, так что конфликт - только со слотом,
+                # созданным параллельно через обычный create
+                raise ValidationError({'slots': ['Расписание исполнителя изменилось во время сохранения шаблона.']})
+            # строки календаря удалённых расписаний ушли каскадом, для новых их нужно построить
+            if removed_ids or created:
+                CalendarService.sync_schedules([schedule.pk for schedule in created], [executor.pk])
+
+        schedules = [schedule for key, schedule in current.items() if key in template] + created
+        schedules.sort(key=lambda schedule: (schedule.weekday, schedule.start_time))
+        return schedules, len(created), len(removed_ids)
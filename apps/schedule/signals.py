@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.order.models import Order
+from apps.schedule.models import Schedule
+from apps.schedule.services.calendar import CalendarService
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_order_slot(sender, instance, **kwargs):
+    instance._previous_slot = None
+    if not instance._state.adding:
+        instance._previous_slot = Order.objects.filter(pk=instance.pk).values_list('executor_id', 'date').first()
+
+
+@receiver(post_save, sender=Order)
+def sync_calendar_on_order_save(sender, instance, **kwargs):
+    previous_slot = getattr(instance, '_previous_slot', None)
+    if previous_slot and previous_slot != (instance.executor_id, instance.date):
+        sync_order_date(*previous_slot)
+    sync_order_date(instance.executor_id, instance.date)
+
+
+@receiver(post_delete, sender=Order)
+def sync_calendar_on_order_delete(sender, instance, **kwargs):
+    sync_order_date(instance.executor_id, instance.date)
+
+
+@receiver(pre_save, sender=Schedule)
+def remember_previous_schedule_day(sender, instance, **kwargs):
+    instance._previous_day = None
+    if not instance._state.adding:
+        instance._previous_day = Schedule.objects.filter(pk=instance.pk).values_list('executor_id', 'weekday').first()
+
+
+@receiver(post_save, sender=Schedule)
+def sync_calendar_on_schedule_save(sender, instance, created, **kwargs):
+    if CalendarService.is_sync_suspended():
+        return
+    days = {(instance.executor_id, instance.weekday)}
+    previous_day = getattr(instance, '_previous_day', None)
+    if previous_day:
+        days.add(previous_day)
+    # при смене только времени строки календаря не меняются, меняются маски
+    moved = created or len(days) > 1
+    CalendarService.sync_schedules(
+        [instance.pk] if moved else None,
+        [executor_id for executor_id, _ in days if executor_id is not None],
+        weekdays={weekday for _, weekday in days},
+    )
+
+
+@receiver(post_delete, sender=Schedule)
+def sync_calendar_on_schedule_delete(sender, instance, **kwargs):
+    # строки календаря удаляются каскадом вместе с расписанием
+    if instance.executor_id is not None and not CalendarService.is_sync_suspended():
+        CalendarService.sync_schedules(None, [instance.executor_id], weekdays=[instance.weekday])
+
+
+def sync_order_date(executor_id, date):
+    # календарь обновляется фоновой задачей после коммита, а не внутри сохранения заказа
+    if not CalendarService.is_sync_suspended():
+        CalendarService.schedule_sync_orders(executor_id, date, date, weekdays=[date.weekday() + 1])
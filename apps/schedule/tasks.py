@@ -0,0 +1,12 @@
+from datetime import date
+
+from apps.jobs.services.services import register
+from apps.schedule.services.calendar import CalendarService
+
+
+@register('schedule.sync_orders')
+def sync_orders(executor_id, date_from, date_to, weekdays=None):
+    # пересчитываются только строки и маски исполнителя за период заказов
+    CalendarService.sync_orders(
+        [executor_id], date.fromisoformat(date_from), date.fromisoformat(date_to), weekdays=weekdays,
+    )
@@ -1,3 +1,350 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.address.models import Address
+from apps.jobs.models import Job
+from apps.order.models import Order
+from apps.schedule.models import AvailabilityBitmap, CalendarFeedToken, CalendarSlot, CalendarState, Schedule
+from apps.schedule.services.calendar import CalendarService
+from apps.schedule.services.overlap import OverlapService
+from apps.schedule.services.services import AvailabilityService
+from apps.users.models import Photographer, Studio
+from common.testing.plans import QueryPlanTestCase
+
+
+class SchedulePlanTests(QueryPlanTestCase):
+    large_models = (Schedule, Order, CalendarSlot, AvailabilityBitmap)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = get_user_model().objects.filter(studio_profile__isnull=True).order_by('id').first()
+        cls.executor_ids = list(
+            Schedule.objects.order_by('executor_id').values_list('executor_id', flat=True).distinct()[:3]
+        )
+
+    def test_plans(self):
+        executors = ','.join(map(str, self.executor_ids))
+        date_from = date.today() + timedelta(days=1)
+        self.assert_plans('schedule_list', '/api/schedule/', self.user)
+        self.assert_plans('schedule_availability', f'/api/schedule/availability/?executors={executors}', self.user)
+        # страница поиска - до 50 исполнителей, для каждого читаются слоты за все дни периода
+        self.assert_plans(
+            'schedule_search',
+            f'/api/schedule/search/?from={date_from}&to={date_from + timedelta(days=6)}&start=10:00&end=14:00',
+            self.user,
+            max_rows=5000,
+        )
+        self.assert_plans(
+            'schedule_search_studio_city',
+            f'/api/schedule/search/?date={date_from}&start=10:00&end=14:00&type=studio&city=Minsk',
+            self.user,
+        )
+
+
+class ScheduleFeedPlanTests(QueryPlanTestCase):
+    # seed_scale выдаёт токен ленты каждому исполнителю; при 100 токенах таблица
+    # в пару страниц и Seq Scan честно дешевле, нужен объём ближе к рабочей базе
+    seed_options = {'executors': 500, 'orders_per_executor': 5, 'photos_per_portfolio': 1, 'slots_per_day': 2}
+    large_models = (Schedule, Order, CalendarFeedToken)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    def test_feed_plans(self):
+        executor_id = Schedule.objects.order_by('executor_id').values_list('executor_id', flat=True).first()
+        token = CalendarFeedToken.objects.get(executor_id=executor_id).token
+        self.assert_plans('schedule_feed', reverse('api:schedule:schedule-feed', kwargs={'token': token}))
+
+
+class OrderCalendarSyncTests(TestCase):
+    def setUp(self):
+        self.executor = get_user_model().objects.create_user(
+            email='executor@example.com', password='password', phone_number='+375290000001',
+        )
+        self.date = timezone.localdate() + timedelta(days=7)
+        self.schedule = Schedule.objects.create(
+            executor=self.executor, weekday=self.date.weekday() + 1, start_time=time(10), end_time=time(12),
+        )
+        self.slot = CalendarSlot.objects.get(schedule=self.schedule, date=self.date)
+
+    def create_order(self):
+        return Order.objects.create(executor=self.executor, schedule=self.schedule, date=self.date)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_calendar_is_synced_after_commit(self):
+        self.assertTrue(AvailabilityBitmap.objects.filter(executor=self.executor, date=self.date).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.create_order()
+            # до коммита сохранение заказа календарь не трогает
+            self.slot.refresh_from_db()
+            self.assertEqual(self.slot.status, CalendarSlot.STATUS_FREE)
+
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, CalendarSlot.STATUS_BOOKED)
+        self.assertFalse(AvailabilityBitmap.objects.filter(executor=self.executor, date=self.date).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, CalendarSlot.STATUS_FREE)
+        self.assertTrue(AvailabilityBitmap.objects.filter(executor=self.executor, date=self.date).exists())
+
+    @override_settings(JOBS_RUN_INLINE=False)
+    def test_order_save_enqueues_sync_job(self):
+        self.create_order()
+
+        job = Job.objects.get(task='schedule.sync_orders')
+        self.assertEqual(job.payload, {
+            'executor_id': self.executor.pk,
+            'date_from': self.date.isoformat(),
+            'date_to': self.date.isoformat(),
+            'weekdays': [self.date.weekday() + 1],
+        })
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, CalendarSlot.STATUS_FREE)
+
+
+class CalendarCoverageTests(TestCase):
+    def setUp(self):
+        self.executor = get_user_model().objects.create_user(
+            email='executor@example.com', password='password', phone_number='+375290000001',
+        )
+        self.today = timezone.localdate()
+        self.horizon_to = self.today + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS)
+        self.date = self.today + timedelta(days=7)
+        self.schedule = Schedule.objects.create(
+            executor=self.executor, weekday=self.date.weekday() + 1, start_time=time(10), end_time=time(12),
+        )
+
+    def get_slots(self, day):
+        return AvailabilityService.get_available_slots([self.executor.pk], day, day)[self.executor.pk]
+
+    def search(self, day):
+        client = APIClient()
+        client.force_authenticate(self.executor)
+        return client.get('/api/schedule/search/', {'date': day.isoformat(), 'start': '09:00', 'end': '13:00'})
+
+    def test_not_built_calendar_is_not_trusted(self):
+        # строк календаря нет, как после деплоя без rebuild_calendar
+        CalendarSlot.objects.all().delete()
+
+        self.assertFalse(CalendarService.covers(self.date, self.date))
+        self.assertEqual(self.get_slots(self.date), {self.date.isoformat(): [self.schedule.pk]})
+        self.assertEqual(self.search(self.date).status_code, 503)
+
+    def test_rebuild_records_built_window(self):
+        CalendarService.rebuild()
+
+        self.assertEqual(CalendarService.get_built_window(), (self.today, self.horizon_to))
+        self.assertTrue(CalendarService.covers(self.today, self.horizon_to))
+        self.assertFalse(CalendarService.covers(self.today, self.horizon_to + timedelta(days=1)))
+        self.assertFalse(CalendarService.covers(self.today - timedelta(days=1), self.today))
+        self.assertEqual(self.get_slots(self.date), {self.date.isoformat(): [self.schedule.pk]})
+        self.assertEqual(self.search(self.date).data['results'][0]['executor'], self.executor.pk)
+
+    def test_missed_extend(self):
+        CalendarService.rebuild()
+        # extend_calendar не запускался два дня: последние дни горизонта не построены
+        CalendarState.objects.update(built_to=self.horizon_to - timedelta(days=2))
+        last_day = self.horizon_to
+        schedule = Schedule.objects.create(
+            executor=self.executor, weekday=last_day.weekday() + 1, start_time=time(14), end_time=time(16),
+        )
+        CalendarSlot.objects.filter(date__gt=self.horizon_to - timedelta(days=2)).delete()
+
+        self.assertFalse(CalendarService.covers(self.today, self.horizon_to))
+        self.assertEqual(self.get_slots(last_day), {last_day.isoformat(): [schedule.pk]})
+
+        CalendarService.extend()
+        self.assertEqual(CalendarService.get_built_window(), (self.today, self.horizon_to))
+        self.assertTrue(CalendarSlot.objects.filter(schedule=schedule, date=last_day).exists())
+        self.assertTrue(CalendarService.covers(self.today, self.horizon_to))
+
+    def test_extend_builds_missing_calendar(self):
+        CalendarSlot.objects.all().delete()
+
+        CalendarService.extend()
+
+        self.assertEqual(CalendarService.get_built_window(), (self.today, self.horizon_to))
+        self.assertTrue(CalendarSlot.objects.filter(schedule=self.schedule, date=self.date).exists())
+
+
+class AvailabilitySearchTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.first_date = self.today + timedelta(days=7)
+        self.second_date = self.today + timedelta(days=8)
+        self.photographer = self.create_user(1)
+        Photographer.objects.create(base_user=self.photographer)
+        self.minsk_studio = self.create_studio(2, 'Minsk')
+        self.brest_studio = self.create_studio(3, 'Brest')
+
+        booked = self.create_schedule(self.photographer, self.first_date, 10)
+        self.create_schedule(self.minsk_studio, self.first_date, 10)
+        self.create_schedule(self.minsk_studio, self.second_date, 14)
+        self.create_schedule(self.brest_studio, self.second_date, 10)
+        Order.objects.create(
+            executor=self.photographer, client=self.create_user(4), schedule=booked, date=self.first_date,
+        )
+        CalendarService.rebuild()
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.photographer)
+
+    @staticmethod
+    def create_user(index):
+        return get_user_model().objects.create_user(
+            email=f'search{index}@example.com', password='password', phone_number=f'+37529100000{index}',
+        )
+
+    def create_studio(self, index, city):
+        user = self.create_user(index)
+        address = Address.objects.create(city=city, street='Street', building='1', office='1')
+        Studio.objects.create(name=city, address=address, base_user=user)
+        return user
+
+    @staticmethod
+    def create_schedule(executor, day, hour):
+        return Schedule.objects.create(
+            executor=executor, weekday=day.weekday() + 1, start_time=time(hour), end_time=time(hour + 2),
+        )
+
+    def search(self, **params):
+        return self.client.get('/api/schedule/search/', {'start': '09:00', 'end': '17:00', **params})
+
+    def get_executors(self, **params):
+        response = self.search(**params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [result['executor'] for result in response.data['results']]
+
+    def test_search_by_date_skips_booked_slots(self):
+        response = self.search(date=self.first_date.isoformat())
+
+        # слот фотографа на эту дату занят
+        self.assertEqual(response.data['results'], [{
+            'executor': self.minsk_studio.pk,
+            'slots': [{
+                'date': self.first_date.isoformat(),
+                'schedule': Schedule.objects.get(executor=self.minsk_studio, start_time=time(10)).pk,
+                'start_time': '10:00:00',
+                'end_time': '12:00:00',
+            }],
+        }])
+
+    def test_search_by_period(self):
+        self.assertEqual(
+            self.get_executors(**{'from': self.first_date.isoformat(), 'to': self.second_date.isoformat()}),
+            [self.minsk_studio.pk, self.brest_studio.pk],
+        )
+        # слот должен целиком лежать в окне времени
+        self.assertEqual(
+            self.get_executors(date=self.second_date.isoformat(), start='09:00', end='13:00'),
+            [self.brest_studio.pk],
+        )
+
+    def test_search_filters(self):
+        period = {'from': self.first_date.isoformat(), 'to': self.second_date.isoformat()}
+
+        self.assertEqual(self.get_executors(city='brest', **period), [self.brest_studio.pk])
+        self.assertEqual(self.get_executors(type='studio', **period), [self.minsk_studio.pk, self.brest_studio.pk])
+        self.assertEqual(self.get_executors(type='photographer', **period), [])
+
+        Order.objects.all().delete()
+        CalendarService.rebuild()
+        self.assertEqual(self.get_executors(type='photographer', **period), [self.photographer.pk])
+
+    def test_dates_outside_horizon_are_rejected(self):
+        horizon_to = self.today + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS)
+
+        response = self.search(date=(self.today - timedelta(days=1)).isoformat())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.data)
+
+        response = self.search(**{'from': (horizon_to - timedelta(days=2)).isoformat(), 'to': horizon_to.isoformat()})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('to', response.data)
+
+        self.assertEqual(self.search(date=(horizon_to - timedelta(days=1)).isoformat()).status_code, 200)
+        self.assertEqual(self.search(date=self.today.isoformat()).status_code, 200)
+
+
+class ScheduleOverlapTests(TestCase):
+    def setUp(self):
+        self.executor = self.create_user(1)
+        self.schedule = self.create_schedule(self.executor, 1, 10, 12)
+
+    @staticmethod
+    def create_user(index):
+        return get_user_model().objects.create_user(
+            email=f'user{index}@example.com', password='password', phone_number=f'+37529{index:07d}',
+        )
+
+    @staticmethod
+    def create_schedule(executor, weekday, start_hour, end_hour):
+        return Schedule.objects.create(
+            executor=executor, weekday=weekday, start_time=time(start_hour), end_time=time(end_hour),
+        )
+
+    def assertOverlapRejected(self, executor, weekday, start_hour, end_hour):
+        with self.assertRaises(IntegrityError) as context, transaction.atomic():
+            self.create_schedule(executor, weekday, start_hour, end_hour)
+        self.assertTrue(OverlapService.is_overlap_conflict(context.exception))
+
+    def test_constraint_rejects_overlapping_slots(self):
+        self.assertOverlapRejected(self.executor, 1, 11, 13)
+        self.assertOverlapRejected(self.executor, 1, 9, 11)
+        self.assertOverlapRejected(self.executor, 1, 10, 11)
+        self.assertOverlapRejected(self.executor, 1, 8, 14)
+
+    def test_constraint_allows_adjacent_and_unrelated_slots(self):
+        self.create_schedule(self.executor, 1, 12, 14)
+        self.create_schedule(self.executor, 1, 8, 10)
+        self.create_schedule(self.executor, 2, 10, 12)
+        self.create_schedule(self.create_user(2), 1, 10, 12)
+        self.assertEqual(Schedule.objects.count(), 5)
+
+    def test_schedules_without_executor_are_not_checked(self):
+        # границы NULL дали бы неограниченный диапазон, пересекающийся со всеми
+        self.create_schedule(None, 1, 10, 12)
+        self.create_schedule(None, 1, 11, 13)
+        self.create_schedule(self.executor, 1, 12, 14)
+
+        self.assertFalse(OverlapService.get_overlapping_schedules(None, 1, time(10), time(12)).exists())
+        self.assertEqual(
+            list(OverlapService.get_overlapping_schedules(self.executor, 1, time(11), time(13))),
+            list(Schedule.objects.filter(executor=self.executor).order_by('weekday', 'start_time')),
+        )
+
+    def test_overlap_service_matches_constraint(self):
+        def overlapping(weekday, start_hour, end_hour, **kwargs):
+            return list(OverlapService.get_overlapping_schedules(
+                self.executor, weekday, time(start_hour), time(end_hour), **kwargs
+            ))
+
+        self.assertEqual(overlapping(1, 11, 13), [self.schedule])
+        self.assertEqual(overlapping(1, 10, 12), [self.schedule])
+        self.assertEqual(overlapping(1, 12, 14), [])
+        self.assertEqual(overlapping(1, 8, 10), [])
+        self.assertEqual(overlapping(2, 10, 12), [])
+        self.assertEqual(overlapping(1, 10, 12, exclude_pk=self.schedule.pk), [])
+        self.assertFalse(OverlapService.get_overlapping_schedules(
+            self.create_user(2), 1, time(10), time(12)
+        ).exists())
+
+    def test_template_overlaps(self):
+        slots = [
+            (1, time(10), time(12)),
+            (1, time(12), time(14)),
+            (1, time(13), time(15)),
+            (2, time(13), time(15)),
+        ]
+        self.assertEqual(OverlapService.find_template_overlaps(slots), [(1, time(13), time(15))])
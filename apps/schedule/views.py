@@ -1,24 +1,42 @@
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from apps.schedule.models import Schedule
+from apps.schedule.pagination.pagination import SchedulePagination
 from apps.schedule.serializers.serializers import (
     ScheduleSerializer, CreateScheduleSerializer,
+    AvailabilityQuerySerializer, ScheduleTemplateSerializer, AvailabilitySearchQuerySerializer,
 )
+from apps.schedule.services.calendar import CalendarNotBuilt, CalendarService
+from apps.schedule.services.feed import CalendarFeedService
+from apps.schedule.services.search import AvailabilitySearchService
+from apps.schedule.services.services import AvailabilityService, ScheduleTemplateService
 from rest_framework.response import Response
 from apps.users.permissions.permissions import IsExecutor
 
 
 class ScheduleViewSet(viewsets.ModelViewSet):
     queryset = Schedule.objects.all()
+    pagination_class = SchedulePagination
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return CreateScheduleSerializer
+        if self.action == 'template':
+            return ScheduleTemplateSerializer
         return ScheduleSerializer
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'template', 'feed_token']:
             permission_classes = [IsExecutor]
+        elif self.action == 'feed':
+            # доступ к ленте даёт токен в адресе
+            permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
@@ -54,10 +72,10 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         return self.update(request, *args, **kwargs)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -65,3 +83,86 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         data = serializer.data
 
         return Response(data, status=status.HTTP_200_OK)
+
+    @extend_schema(parameters=[AvailabilityQuerySerializer], responses={200: None})
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        query = AvailabilityQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        available_slots = AvailabilityService.get_available_slots(**query.validated_data)
+
+        return Response(available_slots, status=status.HTTP_200_OK)
+
+    @extend_schema(parameters=[AvailabilitySearchQuerySerializer], responses={200: None})
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Исполнители со свободным слотом в окне времени start-end на date (или в период from-to).
+        Страницы идут по возрастанию ID исполнителя: next_after передаётся в after.
+        """
+        query = AvailabilitySearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        # поиск идёт только по маскам календаря: без построенного календаря пустой ответ был бы ложным
+        if not CalendarService.covers(query.validated_data['date_from'], query.validated_data['date_to']):
+            raise CalendarNotBuilt()
+        results, next_after = AvailabilitySearchService.search(**query.validated_data)
+
+        return Response({'results': results, 'next_after': next_after}, status=status.HTTP_200_OK)
+
+    @extend_schema(request=ScheduleTemplateSerializer, responses={200: None})
+    @action(detail=False, methods=['put'])
+    def template(self, request):
+        """
+        Заменяет всё недельное расписание исполнителя списком slots [{weekday, start_time, end_time}].
+        """
+        serializer = self.get_serializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        schedules, created, deleted = ScheduleTemplateService.apply(
+            serializer.validated_data['executor'],
+            serializer.validated_data['slots'],
+        )
+        response_data = {
+            'created': created,
+            'deleted': deleted,
+            'schedules': ScheduleSerializer(schedules, many=True, context={'request': request}).data,
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=None, responses={200: None})
+    @action(detail=False, methods=['post'], url_path='feed-token')
+    def feed_token(self, request):
+        """
+        Адрес iCalendar-ленты текущего исполнителя. ?rotate=1 выпускает новый токен,
+        старый адрес перестаёт работать.
+        """
+        rotate = request.query_params.get('rotate') in ('1', 'true')
+        feed_token = CalendarFeedService.get_or_create_token(request.user, rotate=rotate)
+        url = request.build_absolute_uri(reverse('api:schedule:schedule-feed', kwargs={'token': feed_token.token}))
+        return Response({'token': feed_token.token, 'url': url}, status=status.HTTP_200_OK)
+
+    @extend_schema(responses={(200, 'text/calendar'): str})
+    @action(detail=False, methods=['get'], url_path=r'feed/(?P<token>[\w-]+)\.ics', authentication_classes=[])
+    def feed(self, request, token):
+        """
+        iCalendar-лента исполнителя: будущие заказы и еженедельные слоты.
+        Отвечает 304, если лента не менялась с прошлого опроса.
+        """
+        executor_id = CalendarFeedService.get_executor_id(token)
+        if executor_id is None:
+            raise Http404
+
+        etag, last_modified = CalendarFeedService.get_version(executor_id)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = StreamingHttpResponse(
+            CalendarFeedService.iter_feed(executor_id, request.get_host().split(':')[0]),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -4,6 +4,7 @@ from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
 
 from .models import User, Studio, Photographer
+from ..photo.services.services import get_photo_url
 from ..order.models import Order
 from ..schedule.models import Schedule
 
@@ -17,7 +18,7 @@ class CustomUserAdmin(UserAdmin):
     @admin.display(description="Photo")
     def user_photo(self, user: User):
         if user.photo:
-            return mark_safe(f"<img src='{user.photo.image.url}' width=50 />")
+            return mark_safe(f"<img src='{get_photo_url(user.photo.image)}' width=50 />")
         return "Without photo"
 
     fieldsets = (
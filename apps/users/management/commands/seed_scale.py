@@ -0,0 +1,276 @@
+import random
+import secrets
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.address.models import Address
+from apps.comments.models import Comment
+from apps.comments.services.services import RatingService
+from apps.news.models import New
+from apps.order.models import Order
+from apps.photo.models import Photo, PhotoDerivative
+from apps.portfolio.models import Portfolio, PortfolioPhotos
+from apps.schedule.models import CalendarFeedToken, Schedule
+from apps.schedule.services.calendar import CalendarService
+from apps.users.models import UserType, Studio, Photographer
+
+SEEDED_MODELS = (
+    Address, Photo, PhotoDerivative, Studio, Photographer, Schedule, Portfolio, PortfolioPhotos, Order, Comment,
+    New, CalendarFeedToken,
+)
+
+CITIES = ('Minsk', 'Brest', 'Grodno', 'Gomel', 'Mogilev', 'Vitebsk')
+WORKING_WEEKDAYS = (1, 2, 3, 4, 5, 6)
+FIRST_SLOT_HOUR = 9
+PHONE_KIND_CODES = {'client': 1, 'studio': 2, 'photographer': 3}
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset for load and benchmark work (no image bytes are uploaded)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--executors', type=int, default=100, help='Number of studios and photographers')
+        parser.add_argument('--clients', type=int, default=100, help='Number of regular users')
+        parser.add_argument('--orders-per-executor', type=int, default=50)
+        parser.add_argument('--comments-per-executor', type=int, default=10)
+        parser.add_argument('--photos-per-portfolio', type=int, default=5)
+        parser.add_argument('--slots-per-day', type=int, default=8, help='Hourly schedule slots per working day')
+        parser.add_argument('--news', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['executors'] < 1 or options['clients'] < 1:
+            raise CommandError('At least one executor and one client are required')
+        if not 1 <= options['slots_per_day'] <= 24 - FIRST_SLOT_HOUR:
+            raise CommandError(f'--slots-per-day must be between 1 and {24 - FIRST_SLOT_HOUR}')
+
+        self.random = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.email_prefix = f'seed{self.seed}-'
+        self.photos = []
+
+        if get_user_model().objects.filter(email__startswith=self.email_prefix).exists():
+            raise CommandError(f'Dataset for seed {self.seed} already exists, use another --seed')
+
+        started = time.monotonic()
+        clients = self.step('clients', self.create_clients, options['clients'])
+        executors = self.step('executors', self.create_executors, options['executors'])
+        schedules = self.step('schedules', self.create_schedules, executors, options['slots_per_day'])
+        self.step('portfolios', self.create_portfolios, executors, options['photos_per_portfolio'])
+        self.step('orders', self.create_orders, schedules, clients, options['orders_per_executor'])
+        self.step('comments', self.create_comments, executors, clients, options['comments_per_executor'])
+        self.step('news', self.create_news, clients, options['news'])
+        self.step('photo derivatives', self.create_derivatives)
+        self.step('feed tokens', self.create_feed_tokens, executors)
+        self.step('analyze', self.analyze, (get_user_model(), *SEEDED_MODELS))
+        self.step('rating summaries', RatingService.rebuild)
+        self.step('availability calendar', CalendarService.rebuild)
+
+        self.stdout.write(self.style.SUCCESS(f'Dataset for seed {self.seed} created in {time.monotonic() - started:.1f}s'))
+
+    def step(self, name, func, *args):
+        started = time.monotonic()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f'{name}: {count} in {time.monotonic() - started:.1f}s')
+        return result
+
+    def bulk_create(self, model, objects):
+        """
+        Пишет объекты пачками по batch_size, не держа весь генератор в памяти.
+        """
+        objects = iter(objects)
+        created = 0
+        while batch := list(islice(objects, self.batch_size)):
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+        return created
+
+    def create_photos(self, folder, count):
+        photos = [
+            Photo(image=f'photos/seed/{self.seed}/{folder}/{index}.jpg')
+            for index in range(count)
+        ]
+        photos = Photo.objects.bulk_create(photos, batch_size=self.batch_size)
+        self.photos.extend(photos)
+        return photos
+
+    def create_derivatives(self):
+        # превью есть у каждой обработанной фотографии, файлов за ними нет, как и у оригиналов
+        return self.bulk_create(PhotoDerivative, (
+            PhotoDerivative(
+                photo=photo,
+                size=size,
+                image=f'photos/seed/{self.seed}/derivatives/{size}/{photo.pk}.jpg',
+                width=max_side,
+                height=max_side * 2 // 3,
+            )
+            for photo in self.photos
+            for size, max_side in PhotoDerivative.SIZES.items()
+        ))
+
+    def create_users(self, kind, count, user_type=None, photos=None):
+        password = make_password(None)
+        users = [
+            get_user_model()(
+                email=f'{self.email_prefix}{kind}-{index}@example.com',
+                username=f'{kind}-{index}',
+                first_name=kind.capitalize(),
+                last_name=str(index),
+                phone_number=f'+375{self.seed % 100:02d}{PHONE_KIND_CODES[kind]}{index:06d}',
+                password=password,
+                user_type=user_type,
+                photo=photos[index] if photos else None,
+            )
+            for index in range(count)
+        ]
+        return get_user_model().objects.bulk_create(users, batch_size=self.batch_size)
+
+    def create_clients(self, count):
+        return self.create_users('client', count)
+
+    def create_executors(self, count):
+        studios_count = count // 2
+        photographers_count = count - studios_count
+        studio_type = UserType.objects.get_or_create(name='studio')[0]
+        photographer_type = UserType.objects.get_or_create(name='photographer')[0]
+
+        studio_users = self.create_users(
+            'studio', studios_count, studio_type, self.create_photos('studio_avatars', studios_count)
+        )
+        addresses = Address.objects.bulk_create([
+            Address(
+                city=self.random.choice(CITIES),
+                street=f'Street {self.random.randint(1, 200)}',
+                building=str(self.random.randint(1, 100)),
+                office=str(self.random.randint(1, 500)),
+            )
+            for _ in studio_users
+        ], batch_size=self.batch_size)
+        studios = Studio.objects.bulk_create([
+            Studio(name=f'Studio {index}', description=f'Seed studio {index}', address=address, base_user=user)
+            for index, (user, address) in enumerate(zip(studio_users, addresses))
+        ], batch_size=self.batch_size)
+
+        photographer_users = self.create_users(
+            'photographer', photographers_count, photographer_type,
+            self.create_photos('photographer_avatars', photographers_count)
+        )
+        photographers = Photographer.objects.bulk_create([
+            Photographer(description=f'Seed photographer {index}', base_user=user)
+            for index, user in enumerate(photographer_users)
+        ], batch_size=self.batch_size)
+
+        return studios + photographers
+
+    def create_schedules(self, executors, slots_per_day):
+        schedules = Schedule.objects.bulk_create([
+            Schedule(
+                executor_id=executor.base_user_id,
+                weekday=weekday,
+                start_time=f'{FIRST_SLOT_HOUR + slot:02d}:00',
+                end_time=f'{FIRST_SLOT_HOUR + slot + 1:02d}:00',
+            )
+            for executor in executors
+            for weekday in WORKING_WEEKDAYS
+            for slot in range(slots_per_day)
+        ], batch_size=self.batch_size)
+
+        executor_schedules = {}
+        for schedule in schedules:
+            executor_schedules.setdefault(schedule.executor_id, []).append(schedule)
+        return executor_schedules
+
+    def create_portfolios(self, executors, photos_per_portfolio):
+        portfolios = Portfolio.objects.bulk_create([
+            Portfolio(
+                studio=executor if isinstance(executor, Studio) else None,
+                photographer=executor if isinstance(executor, Photographer) else None,
+                description=f'Seed portfolio of {executor.base_user_id}',
+            )
+            for executor in executors
+        ], batch_size=self.batch_size)
+        photos = iter(self.create_photos('portfolios', len(portfolios) * photos_per_portfolio))
+
+        return self.bulk_create(PortfolioPhotos, (
+            PortfolioPhotos(portfolio=portfolio, photo=next(photos))
+            for portfolio in portfolios
+            for _ in range(photos_per_portfolio)
+        ))
+
+    def create_orders(self, executor_schedules, clients, orders_per_executor):
+        """
+        Заказы равномерно распределены по прошлым и будущим неделям,
+        пара (schedule, date) никогда не повторяется.
+        """
+        today = timezone.localdate()
+        client_ids = [client.pk for client in clients]
+
+        def orders():
+            for executor_id, schedules in executor_schedules.items():
+                weeks = -(-orders_per_executor // len(schedules))
+                first_monday = today - timedelta(days=today.weekday(), weeks=weeks // 2)
+                slots = self.random.sample(range(weeks * len(schedules)), min(orders_per_executor, weeks * len(schedules)))
+                for slot in slots:
+                    week, schedule = divmod(slot, len(schedules))
+                    schedule = schedules[schedule]
+                    yield Order(
+                        executor_id=executor_id,
+                        client_id=self.random.choice(client_ids),
+                        schedule_id=schedule.pk,
+                        date=first_monday + timedelta(weeks=week, days=schedule.weekday - 1),
+                    )
+
+        return self.bulk_create(Order, orders())
+
+    def create_comments(self, executors, clients, comments_per_executor):
+        client_ids = [client.pk for client in clients]
+        return self.bulk_create(Comment, (
+            Comment(
+                author_id=self.random.choice(client_ids),
+                destination_id=executor.base_user_id,
+                rate=self.random.choice(Comment.Rate.values),
+                title=f'Seed comment {index}',
+                body='Generated by seed_scale',
+            )
+            for executor in executors
+            for index in range(comments_per_executor)
+        ))
+
+    def create_feed_tokens(self, executors):
+        # токен - секрет доступа к ленте, поэтому не из детерминированного self.random
+        return self.bulk_create(CalendarFeedToken, (
+            CalendarFeedToken(executor_id=executor.base_user_id, token=secrets.token_urlsafe(32))
+            for executor in executors
+        ))
+
+    def analyze(self, models):
+        """
+        Статистика по только что залитым таблицам: без неё запросы следующих шагов
+        планируются по устаревшим оценкам, а в транзакции теста autovacuum их не обновит.
+        """
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        return len(models)
+
+    def create_news(self, clients, count):
+        photos = self.create_photos('news', count)
+        return self.bulk_create(New, (
+            New(
+                title=f'Seed news {index}',
+                text='Generated by seed_scale',
+                author_id=self.random.choice(clients).pk,
+                photo=photo,
+            )
+            for index, photo in enumerate(photos)
+        ))
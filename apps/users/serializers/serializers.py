@@ -1,18 +1,14 @@
-from collections import defaultdict
-
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from django.db.models import Avg
-from datetime import datetime, timedelta
 
 from apps.address.models import Address
 from apps.address.serializers import AddressSerializer
-from apps.order.models import Order
 from apps.photo.models import Photo
-from apps.schedule.models import Schedule
+from apps.photo.services.services import PhotoService
+from apps.schedule.services.services import AvailabilityService
 from apps.users.models import UserType, Studio, Photographer
 from apps.users.services.services import AuthService
 
@@ -185,11 +181,9 @@ class StudioRegisterSerializer(BaseRegisterSerializer):
         )
 
         if photo_upload:
-            photo = Photo(image=photo_upload)
-            photo.user_info = {'username': user.email}
-            photo.save()
-            user.photo = photo
-            user.photo = photo
+            user.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=user, user_info={'username': user.email}
+            )
         elif existing_photo:
             user.photo = existing_photo
 
@@ -220,16 +214,17 @@ class StudioRegisterSerializer(BaseRegisterSerializer):
         studio.save()
 
         bu_instance = instance.base_user
+        old_photo = bu_instance.photo
         if photo_upload:
-            if bu_instance.photo:
-                bu_instance.photo.delete()
-            photo = Photo(image=photo_upload)
-            photo.user_info = {'username': bu_instance.email}
-            photo.save()
-            bu_instance.photo = photo
+            bu_instance.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=bu_instance, user_info={'username': bu_instance.email}
+            )
         elif existing_photo:
             bu_instance.photo = existing_photo
         bu_instance.save()
+        if photo_upload and old_photo != bu_instance.photo:
+            # фотография может быть общей с новостью или портфолио
+            PhotoService.release(old_photo)
         instance.save()
         return instance
 
@@ -290,10 +285,9 @@ class PhotographerRegisterSerializer(BaseRegisterSerializer):
         )
 
         if photo_upload:
-            photo = Photo(image=photo_upload)
-            photo.user_info = {'username': user.email}
-            photo.save()
-            user.photo = photo
+            user.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=user, user_info={'username': user.email}
+            )
         elif existing_photo:
             user.photo = existing_photo
 
@@ -314,16 +308,17 @@ class PhotographerRegisterSerializer(BaseRegisterSerializer):
         photographer.save()
 
         bu_instance = instance.base_user
+        old_photo = bu_instance.photo
         if photo_upload:
-            if bu_instance.photo:
-                bu_instance.photo.delete()
-            photo = Photo(image=photo_upload)
-            photo.user_info = {'username': bu_instance.email}
-            photo.save()
-            bu_instance.photo = photo
+            bu_instance.photo, _ = PhotoService.get_or_create(
+                photo_upload, owner=bu_instance, user_info={'username': bu_instance.email}
+            )
         elif existing_photo:
             bu_instance.photo = existing_photo
         bu_instance.save()
+        if photo_upload and old_photo != bu_instance.photo:
+            # фотография может быть общей с новостью или портфолио
+            PhotoService.release(old_photo)
 
         instance.save()
         return instance
@@ -337,6 +332,19 @@ class RegularUserRegisterSerializer(BaseRegisterSerializer):
         return self.create_user(validated_data)
 
 
+class ExecutorListSerializer(serializers.ListSerializer):
+    """
+    Считает свободные слоты сразу для всех исполнителей списка.
+    """
+
+    def to_representation(self, data):
+        executors = list(data.all() if hasattr(data, 'all') else data)
+        self.context['available_slots'] = AvailabilityService.get_available_slots(
+            [executor.base_user_id for executor in executors]
+        )
+        return super().to_representation(executors)
+
+
 class StudioSerializer(serializers.ModelSerializer):
     rate = serializers.SerializerMethodField()
     portfolios = serializers.SerializerMethodField()
@@ -349,28 +357,19 @@ class StudioSerializer(serializers.ModelSerializer):
     user_type = serializers.SerializerMethodField()
 
     def get_rate(self, obj):
-        comments = obj.base_user.comments.all()
-        if comments.exists():
-            avg_rate = comments.aggregate(Avg('rate'))['rate__avg']
-            return round(avg_rate, 2)
+        rating_summary = getattr(obj.base_user, 'rating_summary', None)
+        if rating_summary:
+            return rating_summary.average
         return None
 
     def get_portfolios(self, obj):
-        portfolios = obj.portfolios.all()
-        if portfolios.exists():
-            id_list = [portfolio.pk for portfolio in portfolios]
-            return id_list
-        return []
+        return [portfolio.pk for portfolio in obj.portfolios.all()]
 
     def get_comments(self, obj):
-        comments = obj.base_user.comments.all()
-        if comments.exists():
-            id_list = [comment.pk for comment in comments]
-            return id_list
-        return []
+        return [comment.pk for comment in obj.base_user.comments.all()]
 
     def get_base_user_id(self, obj):
-        return obj.base_user.id
+        return obj.base_user_id
 
     def address(self, obj):
         addresses = obj.base_user.address.all()
@@ -380,41 +379,13 @@ class StudioSerializer(serializers.ModelSerializer):
         return []
 
     def get_schedules(self, obj):
-        schedules = Schedule.objects.filter(executor=obj.base_user)
-        if schedules.exists():
-            id_list = [schedule.pk for schedule in schedules]
-            return id_list
-        return []
+        return [schedule.pk for schedule in obj.base_user.schedule_set.all()]
 
     def get_available_slots(self, obj):
-        today = datetime.now().date()
-        two_weeks_later = today + timedelta(weeks=2)
-
-        schedules = Schedule.objects.filter(executor=obj.base_user)
-
-        orders = Order.objects.filter(
-            executor=obj.base_user,
-            date__gte=today,
-            date__lte=two_weeks_later
-        ).values('date', 'schedule_id')
-
-        occupied_slots = defaultdict(list)
-        for order in orders:
-            occupied_slots[order['date']].append(order['schedule_id'])
-
-        available_slots = defaultdict(list)
-
-        for day_offset in range(15):
-            current_date = today + timedelta(days=day_offset)
-            weekday = (current_date.weekday() + 1) % 7 or 7
-
-            day_schedules = schedules.filter(weekday=weekday)
-            for schedule in day_schedules:
-
-                if schedule.id not in occupied_slots.get(current_date, []):
-                    available_slots[current_date.isoformat()].append(schedule.id)
-
-        return dict(available_slots)
+        available_slots = self.context.get('available_slots')
+        if available_slots is None:
+            available_slots = AvailabilityService.get_available_slots([obj.base_user_id])
+        return available_slots.get(obj.base_user_id, {})
 
     def get_photo(self, obj):
         if obj.base_user.photo and obj.base_user.photo.image:
@@ -427,6 +398,7 @@ class StudioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Studio
         fields = '__all__'
+        list_serializer_class = ExecutorListSerializer
 
 
 class PhotographerSerializer(serializers.ModelSerializer):
@@ -440,65 +412,28 @@ class PhotographerSerializer(serializers.ModelSerializer):
     user_type = serializers.SerializerMethodField()
 
     def get_rate(self, obj):
-        comments = obj.base_user.comments.all()
-        if comments.exists():
-            avg_rate = comments.aggregate(Avg('rate'))['rate__avg']
-            return round(avg_rate, 2)
+        rating_summary = getattr(obj.base_user, 'rating_summary', None)
+        if rating_summary:
+            return rating_summary.average
         return None
 
     def get_portfolios(self, obj):
-        portfolios = obj.portfolios.all()
-        if portfolios.exists():
-            id_list = [portfolio.pk for portfolio in portfolios]
-            return id_list
-        return []
+        return [portfolio.pk for portfolio in obj.portfolios.all()]
 
     def get_comments(self, obj):
-        comments = obj.base_user.comments.all()
-        if comments.exists():
-            id_list = [comment.pk for comment in comments]
-            return id_list
-        return []
+        return [comment.pk for comment in obj.base_user.comments.all()]
 
     def get_base_user_id(self, obj):
-        return obj.base_user.id
+        return obj.base_user_id
 
     def get_schedules(self, obj):
-        schedules = Schedule.objects.filter(executor=obj.base_user)
-        if schedules.exists():
-            id_list = [schedule.pk for schedule in schedules]
-            return id_list
-        return []
+        return [schedule.pk for schedule in obj.base_user.schedule_set.all()]
 
     def get_available_slots(self, obj):
-        today = datetime.now().date()
-        two_weeks_later = today + timedelta(weeks=2)
-
-        schedules = Schedule.objects.filter(executor=obj.base_user)
-
-        orders = Order.objects.filter(
-            executor=obj.base_user,
-            date__gte=today,
-            date__lte=two_weeks_later
-        ).values('date', 'schedule_id')
-
-        occupied_slots = defaultdict(list)
-        for order in orders:
-            occupied_slots[order['date']].append(order['schedule_id'])
-
-        available_slots = defaultdict(list)
-
-        for day_offset in range(15):
-            current_date = today + timedelta(days=day_offset)
-            weekday = (current_date.weekday() + 1) % 7 or 7
-
-            day_schedules = schedules.filter(weekday=weekday)
-            for schedule in day_schedules:
-
-                if schedule.id not in occupied_slots.get(current_date, []):
-                    available_slots[current_date.isoformat()].append(schedule.id)
-
-        return dict(available_slots)
+        available_slots = self.context.get('available_slots')
+        if available_slots is None:
+            available_slots = AvailabilityService.get_available_slots([obj.base_user_id])
+        return available_slots.get(obj.base_user_id, {})
 
     def get_photo(self, obj):
         if obj.base_user.photo and obj.base_user.photo.image:
@@ -511,6 +446,7 @@ class PhotographerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Photographer
         fields = '__all__'
+        list_serializer_class = ExecutorListSerializer
 
 
 class RegularUserSerializer(serializers.ModelSerializer):
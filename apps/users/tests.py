@@ -1,3 +1,102 @@
-from django.test import TestCase
+from datetime import time
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from apps.address.models import Address
+from apps.comments.models import Comment
+from apps.portfolio.models import Portfolio
+from apps.schedule.models import Schedule
+from apps.users.models import UserType, Studio, Photographer
+from common.testing.plans import QueryPlanTestCase
+
+
+class ExecutorProfileQueryBudgetTests(APITestCase):
+    # profiles, portfolios, comments, schedules + availability (calendar state, schedules, orders)
+    LIST_QUERY_BUDGET = 7
+    RETRIEVE_QUERY_BUDGET = 7
+
+    def setUp(self):
+        self.users_count = 0
+        self.client_user = self.create_user()
+        self.client.force_authenticate(self.client_user)
+
+    def create_user(self, user_type_name=None):
+        self.users_count += 1
+        user_type = UserType.objects.get_or_create(name=user_type_name)[0] if user_type_name else None
+        return get_user_model().objects.create_user(
+            email=f'user{self.users_count}@example.com',
+            password='password',
+            phone_number=f'+37529{self.users_count:07d}',
+            user_type=user_type,
+        )
+
+    def fill_profile(self, user):
+        for weekday in (1, 3, 5):
+            Schedule.objects.create(executor=user, weekday=weekday, start_time=time(10), end_time=time(12))
+        Comment.objects.create(author=self.client_user, destination=user, rate=4)
+
+    def create_studios(self, count):
+        for _ in range(count):
+            user = self.create_user('studio')
+            address = Address.objects.create(city='Minsk', street='Lenina', building='1', office='1')
+            studio = Studio.objects.create(name=f'Studio {user.pk}', address=address, base_user=user)
+            Portfolio.objects.create(studio=studio, description='Portfolio')
+            self.fill_profile(user)
+        return studio
+
+    def create_photographers(self, count):
+        for _ in range(count):
+            user = self.create_user('photographer')
+            photographer = Photographer.objects.create(description='Photographer', base_user=user)
+            Portfolio.objects.create(photographer=photographer, description='Portfolio')
+            self.fill_profile(user)
+        return photographer
+
+    def assertMaxQueries(self, budget, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), budget)
+        return len(context.captured_queries)
+
+    def test_studio_list_query_count_does_not_depend_on_size(self):
+        self.create_studios(1)
+        small = self.assertMaxQueries(self.LIST_QUERY_BUDGET, '/api/users/studios/')
+        self.create_studios(10)
+        large = self.assertMaxQueries(self.LIST_QUERY_BUDGET, '/api/users/studios/')
+        self.assertEqual(small, large)
+
+    def test_photographer_list_query_count_does_not_depend_on_size(self):
+        self.create_photographers(1)
+        small = self.assertMaxQueries(self.LIST_QUERY_BUDGET, '/api/users/photographers/')
+        self.create_photographers(10)
+        large = self.assertMaxQueries(self.LIST_QUERY_BUDGET, '/api/users/photographers/')
+        self.assertEqual(small, large)
+
+    def test_studio_retrieve_query_budget(self):
+        studio = self.create_studios(1)
+        self.assertMaxQueries(self.RETRIEVE_QUERY_BUDGET, f'/api/users/studios/{studio.pk}/')
+
+    def test_photographer_retrieve_query_budget(self):
+        photographer = self.create_photographers(1)
+        self.assertMaxQueries(self.RETRIEVE_QUERY_BUDGET, f'/api/users/photographers/{photographer.pk}/')
+
+
+class ExecutorProfilePlanTests(QueryPlanTestCase):
+    # при 100 исполнителях один профиль - заметная доля комментариев,
+    # и Seq Scan по ним честно дешевле; нужна доля, как в рабочей базе
+    seed_options = {'executors': 500, 'orders_per_executor': 5, 'photos_per_portfolio': 1}
+    large_models = (Comment, Schedule)
+    snapshot_dir = Path(__file__).resolve().parent / 'plan_snapshots'
+
+    def test_plans(self):
+        user = get_user_model().objects.filter(studio_profile__isnull=True).order_by('id').first()
+        studio = Studio.objects.order_by('id').first()
+        photographer = Photographer.objects.order_by('id').first()
+        # списки профилей не пагинируются, их планы ограничены только размером таблиц
+        self.assert_plans('studio_retrieve', f'/api/users/studios/{studio.pk}/', user)
+        self.assert_plans('photographer_retrieve', f'/api/users/photographers/{photographer.pk}/', user)
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status, viewsets
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -9,6 +9,9 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.core.exceptions import ValidationError
 
+from apps.comments.models import Comment
+from apps.portfolio.models import Portfolio
+from apps.schedule.models import Schedule
 from apps.users.models import Studio, Photographer
 from apps.users.permissions.permissions import IsOwner
 from apps.users.serializers import (
@@ -82,7 +85,13 @@ class RegisterView(generics.CreateAPIView):
 
 
 class StudioViewSet(viewsets.ModelViewSet):
-    queryset = Studio.objects.all()
+    queryset = Studio.objects.select_related(
+        'address', 'base_user__photo', 'base_user__rating_summary',
+    ).prefetch_related(
+        Prefetch('portfolios', queryset=Portfolio.objects.only('id', 'studio_id')),
+        Prefetch('base_user__comments', queryset=Comment.objects.only('id', 'destination_id')),
+        Prefetch('base_user__schedule_set', queryset=Schedule.objects.only('id', 'executor_id')),
+    )
     permission_classes = (IsAuthenticated,)
 
     def get_serializer_class(self):
@@ -235,7 +244,13 @@ class StudioViewSet(viewsets.ModelViewSet):
 
 
 class PhotographerViewSet(viewsets.ModelViewSet):
-    queryset = Photographer.objects.all()
+    queryset = Photographer.objects.select_related(
+        'base_user__photo', 'base_user__rating_summary',
+    ).prefetch_related(
+        Prefetch('portfolios', queryset=Portfolio.objects.only('id', 'photographer_id')),
+        Prefetch('base_user__comments', queryset=Comment.objects.only('id', 'destination_id')),
+        Prefetch('base_user__schedule_set', queryset=Schedule.objects.only('id', 'executor_id')),
+    )
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -0,0 +1 @@
+from .pagination import *
@@ -0,0 +1,119 @@
+import json
+
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+
+__all__ = ['BasePagination']
+
+
+class BasePagination(pagination.CursorPagination):
+    """
+    Keyset-пагинация по составному ключу.
+
+    Позиция курсора хранит значения всех полей `ordering`, поэтому при
+    уникальном хвосте сортировки (id) страница всегда выбирается условием
+    по индексу, без OFFSET и без COUNT(*).
+    """
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (reverse, current_position) = (False, None)
+        else:
+            (_, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*pagination._reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(current_position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        # Позиции уникальны, поэтому смещение в курсоре никогда не нужно.
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        return cursor._replace(offset=0)
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        (a, b) > (x, y) раскрывается в a >= x AND (a > x OR (a = x AND b > y)),
+        чтобы ведущее условие шло в индекс.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        lookups = []
+        for order, value in zip(self.ordering, values):
+            descending = order.startswith('-') != reverse
+            lookups.append((order.lstrip('-'), 'lt' if descending else 'gt', value))
+
+        keyset = Q()
+        equal = Q()
+        for field, lookup, value in lookups:
+            keyset |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+
+        field, lookup, value = lookups[0]
+        return Q(**{f'{field}__{lookup}e': value}) & keyset
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            values.append(str(attr))
+        return json.dumps(values)
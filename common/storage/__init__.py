@@ -0,0 +1,2 @@
+from .storage import *
+from .instrumentation import *
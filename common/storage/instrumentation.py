@@ -0,0 +1,193 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+__all__ = [
+    'InstrumentedStorage', 'StorageStats', 'StorageTimingMiddleware',
+    'track_storage', 'get_endpoint_histograms',
+]
+
+_current_stats = contextvars.ContextVar('storage_stats', default=None)
+
+
+class StorageStats:
+    """
+    Количество и суммарное время операций со storage в рамках одного запроса.
+    Операции из пула потоков суммируются, поэтому время может быть больше
+    длительности запроса.
+    """
+
+    def __init__(self):
+        self.operations = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def add(self, operation, duration):
+        with self._lock:
+            stats = self.operations[operation]
+            stats[0] += 1
+            stats[1] += duration
+
+    @property
+    def count(self):
+        return sum(count for count, _ in self.operations.values())
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.operations.values())
+
+    def server_timing(self):
+        metrics = [f'storage;desc="{self.count} ops";dur={self.duration * 1000:.1f}']
+        for operation, (count, duration) in sorted(self.operations.items()):
+            metrics.append(f'storage-{operation};desc="{count}";dur={duration * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def track_storage():
+    stats = StorageStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _timed(operation, method_name):
+    def method(self, *args, **kwargs):
+        return self.call(operation, getattr(self.backend, method_name), *args, **kwargs)
+    method.__name__ = method_name
+    return method
+
+
+def _delegated(method_name):
+    def method(self, *args, **kwargs):
+        return getattr(self.backend, method_name)(*args, **kwargs)
+    method.__name__ = method_name
+    return method
+
+
+@deconstructible(path='common.storage.InstrumentedStorage')
+class InstrumentedStorage(Storage):
+    """
+    Обёртка над настоящим storage, которая считает операции текущего запроса.
+    Атрибуты, которых нет у Storage (bucket_name, connection, ...), берутся у backend.
+    """
+    TIMED_ATTRIBUTES = {'generate_presigned_post': 'sign'}
+
+    def __init__(self, backend, options=None):
+        self.backend = import_string(backend)(**(options or {}))
+
+    def call(self, operation, method, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.add(operation, time.perf_counter() - started)
+
+    save = _timed('save', 'save')
+    open = _timed('open', 'open')
+    delete = _timed('delete', 'delete')
+    exists = _timed('exists', 'exists')
+    url = _timed('url', 'url')
+    size = _timed('size', 'size')
+    listdir = _timed('listdir', 'listdir')
+
+    get_valid_name = _delegated('get_valid_name')
+    get_alternative_name = _delegated('get_alternative_name')
+    get_available_name = _delegated('get_available_name')
+    generate_filename = _delegated('generate_filename')
+    path = _delegated('path')
+    get_accessed_time = _delegated('get_accessed_time')
+    get_created_time = _delegated('get_created_time')
+    get_modified_time = _delegated('get_modified_time')
+
+    def __getattr__(self, name):
+        if name == 'backend':
+            raise AttributeError(name)
+        value = getattr(self.backend, name)
+        if name in self.TIMED_ATTRIBUTES:
+            operation = self.TIMED_ATTRIBUTES[name]
+            return lambda *args, **kwargs: self.call(operation, value, *args, **kwargs)
+        return value
+
+
+class EndpointHistograms:
+    """
+    Гистограммы времени storage на запрос по эндпоинтам, в памяти процесса.
+    """
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, stats):
+        duration_ms = stats.duration * 1000
+        bucket = bisect.bisect_left(self.BUCKETS_MS, duration_ms)
+        with self._lock:
+            endpoint_stats = self._endpoints.setdefault(endpoint, {
+                'requests': 0,
+                'operations': 0,
+                'duration_ms': 0.0,
+                'buckets': [0] * (len(self.BUCKETS_MS) + 1),
+            })
+            endpoint_stats['requests'] += 1
+            endpoint_stats['operations'] += stats.count
+            endpoint_stats['duration_ms'] += duration_ms
+            endpoint_stats['buckets'][bucket] += 1
+
+    def snapshot(self):
+        labels = [f'<={bound}' for bound in self.BUCKETS_MS] + [f'>{self.BUCKETS_MS[-1]}']
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': stats['requests'],
+                    'operations': stats['operations'],
+                    'avg_duration_ms': round(stats['duration_ms'] / stats['requests'], 2),
+                    'histogram_ms': dict(zip(labels, stats['buckets'])),
+                }
+                for endpoint, stats in sorted(self._endpoints.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_endpoint_histograms = EndpointHistograms()
+
+
+def get_endpoint_histograms():
+    return _endpoint_histograms
+
+
+class StorageTimingMiddleware:
+    """
+    Отдаёт операции со storage текущего запроса в заголовке Server-Timing
+    и складывает их в гистограмму эндпоинта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_storage() as stats:
+            response = self.get_response(request)
+
+        if stats.count:
+            server_timing = [response.get('Server-Timing'), stats.server_timing()]
+            response['Server-Timing'] = ', '.join(filter(None, server_timing))
+        match = request.resolver_match
+        endpoint = f'{request.method} {match.view_name}' if match else f'{request.method} <unresolved>'
+        _endpoint_histograms.record(endpoint, stats)
+        return response
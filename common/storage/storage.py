@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import hmac
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, InMemoryStorage, Storage
+from django.utils.deconstruct import deconstructible
+
+__all__ = ['LocalS3Storage', 'InjectedStorageError']
+
+
+class InjectedStorageError(OSError):
+    pass
+
+
+@deconstructible(path='common.storage.LocalS3Storage')
+class LocalS3Storage(Storage):
+    """
+    Замена S3Boto3Storage для бенчмарков без сети.
+
+    Объекты лежат на диске (location) или в памяти, URL имеют тот же вид,
+    что у S3 с подписью в query string. Для каждой операции (save, open,
+    delete, exists, size, listdir, modified_time, url, presign) можно задать
+    задержку в секундах или диапазон [min, max] и долю отказов; ключ
+    default действует на все остальные операции.
+    """
+
+    def __init__(self, location=None, bucket_name=None, endpoint_url=None, querystring_auth=None,
+                 querystring_expire=None, latency=None, failure_rate=None, seed=None):
+        self.backend = FileSystemStorage(location=location) if location else InMemoryStorage()
+        self.bucket_name = bucket_name or getattr(settings, 'AWS_STORAGE_BUCKET_NAME', 'local')
+        self.endpoint_url = (endpoint_url or getattr(settings, 'AWS_S3_ENDPOINT_URL', 'http://localhost:9000')).rstrip('/')
+        self.querystring_auth = (
+            getattr(settings, 'AWS_QUERYSTRING_AUTH', True) if querystring_auth is None else querystring_auth
+        )
+        self.querystring_expire = querystring_expire or getattr(settings, 'AWS_QUERYSTRING_EXPIRE', 3600)
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+        self._random = random.Random(seed)
+
+    def simulate(self, operation):
+        delay = self.latency.get(operation, self.latency.get('default', 0))
+        if isinstance(delay, (list, tuple)):
+            delay = self._random.uniform(*delay)
+        if delay:
+            time.sleep(delay)
+
+        rate = self.failure_rate.get(operation, self.failure_rate.get('default', 0))
+        if rate and self._random.random() < rate:
+            raise InjectedStorageError(f'Injected {operation} failure')
+
+    def _open(self, name, mode='rb'):
+        self.simulate('open')
+        return self.backend._open(name, mode)
+
+    def _save(self, name, content):
+        self.simulate('save')
+        return self.backend._save(name, content)
+
+    def delete(self, name):
+        self.simulate('delete')
+        self.backend.delete(name)
+
+    def exists(self, name):
+        self.simulate('exists')
+        return self.backend.exists(name)
+
+    def listdir(self, path):
+        self.simulate('listdir')
+        return self.backend.listdir(path)
+
+    def size(self, name):
+        self.simulate('size')
+        return self.backend.size(name)
+
+    def get_modified_time(self, name):
+        self.simulate('modified_time')
+        return self.backend.get_modified_time(name)
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        self.simulate('url')
+        url = f'{self.endpoint_url}/{self.bucket_name}/{quote(name)}'
+        if not self.querystring_auth:
+            return url
+
+        now = datetime.now(timezone.utc)
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f'local/{now:%Y%m%d}/us-east-1/s3/aws4_request',
+            'X-Amz-Date': f'{now:%Y%m%dT%H%M%SZ}',
+            'X-Amz-Expires': expire or self.querystring_expire,
+            'X-Amz-SignedHeaders': 'host',
+            **(parameters or {}),
+        }
+        query['X-Amz-Signature'] = self._sign(f'{url}?{urlencode(query)}')
+        return f'{url}?{urlencode(query)}'
+
+    def generate_presigned_post(self, key, fields=None, conditions=None, expires_in=None):
+        self.simulate('presign')
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=expires_in or self.querystring_expire)
+        policy = base64.b64encode(json.dumps({
+            'expiration': f'{expiration:%Y-%m-%dT%H:%M:%SZ}',
+            'conditions': [{'bucket': self.bucket_name}, {'key': key}, *(conditions or [])],
+        }).encode()).decode()
+        return {
+            'url': f'{self.endpoint_url}/{self.bucket_name}',
+            'fields': {
+                **(fields or {}),
+                'key': key,
+                'x-amz-algorithm': 'AWS4-HMAC-SHA256',
+                'policy': policy,
+                'x-amz-signature': self._sign(policy),
+            },
+        }
+
+    @staticmethod
+    def _sign(value):
+        return hmac.new(settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
@@ -0,0 +1,15 @@
+__all__ = ['follow_pages']
+
+
+def follow_pages(client, url, link='next'):
+    """
+    Проходит курсорную пагинацию по ссылкам link ('next' или 'previous').
+    Возвращает ответы страниц в порядке обхода.
+    """
+    responses = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        responses.append(response)
+        url = response.data[link]
+    return responses
@@ -0,0 +1,195 @@
+import difflib
+import json
+import os
+import re
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+__all__ = ['QueryPlanTestCase', 'explain', 'iter_plan_nodes', 'iter_read_rows', 'format_plan']
+
+UPDATE_ENV = 'UPDATE_PLAN_SNAPSHOTS'
+
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(\.\d+)?(?![\w.])")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def explain(sql):
+    """
+    План запроса из EXPLAIN (FORMAT JSON): корневой узел 'Plan'.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+# узлы, которые отдают строки по мере чтения: LIMIT над ними обрывает и чтение снизу
+STREAMING_NODES = {
+    'Index Scan', 'Index Only Scan', 'Incremental Sort', 'Nested Loop', 'Merge Join',
+    'Result', 'Subquery Scan', 'Unique', 'Gather Merge', 'Append', 'Merge Append',
+}
+
+
+def iter_plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from iter_plan_nodes(child)
+
+
+def iter_read_rows(plan, limit=None):
+    """
+    (узел, оценка строк, которые из него будут прочитаны). Plan Rows узла под
+    LIMIT - оценка без учёта LIMIT, поэтому для потоковых узлов она урезается
+    до строк LIMIT; Sort, Hash, Bitmap Heap Scan и прочие читают вход целиком.
+    """
+    rows = plan['Plan Rows'] if limit is None else min(plan['Plan Rows'], limit)
+    yield plan, rows
+    if plan['Node Type'] == 'Limit':
+        limit = rows
+    elif plan['Node Type'] not in STREAMING_NODES:
+        limit = None
+    for child in plan.get('Plans', ()):
+        yield from iter_read_rows(child, limit)
+
+
+def normalize_condition(condition):
+    # идентификаторы и даты зависят от сида и текущего дня, в снимке они не нужны
+    return _NUMBER.sub('N', _STRING.sub("'...'", condition))
+
+
+def format_plan(plan, indent=0):
+    """
+    Читаемое дерево плана в духе psql, но без стоимостей и оценок строк:
+    снимок меняется только при смене способа доступа к данным, а не при каждом ANALYZE.
+    """
+    title = plan['Node Type']
+    if plan.get('Join Type') and 'Join' in title:
+        title = f"{plan['Join Type']} {title}"
+    if plan.get('Strategy') and plan['Strategy'] != 'Plain':
+        title = f"{plan['Strategy']} {title}"
+    if plan.get('Index Name'):
+        title += f" using {plan['Index Name']}"
+    if plan.get('Relation Name'):
+        title += f" on {plan['Relation Name']}"
+    if plan.get('Subplan Name'):
+        title += f" ({plan['Subplan Name']})"
+
+    lines = [' ' * indent + ('->  ' if indent else '') + title]
+    detail_indent = indent + (6 if indent else 2)
+    for key in ('Index Cond', 'Recheck Cond', 'Hash Cond', 'Merge Cond', 'Join Filter', 'Filter'):
+        if plan.get(key):
+            lines.append(f"{' ' * detail_indent}{key}: {normalize_condition(plan[key])}")
+    for key in ('Sort Key', 'Presorted Key', 'Group Key'):
+        if plan.get(key):
+            lines.append(f"{' ' * detail_indent}{key}: {', '.join(plan[key])}")
+    for child in plan.get('Plans', ()):
+        lines.extend(format_plan(child, detail_indent))
+    return lines
+
+
+class QueryPlanTestCase(APITestCase):
+    """
+    Регрессия планов запросов горячих эндпоинтов.
+
+    База один раз на класс очищается VACUUM, заполняется seed_scale и
+    анализируется. assert_plans выполняет запрос к эндпоинту, собирает его
+    SELECT'ы и для каждого делает EXPLAIN: на таблицах large_models не должно
+    быть Seq Scan, а оценка прочитанных из них строк не должна превышать
+    max_rows. Планы сохраняются текстом в snapshot_dir/<name>.txt и сравниваются
+    со снимком. Снимки пишутся только при UPDATE_PLAN_SNAPSHOTS=1, отсутствующий
+    снимок - ошибка теста.
+    """
+    seed_options = {}
+    large_models = ()
+    max_rows = 1000
+    snapshot_dir = None
+
+    @classmethod
+    def setUpClass(cls):
+        # сиды предыдущих классов откатываются, но их мёртвые строки остаются в таблицах:
+        # без VACUUM размер таблиц, а с ним и планы, зависят от порядка запуска и autovacuum
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_scale', stdout=StringIO(), **cls.seed_options)
+        with connection.cursor() as cursor:
+            # выборка ANALYZE (300 * target строк) покрывает таблицы целиком,
+            # иначе статистика и с ней планы меняются от запуска к запуску
+            cursor.execute('SET default_statistics_target = 10000')
+            cursor.execute('ANALYZE')
+            cursor.execute('RESET default_statistics_target')
+
+    @classmethod
+    def get_large_tables(cls):
+        return {model._meta.db_table for model in cls.large_models}
+
+    def capture(self, method, path, user=None, data=None):
+        """
+        Выполняет запрос и возвращает (ответ, список SELECT'ов). Потоковый
+        ответ дочитывается внутри перехвата, иначе его запросы не попадут в список.
+        """
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data, format='json' if method != 'GET' else None)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))
+        ]
+        return response, selects
+
+    def assert_plans(self, name, path, user=None, method='GET', data=None, status=200, max_rows=None):
+        response, selects = self.capture(method, path, user, data)
+        self.assertEqual(response.status_code, status, getattr(response, 'data', None))
+        self.assertTrue(selects, f'{name}: endpoint ran no SELECT')
+
+        max_rows = self.max_rows if max_rows is None else max_rows
+        large_tables = self.get_large_tables()
+        snapshot = [f'{method} {name}']
+        for number, sql in enumerate(selects, 1):
+            plan = explain(sql)
+            for node, rows in iter_read_rows(plan):
+                if node.get('Relation Name') not in large_tables:
+                    continue
+                self.assertNotEqual(
+                    node['Node Type'], 'Seq Scan',
+                    f"{name}: seq scan on {node['Relation Name']} in query {number}:\n{sql}",
+                )
+                self.assertLessEqual(
+                    rows, max_rows,
+                    f"{name}: {rows} estimated rows on {node['Relation Name']} in query {number}:\n{sql}",
+                )
+            snapshot.append('')
+            snapshot.append(f'-- query {number}')
+            snapshot.extend(format_plan(plan))
+        self.assert_snapshot(name, '\n'.join(snapshot) + '\n')
+        return response
+
+    def assert_snapshot(self, name, text):
+        path = Path(self.snapshot_dir) / f'{name}.txt'
+        if os.environ.get(UPDATE_ENV):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding='utf-8')
+            return
+        if not path.exists():
+            self.fail(f'No plan snapshot {path}, run with {UPDATE_ENV}=1 to create it:\n{text}')
+        expected = path.read_text(encoding='utf-8')
+        if text != expected:
+            diff = ''.join(difflib.unified_diff(
+                expected.splitlines(keepends=True),
+                text.splitlines(keepends=True),
+                fromfile=str(path),
+                tofile=f'{name} (current)',
+            ))
+            self.fail(f'Plan of {name} changed, rerun with {UPDATE_ENV}=1 if this is expected:\n{diff}')
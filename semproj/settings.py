@@ -1,6 +1,7 @@
 from datetime import timedelta
 from pathlib import Path
 import environ
+from botocore.config import Config
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,7 @@ INSTALLED_APPS += [
     'apps.news.apps.NewsConfig',
     'apps.order.apps.OrderConfig',
     'apps.schedule.apps.ScheduleConfig',
+    'apps.jobs.apps.JobsConfig',
 ]
 
 # Custom user model
@@ -56,6 +58,7 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    'common.storage.StorageTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -125,7 +128,6 @@ REST_FRAMEWORK = {
     ],
     # 'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    # 'DEFAULT_PAGINATION_CLASS': 'common.pagination.BasePagination',
 }
 
 # Password validation
@@ -188,8 +190,65 @@ AWS_S3_VERIFY = False
 AWS_S3_SIGNATURE_VERSION = 's3v4'
 AWS_DEFAULT_ACL = None
 AWS_QUERYSTRING_AUTH = True
+AWS_QUERYSTRING_EXPIRE = env.int('AWS_QUERYSTRING_EXPIRE', default=3600)
 AWS_S3_FILE_OVERWRITE = False
 
+# batch uploads run in a thread pool, the connection pool of each client must fit it
+PHOTO_UPLOAD_WORKERS = env.int('PHOTO_UPLOAD_WORKERS', default=8)
+AWS_S3_CLIENT_CONFIG = Config(
+    signature_version=AWS_S3_SIGNATURE_VERSION,
+    max_pool_connections=PHOTO_UPLOAD_WORKERS,
+)
+
+# STORAGE_BACKEND=local keeps objects on disk (LOCAL_STORAGE_LOCATION) or in memory and
+# simulates S3 latency and failures, e.g. LOCAL_STORAGE_LATENCY='{"save": [0.05, 0.2], "default": 0.01}'
+STORAGE_BACKEND = env.str('STORAGE_BACKEND', default='s3')
+if STORAGE_BACKEND == 'local':
+    STORAGES['default'] = {
+        "BACKEND": "common.storage.LocalS3Storage",
+        "OPTIONS": {
+            "location": env.str('LOCAL_STORAGE_LOCATION', default='') or None,
+            "latency": env.json('LOCAL_STORAGE_LATENCY', default={}),
+            "failure_rate": env.json('LOCAL_STORAGE_FAILURE_RATE', default={}),
+            "seed": env.int('LOCAL_STORAGE_SEED', default=None),
+        },
+    }
+
+# storage calls are counted per request (Server-Timing header, per-endpoint histograms)
+STORAGE_INSTRUMENTATION = env.bool('STORAGE_INSTRUMENTATION', default=True)
+if STORAGE_INSTRUMENTATION:
+    STORAGES['default'] = {
+        "BACKEND": "common.storage.InstrumentedStorage",
+        "OPTIONS": {
+            "backend": STORAGES['default']['BACKEND'],
+            "options": STORAGES['default'].get('OPTIONS', {}),
+        },
+    }
+
+# background jobs (manage.py run_worker); inline mode runs them after commit in the web process.
+# Inline is the default only with DEBUG: in production run_worker must be deployed next to the web process
+JOBS_RUN_INLINE = env.bool('JOBS_RUN_INLINE', default=DEBUG)
+JOBS_MAX_ATTEMPTS = env.int('JOBS_MAX_ATTEMPTS', default=5)
+JOBS_RETRY_BACKOFF = env.int('JOBS_RETRY_BACKOFF', default=10)
+JOBS_RETRY_BACKOFF_MAX = env.int('JOBS_RETRY_BACKOFF_MAX', default=3600)
+JOBS_LOCK_TIMEOUT = env.int('JOBS_LOCK_TIMEOUT', default=600)
+
+# days ahead covered by AvailabilityBitmap (executor availability search)
+AVAILABILITY_HORIZON_DAYS = env.int('AVAILABILITY_HORIZON_DAYS', default=92)
+
+PHOTO_DERIVATIVE_WORKERS = env.int('PHOTO_DERIVATIVE_WORKERS', default=2)
+# signed URLs are cached per process for half of their lifetime
+PHOTO_URL_CACHE_TTL = env.int('PHOTO_URL_CACHE_TTL', default=AWS_QUERYSTRING_EXPIRE // 2)
+PHOTO_URL_CACHE_SIZE = env.int('PHOTO_URL_CACHE_SIZE', default=10000)
+# direct-to-bucket uploads (presigned POST)
+PHOTO_UPLOAD_MAX_SIZE = env.int('PHOTO_UPLOAD_MAX_SIZE', default=20 * 1024 * 1024)
+PHOTO_UPLOAD_EXPIRE = env.int('PHOTO_UPLOAD_EXPIRE', default=600)
+# uploaded files are hashed while streaming to deduplicate photos by content
+FILE_UPLOAD_HANDLERS = [
+    'apps.photo.uploadhandlers.HashingMemoryFileUploadHandler',
+    'apps.photo.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
 # MINIO_STORAGE_ENDPOINT = env.str('MINIO_STORAGE_ENDPOINT')  # 'localhost:9000'
 # MINIO_STORAGE_ACCESS_KEY = env.str('MINIO_STORAGE_ACCESS_KEY')  # 'minioadmin'
 # MINIO_STORAGE_SECRET_KEY = env.str('MINIO_STORAGE_SECRET_KEY')  # 'minioadmin'
@@ -311,7 +370,7 @@ LOGGING = {
     'loggers': {
         'storages': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': env.str('STORAGES_LOG_LEVEL', default='INFO'),
         }
     },
     'root': {